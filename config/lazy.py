@@ -0,0 +1,49 @@
+"""
+Ленивые представления для URLConf: модуль представления импортируется при
+первом запросе к нему, а не при загрузке URLConf. Документация и выдача
+токенов нужны не каждому воркеру и не в первые миллисекунды, поэтому их
+зависимости (drf_yasg, jsonschema и т.д.) не входят в холодный старт.
+"""
+
+import threading
+
+from django.urls import URLPattern, URLResolver
+from django.utils.module_loading import import_string
+
+
+def lazy_view(path, factory="as_view", *args, csrf_exempt=True, **kwargs):
+    """
+    View класса path, созданное вызовом path.factory(*args, **kwargs) при
+    первом запросе. csrf_exempt задаётся заранее (как у представлений DRF):
+    CsrfViewMiddleware читает его до вызова view, то есть до импорта.
+    """
+    view = None
+    lock = threading.Lock()
+
+    def load():
+        nonlocal view
+        with lock:
+            if view is None:
+                view = getattr(import_string(path), factory)(*args, **kwargs)
+                # cls, initkwargs и т.п. — для генератора схемы API
+                wrapper.__dict__.update(
+                    {key: value for key, value in vars(view).items() if key != "load"}
+                )
+        return view
+
+    def wrapper(request, *view_args, **view_kwargs):
+        return (view or load())(request, *view_args, **view_kwargs)
+
+    wrapper.__name__ = wrapper.__qualname__ = path.rsplit(".", 1)[-1]
+    wrapper.csrf_exempt = csrf_exempt
+    wrapper.load = load
+    return wrapper
+
+
+def load_lazy_views(patterns):
+    """Импортирует все ленивые представления patterns (рекурсивно)."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            load_lazy_views(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and hasattr(pattern.callback, "load"):
+            pattern.callback.load()
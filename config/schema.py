@@ -0,0 +1,136 @@
+"""
+OpenAPI-схема API: строится не на каждый запрос, а один раз на версию кода.
+
+Версия кода — хеш исходников проекта (code_version()). Команда
+generate_openapi сохраняет схему во всех форматах в OPENAPI_SCHEMA_DIR
+как schema-<версия>.<формат>; представление отдаёт такой файл, а если
+его нет (код изменился после генерации) — строит схему один раз и держит
+готовые байты в памяти процесса. ETag ответа — версия кода, поэтому
+повторный опрос схемы с If-None-Match получает 304.
+"""
+
+import functools
+import hashlib
+import threading
+from importlib import import_module
+from pathlib import Path
+
+import drf_yasg
+import rest_framework
+from django.apps import apps
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import get_resolver
+from django.utils.cache import get_conditional_response
+from drf_yasg import openapi
+from drf_yasg.app_settings import swagger_settings
+from drf_yasg.views import SPEC_RENDERERS, get_schema_view
+from rest_framework import permissions
+
+from .lazy import load_lazy_views
+
+INFO = openapi.Info(
+    title="Electronics Network API",
+    default_version="v1",
+    description="API для управления заводами, сетями и продуктами",
+    contact=openapi.Contact(email="support@example.com"),
+    license=openapi.License(name="MIT License"),
+)
+
+_lock = threading.Lock()
+# формат -> готовое тело ответа
+_rendered = {}
+
+
+def source_files():
+    """Модули проекта: приложения из BASE_DIR и пакет ROOT_URLCONF."""
+    base_dir = Path(settings.BASE_DIR).resolve()
+    roots = {Path(import_module(settings.ROOT_URLCONF).__file__).resolve().parent}
+    roots.update(
+        Path(app.path).resolve()
+        for app in apps.get_app_configs()
+        if Path(app.path).resolve().is_relative_to(base_dir)
+    )
+    return sorted(
+        path
+        for root in roots
+        for path in root.rglob("*.py")
+        if "migrations" not in path.parts
+    )
+
+
+@functools.cache
+def code_version():
+    """Хеш исходников проекта и версий DRF/drf_yasg."""
+    digest = hashlib.sha256(f"{rest_framework.VERSION}|{drf_yasg.__version__}".encode())
+    base_dir = Path(settings.BASE_DIR).resolve()
+    for path in source_files():
+        digest.update(str(path.relative_to(base_dir)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def schema_path(fmt, version=None):
+    directory = Path(settings.OPENAPI_SCHEMA_DIR)
+    return directory / f"schema-{version or code_version()}.{fmt}"
+
+
+def generate_schema():
+    """Схема всех эндпоинтов без запроса: host берёт сам Swagger UI."""
+    # ленивые представления описываются в схеме по своему классу
+    load_lazy_views(get_resolver().url_patterns)
+    generator = swagger_settings.DEFAULT_GENERATOR_CLASS(INFO)
+    return generator.get_schema(request=None, public=True)
+
+
+@functools.cache
+def _process_schema():
+    """Схема, построенная этим процессом, если готового файла нет."""
+    return generate_schema()
+
+
+def render_schema(schema, renderer_class):
+    return renderer_class().render(schema)
+
+
+def get_rendered(renderer):
+    """Тело схемы в формате renderer: из файла generate_openapi или из памяти."""
+    fmt = renderer.format
+    with _lock:
+        if fmt not in _rendered:
+            path = schema_path(fmt)
+            if path.exists():
+                _rendered[fmt] = path.read_bytes()
+            else:
+                _rendered[fmt] = render_schema(_process_schema(), type(renderer))
+        return _rendered[fmt]
+
+
+def clear_cache():
+    with _lock:
+        _rendered.clear()
+    _process_schema.cache_clear()
+    code_version.cache_clear()
+
+
+class PrecomputedSchemaView(
+    get_schema_view(INFO, public=True, permission_classes=(permissions.AllowAny,))
+):
+    """
+    Схема отдаётся готовой; страницы Swagger UI и ReDoc строятся как прежде
+    (им схема не нужна — они запрашивают её отдельно по ?format=openapi).
+    """
+
+    def get(self, request, version="", format=None):
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, tuple(SPEC_RENDERERS)):
+            return super().get(request, version, format)
+        etag = f'"{code_version()}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(
+                get_rendered(renderer),
+                content_type=f"{renderer.media_type}; charset={renderer.charset}",
+            )
+        response["ETag"] = etag
+        return response
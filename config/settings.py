@@ -20,14 +20,18 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
+    "rest_framework_simplejwt.token_blacklist",
     "drf_yasg",
     "users",
     "network",
 ]
 
 MIDDLEWARE = [
+    # первым, чтобы замер охватывал остальные middleware
+    "network.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -64,9 +68,52 @@ DATABASES = {
         "PASSWORD": os.getenv("DB_PASSWORD"),
         "HOST": os.getenv("DB_HOST", "127.0.0.1"),
         "PORT": os.getenv("DB_PORT", "5432"),
+        # постоянные соединения с проверкой перед повторным использованием;
+        # с пулом Django их не держит — соединения живут в пуле
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Пул соединений psycopg 3 (psycopg[pool]) на процесс вместо соединения
+# на поток: DB_POOL_MAX_SIZE ограничивает число соединений воркера с БД
+# (с CONN_HEALTH_CHECKS пул проверяет соединение перед выдачей)
+if os.getenv("DB_POOL", "False") == "True":
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            # сколько ждать свободного соединения, секунды
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            # соединения переоткрываются не все разом (к сроку пул
+            # добавляет случайный разброс)
+            "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "3600")),
+        }
+    }
+
+# Кеш: общий Redis, если задан REDIS_URL, иначе локальная память процесса
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Кеш ответов list/retrieve API сети, секунды (0 — выключен)
+API_CACHE_TIMEOUT = int(os.getenv("API_CACHE_TIMEOUT", "0"))
+
+# Снимок пользователя для JWT-аутентификации, секунды (0 — читать из БД).
+# Без Redis другие процессы видят смену флагов не позже этого срока
+USER_SNAPSHOT_TIMEOUT = int(os.getenv("USER_SNAPSHOT_TIMEOUT", "60"))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -86,8 +133,19 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": (
+        "network.renderers.ORJSONRenderer",
+        "network.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "network.parsers.ORJSONParser",
+        "network.parsers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedUserJWTAuthentication",
     ),
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
@@ -101,8 +159,14 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.TokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.TokenRefreshSerializer",
 }
 
+# Как часто фильтр отозванных refresh-токенов (users.tokens) догружает
+# чёрный список из БД, секунды: отзыв в другом процессе виден не позже
+TOKEN_REVOCATION_SYNC_INTERVAL = float(os.getenv("TOKEN_REVOCATION_SYNC_INTERVAL", "1"))
+
 LANGUAGE_CODE = "ru-ru"
 
 TIME_ZONE = "UTC"
@@ -116,4 +180,7 @@ AUTH_USER_MODEL = "users.CustomUser"
 
 STATIC_URL = "static/"
 
+# Готовые OpenAPI-схемы (python manage.py generate_openapi, см. config.schema)
+OPENAPI_SCHEMA_DIR = os.getenv("OPENAPI_SCHEMA_DIR", BASE_DIR / "openapi")
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
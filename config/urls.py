@@ -1,31 +1,35 @@
 from django.contrib import admin
 from django.urls import include, path
-from drf_yasg import openapi, views
-from rest_framework import permissions
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
-schema_view = views.get_schema_view(
-    openapi.Info(
-        title="Electronics Network API",
-        default_version="v1",
-        description="API для управления заводами, сетями и продуктами",
-        contact=openapi.Contact(email="support@example.com"),
-        license=openapi.License(name="MIT License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from network.health import HealthView
+from network.metrics import MetricsView
 
+from .lazy import lazy_view
 
+# документация и токены импортируются при первом запросе (см. config.lazy)
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("network.urls")),
-    path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("metrics", MetricsView.as_view(), name="metrics"),
+    path("health", HealthView.as_view(), name="health"),
+    path(
+        "api/token/",
+        lazy_view("rest_framework_simplejwt.views.TokenObtainPairView"),
+        name="token_obtain_pair",
+    ),
+    path(
+        "api/token/refresh/",
+        lazy_view("rest_framework_simplejwt.views.TokenRefreshView"),
+        name="token_refresh",
+    ),
     path(
         "swagger/",
-        schema_view.with_ui("swagger", cache_timeout=0),
+        lazy_view("config.schema.PrecomputedSchemaView", "with_ui", "swagger"),
         name="schema-swagger-ui",
     ),
-    path("redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"),
+    path(
+        "redoc/",
+        lazy_view("config.schema.PrecomputedSchemaView", "with_ui", "redoc"),
+        name="schema-redoc",
+    ),
 ]
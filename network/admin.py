@@ -1,17 +1,131 @@
+from django import forms
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 
-from .models import NetworkNode, Product
+from . import ledger
+from .models import DebtEntry, DebtRule, NetworkNode, Product
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Без фильтров число строк берётся из статистики PostgreSQL (reltuples)
+    вместо COUNT(*) по всей таблице. Для небольших таблиц и выборок
+    с фильтрами считается точно.
+    """
+
+    # ниже этого числа строк оценка не нужна: COUNT(*) и так быстрый
+    ESTIMATE_THRESHOLD = 10_000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is not None and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [self.object_list.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.ESTIMATE_THRESHOLD:
+                return row[0]
+        return super().count
+
+
+class RelatedIdFilter(admin.SimpleListFilter):
+    """
+    Фильтр по id связанного звена: поле ввода вместо списка всех звеньев,
+    который пришлось бы выбирать из таблицы на каждой странице.
+    """
+
+    template = "admin/network/input_filter.html"
+    field_name = None
+
+    def lookups(self, request, model_admin):
+        # непустой список, иначе Django не покажет фильтр
+        return (("", ""),)
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice["query_parts"] = [
+            (name, value)
+            for name, values in changelist.get_filters_params().items()
+            if name != self.parameter_name
+            for value in values
+        ]
+        yield all_choice
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value and value.isdigit():
+            return queryset.filter(**{f"{self.field_name}_id": value})
+        return queryset
+
+
+class SupplierFilter(RelatedIdFilter):
+    title = "поставщику (id)"
+    parameter_name = "supplier"
+    field_name = "supplier"
+
+
+class NodeFilter(RelatedIdFilter):
+    title = "звену (id)"
+    parameter_name = "node"
+    field_name = "node"
 
 
 @admin.action(description="Очистить задолженность перед поставщиком")
 def clear_debt(modeladmin, request, queryset):
-    """Обнуляем поле debt для выбранных объектов."""
-    updated = queryset.update(debt=0)
-    modeladmin.message_user(request, f"Задолженность обнулена у {updated} объектов.")
+    """Обнуляем задолженность выбранных объектов проводками журнала."""
+    entries = ledger.clear(queryset)
+    modeladmin.message_user(
+        request, f"Задолженность обнулена у {len(entries)} объектов."
+    )
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Общие настройки списков для больших таблиц."""
+
+    paginator = ApproximateCountPaginator
+    # общее число строк без фильтров — ещё один COUNT(*) на каждую страницу
+    show_full_result_count = False
+    list_per_page = 50
+
+
+class NetworkNodeAdminForm(forms.ModelForm):
+    """
+    Снимок debt в форме не редактируется: задолженность меняется только
+    проводками журнала. Поле debt_adjustment добавляет проводку на
+    указанную сумму (network.ledger.post) при сохранении звена.
+    """
+
+    debt_adjustment = forms.DecimalField(
+        label="Корректировка задолженности",
+        max_digits=12,
+        decimal_places=2,
+        required=False,
+        help_text="Проводка в журнал: плюс — начисление, минус — списание",
+    )
+
+    class Meta:
+        model = NetworkNode
+        exclude = ("debt",)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("debt_adjustment") and (
+            cleaned_data.get("node_type") == NetworkNode.FACTORY
+        ):
+            self.add_error(
+                "debt_adjustment",
+                "У завода не может быть задолженности перед поставщиком.",
+            )
+        return cleaned_data
 
 
 @admin.register(NetworkNode)
-class NetworkNodeAdmin(admin.ModelAdmin):
+class NetworkNodeAdmin(ScalableAdmin):
     list_display = (
         "id",
         "node_type",
@@ -20,20 +134,79 @@ class NetworkNodeAdmin(admin.ModelAdmin):
         "city",
         "email",
         "supplier",
-        "debt",
+        "current_debt",
         "created_at",
     )
-    list_filter = ("country", "city", "supplier")
+    list_filter = ("node_type", "country", SupplierFilter)
+    list_select_related = ("supplier",)
+    autocomplete_fields = ("supplier",)
     search_fields = ("name", "email", "city")
     ordering = ("-created_at",)
     verbose_name = "Сеть"
     actions = [clear_debt]
+    form = NetworkNodeAdminForm
+    readonly_fields = ("current_debt",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_current_debt()
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        amount = form.cleaned_data.get("debt_adjustment")
+        if amount:
+            ledger.post(
+                [DebtEntry(node=obj, amount=amount, comment="Корректировка в админке")]
+            )
+
+    @admin.display(description="Уровень", ordering="depth")
+    def level(self, obj):
+        return obj.depth
+
+    @admin.display(description="Задолженность", ordering="current_debt")
+    def current_debt(self, obj):
+        return obj.current_debt
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(ScalableAdmin):
     list_display = ("id", "name", "model", "release_date", "supplier")
-    list_filter = ("release_date", "supplier")
+    list_filter = ("release_date", SupplierFilter)
+    list_select_related = ("supplier",)
+    autocomplete_fields = ("supplier",)
     search_fields = ("name", "model")
     ordering = ("-release_date",)
     verbose_name = "Продукт"
+
+
+@admin.register(DebtEntry)
+class DebtEntryAdmin(ScalableAdmin):
+    """Журнал только для просмотра и новых проводок: строки не меняются."""
+
+    list_display = ("id", "node", "amount", "comment", "created_at")
+    list_filter = (NodeFilter,)
+    list_select_related = ("node",)
+    autocomplete_fields = ("node",)
+    ordering = ("-id",)
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DebtRule)
+class DebtRuleAdmin(admin.ModelAdmin):
+    """Правила применяет команда run_debt_jobs."""
+
+    list_display = (
+        "name",
+        "node_type",
+        "amount",
+        "percent",
+        "interval",
+        "next_run_at",
+        "is_active",
+    )
+    list_filter = ("node_type", "is_active")
+    readonly_fields = ("cursor",)
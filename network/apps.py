@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class NetworkConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "network"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,265 @@
+"""
+Асинхронные list/retrieve звеньев и продуктов для запуска под ASGI
+(config.asgi, например uvicorn config.asgi:application).
+
+К БД обращаются только через async ORM (aget, aiterator), поэтому
+медленный клиент или long-poll не занимает поток воркера, и один процесс
+держит сотни одновременных соединений дашбордов. Тело ответа то же, что
+у /api/nodes/ и /api/products/ (поля сериализатора, ?fields= / ?expand=),
+но возможности уже:
+- пагинация курсором только вперёд, в сортировке по умолчанию;
+- фильтры — точные совпадения полей filterset_fields, без поиска
+  и ?ordering=;
+- JSON или MessagePack по Accept (?format=);
+- ETag списка по CollectionVersion. С If-None-Match и ?wait=N (до
+  LONG_POLL_MAX_WAIT секунд) список ждёт изменения коллекции и отдаёт
+  304, если оно так и не произошло.
+"""
+
+import asyncio
+import base64
+import binascii
+
+import orjson
+from asgiref.sync import sync_to_async
+from django import forms
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views import View
+from rest_framework import exceptions, serializers, status
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.pagination import CursorPagination
+from rest_framework.request import Request
+from rest_framework.utils.urls import replace_query_param
+
+from .authentication import AsyncJWTAuthentication
+from .cache import NODES, PRODUCTS
+from .conditional import make_etag
+from .fastpath import RowRepresentation
+from .metrics import serialization
+from .models import CollectionVersion, NetworkNode, Product
+from .pagination import NetworkNodePagination, ProductPagination
+from .permissions import IsActiveStaff
+from .renderers import MessagePackRenderer, ORJSONRenderer
+from .serializers import NetworkNodeSerializer, ProductSerializer
+
+# предел ?wait= для long-poll списка, секунды
+LONG_POLL_MAX_WAIT = 30
+# как часто long-poll перечитывает версию коллекции, секунды
+LONG_POLL_INTERVAL = 1
+
+
+class AsyncReadView(View):
+    """
+    Базовое асинхронное представление: аутентификация, права, выбор
+    формата и ошибки — как у APIView DRF, но без синхронных вызовов.
+    """
+
+    http_method_names = ["get", "head", "options"]
+    queryset = None
+    serializer_class = None
+    pagination_class = None
+    collection_version = None
+    # параметр запроса -> (lookup, поле формы для разбора значения)
+    filter_fields = {}
+    authentication = AsyncJWTAuthentication()
+    permission_classes = (IsActiveStaff,)
+    renderers = (ORJSONRenderer(), MessagePackRenderer())
+    negotiator = DefaultContentNegotiation()
+
+    async def get(self, request, pk=None):
+        # Request DRF — ради query_params, user и accepted_media_type,
+        # которые ждут сериализаторы, пагинация и make_etag
+        request = Request(request)
+        try:
+            self.perform_content_negotiation(request)
+            await self.perform_authentication(request)
+            await self.check_permissions(request)
+            if pk is None:
+                return await self.list(request)
+            return await self.retrieve(request, pk)
+        except exceptions.APIException as exc:
+            return self.handle_exception(request, exc)
+
+    def perform_content_negotiation(self, request):
+        renderer, media_type = self.negotiator.select_renderer(request, self.renderers)
+        request.accepted_renderer = renderer
+        request.accepted_media_type = media_type
+
+    async def perform_authentication(self, request):
+        result = await self.authentication.aauthenticate(request)
+        if result is None:
+            request.user, request.auth = AnonymousUser(), None
+        else:
+            request.user, request.auth = result
+
+    def get_permissions(self):
+        return [permission() for permission in self.permission_classes]
+
+    async def check_permissions(self, request):
+        """
+        Права без синхронных запросов: ahas_permission, если разрешение
+        его объявляет, иначе has_permission в потоке.
+        """
+        for permission in self.get_permissions():
+            check = getattr(permission, "ahas_permission", None)
+            if check is None:
+                check = sync_to_async(permission.has_permission)
+            if not await check(request, self):
+                if not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permission, "message", None))
+
+    async def list(self, request):
+        etag = await self.collection_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        waited = 0
+        wait = self.get_wait(request)
+        while response is not None and waited < wait:
+            await asyncio.sleep(LONG_POLL_INTERVAL)
+            waited += LONG_POLL_INTERVAL
+            etag = await self.collection_etag(request)
+            response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            response["ETag"] = etag
+            return response
+
+        paginator = self.pagination_class()
+        page_size = paginator.get_page_size(request)
+        ordering = paginator.ordering
+        queryset = self.filter_queryset(request, self.queryset.all())
+        queryset = self.seek(request, queryset, ordering)
+
+        representation = self.get_representation(request)
+        key = ordering[0].lstrip("-")
+        rows = representation.values(queryset, ["id", key]).order_by(*ordering)
+        rows = [row async for row in rows[: page_size + 1].aiterator()]
+
+        next_url = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            cursor = self.encode_cursor(rows[-1][key], rows[-1]["id"])
+            next_url = replace_query_param(
+                request.build_absolute_uri(), paginator.cursor_query_param, cursor
+            )
+        with serialization(request):
+            results = await representation.arepresent(rows)
+        data = {"next": next_url, "previous": None, "results": results}
+        response = self.render(request, data)
+        response["ETag"] = etag
+        return response
+
+    async def retrieve(self, request, pk):
+        representation = self.get_representation(request)
+        queryset = representation.values(self.queryset.all())
+        try:
+            row = await queryset.aget(pk=pk)
+        except queryset.model.DoesNotExist:
+            raise exceptions.NotFound()
+        with serialization(request):
+            [data] = await representation.arepresent([row])
+        return self.render(request, data)
+
+    async def collection_etag(self, request):
+        version, _ = await CollectionVersion.acurrent(self.collection_version)
+        return make_etag(request, version, ignore=("wait",))
+
+    def get_wait(self, request):
+        """?wait= в секундах, не больше LONG_POLL_MAX_WAIT; 0 — не ждать."""
+        try:
+            wait = int(request.query_params.get("wait", 0))
+        except ValueError:
+            return 0
+        return min(max(wait, 0), LONG_POLL_MAX_WAIT)
+
+    def get_representation(self, request):
+        serializer = self.serializer_class(context={"request": request, "view": self})
+        return RowRepresentation(serializer)
+
+    def filter_queryset(self, request, queryset):
+        errors = {}
+        for param, (lookup, field) in self.filter_fields.items():
+            value = request.query_params.get(param)
+            if value in (None, ""):
+                continue
+            try:
+                queryset = queryset.filter(**{lookup: field.clean(value)})
+            except ValidationError as exc:
+                errors[param] = exc.messages
+        if errors:
+            raise serializers.ValidationError(errors)
+        return queryset
+
+    def seek(self, request, queryset, ordering):
+        """Записи после позиции из ?cursor= в порядке ordering."""
+        cursor = request.query_params.get(CursorPagination.cursor_query_param)
+        if not cursor:
+            return queryset
+        key = ordering[0].lstrip("-")
+        op = "lt" if ordering[0].startswith("-") else "gt"
+        try:
+            value, pk = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return queryset.filter(
+                Q(**{f"{key}__{op}": value}) | Q(**{key: value, f"id__{op}": pk})
+            )
+        except (TypeError, ValueError, binascii.Error, ValidationError):
+            raise exceptions.NotFound(CursorPagination.invalid_cursor_message)
+
+    @staticmethod
+    def encode_cursor(value, pk):
+        position = orjson.dumps([value, pk], option=orjson.OPT_UTC_Z)
+        return base64.urlsafe_b64encode(position).decode()
+
+    def render(self, request, data, status_code=status.HTTP_200_OK):
+        renderer = getattr(request, "accepted_renderer", self.renderers[0])
+        response = HttpResponse(
+            renderer.render(data, renderer.media_type),
+            status=status_code,
+            content_type=renderer.media_type,
+        )
+        patch_vary_headers(response, ("Accept",))
+        return response
+
+    def handle_exception(self, request, exc):
+        """Тело и заголовки ошибки — как у APIView.handle_exception."""
+        if isinstance(
+            exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+        ):
+            exc.status_code = status.HTTP_401_UNAUTHORIZED
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {"detail": exc.detail}
+        response = self.render(request, data, status_code=exc.status_code)
+        if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+            response["WWW-Authenticate"] = self.authentication.authenticate_header(
+                request
+            )
+        return response
+
+
+class AsyncNetworkNodeView(AsyncReadView):
+    """Звенья сети: список и карточка, как у NetworkNodeViewSet."""
+
+    queryset = NetworkNode.objects.with_current_debt()
+    serializer_class = NetworkNodeSerializer
+    pagination_class = NetworkNodePagination
+    collection_version = NODES
+    filter_fields = {"country": ("country", forms.CharField())}
+
+
+class AsyncProductView(AsyncReadView):
+    """Продукты: список и карточка, как у ProductViewSet."""
+
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    pagination_class = ProductPagination
+    collection_version = PRODUCTS
+    # те же фильтры, что filterset_fields у ProductViewSet
+    filter_fields = {
+        "supplier": ("supplier_id", forms.IntegerField()),
+        "release_date": ("release_date", forms.DateField()),
+    }
@@ -0,0 +1,58 @@
+"""
+JWT-аутентификация для асинхронных представлений (async_views).
+
+Токен проверяется так же, как в simplejwt (подпись и срок — без обращения
+к БД); пользователь берётся из снимка в кеше (users.authentication),
+а при промахе читается через async ORM, поэтому запрос не занимает
+поток на время запроса к базе.
+"""
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from users.authentication import (
+    CachedUserJWTAuthentication,
+    from_snapshot,
+    get_cache,
+    get_timeout,
+    make_snapshot,
+    snapshot_key,
+)
+
+
+class AsyncJWTAuthentication(CachedUserJWTAuthentication):
+    """CachedUserJWTAuthentication с асинхронными authenticate и get_user."""
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        """Те же проверки, что у CachedUserJWTAuthentication.get_user."""
+        user_id = self.get_user_id(validated_token)
+        key = snapshot_key(user_id)
+        timeout = get_timeout()
+        data = await get_cache().aget(key) if timeout else None
+        if data is not None:
+            user = from_snapshot(self.user_model, data)
+            return self.check_user(user, validated_token)
+
+        try:
+            user = await self.user_model.objects.aget(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(
+                _("User not found"), code="user_not_found"
+            ) from e
+        self.check_user(user, validated_token)
+        if timeout:
+            await get_cache().aset(key, make_snapshot(user), timeout)
+        return user
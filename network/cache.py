@@ -0,0 +1,134 @@
+"""
+Кеш ответов list/retrieve API сети поверх django.core.cache.
+
+Ключ ответа строится из полного URL запроса (включая query string) и
+«версий» областей, от которых ответ зависит: коллекции (nodes, products)
+или отдельного объекта (node:<id>, product:<id>). Инвалидация — это замена
+версии области на новый случайный токен: старые ответы становятся
+недостижимыми и вытесняются по TIMEOUT. Перебирать ключи не нужно, поэтому
+схема одинаково работает с locmem и с общим бэкендом (Redis, Memcached).
+
+Включается настройкой API_CACHE_TIMEOUT > 0.
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+PREFIX = "network:api"
+NODES = "nodes"
+PRODUCTS = "products"
+
+
+def is_enabled():
+    return getattr(settings, "API_CACHE_TIMEOUT", 0) > 0
+
+
+def get_cache():
+    return caches[getattr(settings, "API_CACHE_ALIAS", "default")]
+
+
+def node_scope(pk):
+    return f"node:{pk}"
+
+
+def product_scope(pk):
+    return f"product:{pk}"
+
+
+def _version_key(scope):
+    return f"{PREFIX}:version:{scope}"
+
+
+def _versions(scopes):
+    cache = get_cache()
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def response_key(request, scopes):
+    raw = "|".join([request.build_absolute_uri(), *_versions(scopes)])
+    return f"{PREFIX}:response:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+
+def invalidate(*scopes):
+    """
+    Сбрасывает ответы, зависящие от перечисленных областей. Внутри транзакции
+    сброс повторяется после commit: иначе параллельный запрос успел бы
+    закешировать ещё не изменённые данные.
+    """
+    if not is_enabled() or not scopes:
+        return
+
+    def bump():
+        get_cache().set_many(
+            {_version_key(scope): uuid.uuid4().hex for scope in scopes}, timeout=None
+        )
+
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump)
+
+
+def invalidate_nodes(pks=(), collections=(NODES,)):
+    """Список звеньев и карточки звеньев pks."""
+    invalidate(*collections, *(node_scope(pk) for pk in pks))
+
+
+def invalidate_products(pks=(), supplier_ids=()):
+    """
+    Продукт встроен в список и карточку своего поставщика,
+    поэтому сбрасываются и они.
+    """
+    invalidate(
+        PRODUCTS,
+        NODES,
+        *(product_scope(pk) for pk in pks),
+        *(node_scope(pk) for pk in supplier_ids if pk is not None),
+    )
+
+
+class CachedResponseMixin:
+    """
+    Кеширует ответы list и retrieve вьюсета. Проверки аутентификации
+    и прав выполняются как обычно — до обращения к кешу.
+    cache_scope — область коллекции, object_scope — функция pk -> область.
+    """
+
+    cache_scope = None
+    object_scope = None
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(
+            request, [self.cache_scope], super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return self._cached_response(
+            request, [self.object_scope(pk)], super().retrieve, *args, **kwargs
+        )
+
+    def _cached_response(self, request, scopes, handler, *args, **kwargs):
+        if not is_enabled():
+            return handler(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = response_key(request, scopes)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+        return response
@@ -0,0 +1,88 @@
+"""
+Условные GET (ETag / Last-Modified) для list и retrieve API сети.
+
+Версия ответа берётся не из тела, а из БД: для карточки — updated_at
+объекта (у звена он меняется и при изменении его продуктов и поставщика),
+для списка — CollectionVersion коллекции. Поэтому при совпадении
+If-None-Match (или If-Modified-Since) 304 отдаётся после одного лёгкого
+запроса — без выборки страницы, prefetch продуктов и сериализации.
+"""
+
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.utils.urls import remove_query_param
+
+from .models import CollectionVersion
+
+
+def make_etag(request, version, ignore=()):
+    """
+    Слабый ETag: одна версия данных отдаётся в разных представлениях
+    (формат, query string), поэтому они тоже входят в хеш. ignore —
+    параметры запроса, которые на тело ответа не влияют.
+    """
+    path = request.get_full_path()
+    for param in ignore:
+        path = remove_query_param(path, param)
+    raw = "|".join([path, request.accepted_media_type, str(version)])
+    return f'W/"{hashlib.sha256(raw.encode()).hexdigest()[:32]}"'
+
+
+class ConditionalGetMixin:
+    """
+    ETag и Last-Modified для list и retrieve вьюсета.
+    collection_version — имя коллекции в CollectionVersion.
+    """
+
+    collection_version = None
+
+    def list(self, request, *args, **kwargs):
+        version, updated_at = CollectionVersion.current(self.collection_version)
+        return self._conditional_response(
+            request, version, updated_at, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            version = self.get_object_version(pk)
+        except (TypeError, ValueError, ValidationError):
+            version = None
+        if version is None:
+            # 404 формирует обычный retrieve
+            return super().retrieve(request, *args, **kwargs)
+        return self._conditional_response(
+            request, *version, super().retrieve, *args, **kwargs
+        )
+
+    def get_object_version(self, pk):
+        """(версия, время изменения) объекта pk или None, если его нет."""
+        updated_at = (
+            self.get_queryset()
+            .prefetch_related(None)
+            .filter(pk=pk)
+            .values_list("updated_at", flat=True)
+            .first()
+        )
+        if updated_at is None:
+            return None
+        return updated_at.isoformat(), updated_at
+
+    def _conditional_response(
+        self, request, version, updated_at, handler, *args, **kwargs
+    ):
+        etag = make_etag(request, version)
+        last_modified = int(updated_at.timestamp()) if updated_at else None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
@@ -0,0 +1,83 @@
+import csv
+
+from .renderers import dumps
+
+# сколько звеньев читается из серверного курсора за раз
+EXPORT_CHUNK_SIZE = 2000
+
+NODE_COLUMNS = (
+    "id",
+    "node_type",
+    "name",
+    "email",
+    "country",
+    "city",
+    "street",
+    "house_number",
+    "supplier_id",
+    "debt",
+    "created_at",
+    "level",
+)
+PRODUCT_COLUMNS = (
+    "product_id",
+    "product_name",
+    "product_model",
+    "product_release_date",
+)
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: write() просто возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def iter_nodes(queryset):
+    """
+    Звенья из серверного курсора порциями по EXPORT_CHUNK_SIZE;
+    prefetch_related("products") выполняется отдельно для каждой порции.
+    """
+    return queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def csv_rows(queryset):
+    """CSV: строка на каждый продукт звена (звено без продуктов — одна строка)."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(NODE_COLUMNS + PRODUCT_COLUMNS)
+    for node in iter_nodes(queryset):
+        node_row = (
+            node.id,
+            node.node_type,
+            node.name,
+            node.email,
+            node.country,
+            node.city,
+            node.street,
+            node.house_number,
+            node.supplier_id or "",
+            node.current_debt,
+            node.created_at.isoformat(),
+            node.depth,
+        )
+        products = node.products.all()
+        if not products:
+            yield writer.writerow(node_row + ("",) * len(PRODUCT_COLUMNS))
+        for product in products:
+            yield writer.writerow(
+                node_row
+                + (
+                    product.id,
+                    product.name,
+                    product.model,
+                    product.release_date.isoformat(),
+                )
+            )
+
+
+def ndjson_rows(queryset, serializer_class, context):
+    """NDJSON: одно звено (в формате API, с продуктами) на строку."""
+    for node in iter_nodes(queryset):
+        data = serializer_class(node, context=context).data
+        yield dumps(data) + b"\n"
@@ -0,0 +1,34 @@
+import factory
+from factory.django import DjangoModelFactory
+
+from .models import NetworkNode, Product
+
+
+class NetworkNodeFactory(DjangoModelFactory):
+    """Звено сети со случайными реквизитами (по умолчанию — завод)."""
+
+    class Meta:
+        model = NetworkNode
+
+    node_type = NetworkNode.FACTORY
+    name = factory.Faker("company", locale="ru_RU")
+    email = factory.Faker("company_email", locale="ru_RU")
+    country = factory.Faker("country", locale="ru_RU")
+    city = factory.Faker("city_name", locale="ru_RU")
+    street = factory.Faker("street_name", locale="ru_RU")
+    house_number = factory.Faker("building_number", locale="ru_RU")
+
+
+class ProductFactory(DjangoModelFactory):
+    """Продукт звена сети."""
+
+    class Meta:
+        model = Product
+
+    name = factory.Faker(
+        "random_element",
+        elements=("Телевизор", "Телефон", "Ноутбук", "Планшет", "Монитор", "Роутер"),
+    )
+    model = factory.Faker("bothify", text="??-####", letters="ABCDEFGHJKLMNPRSTUVXYZ")
+    release_date = factory.Faker("date_between", start_date="-10y")
+    supplier = factory.SubFactory(NetworkNodeFactory)
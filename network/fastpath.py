@@ -0,0 +1,194 @@
+"""
+Быстрая сериализация списков: ответ собирается прямо из строк values()
+без создания экземпляров моделей и без обхода полей ModelSerializer
+для каждого объекта.
+
+План (RowRepresentation) строится один раз на запрос из полей того же
+сериализатора, поэтому учитывает ?fields= / ?expand= и даёт тот же JSON:
+нетривиальные значения (Decimal, даты) преобразуются теми же полями DRF.
+Вложенные списки (products) читаются одним запросом на страницу —
+так же, как prefetch_related. Если в сериализаторе есть поле, которое
+план не умеет читать из values(), используется обычный путь.
+"""
+
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .metrics import serialization
+
+# поля, значение которых из values() уже совпадает с представлением DRF
+PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.ChoiceField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+class Unsupported(Exception):
+    """Поле нельзя прочитать из values() — нужен обычный путь."""
+
+
+def _converter(field):
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return None
+    if isinstance(field, serializers.RelatedField) or not isinstance(
+        field, serializers.Field
+    ):
+        raise Unsupported(field.field_name)
+    return field.to_representation
+
+
+class RowRepresentation:
+    """
+    Представление сериализатора для строк values().
+    columns — ключи values(), которые нужны плану; entries — поля ответа
+    в порядке сериализатора: (имя, вид, ключ строки, преобразование / план).
+    """
+
+    PLAIN, NESTED, MANY = "plain", "nested", "many"
+
+    def __init__(self, serializer, prefix=""):
+        self.model = serializer.Meta.model
+        self.columns = []
+        self.entries = []
+        # вложенные списки: имя -> (план, поле обратной связи)
+        self.many = {}
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+            if source == "*" or "." in source:
+                raise Unsupported(name)
+            key = prefix + source
+            if isinstance(field, serializers.ListSerializer):
+                if prefix:
+                    raise Unsupported(name)
+                relation = self.model._meta.get_field(source)
+                if not relation.one_to_many:
+                    raise Unsupported(name)
+                child = RowRepresentation(field.child)
+                if child.many:
+                    raise Unsupported(name)
+                self.many[name] = (child, relation.field.name)
+                self.entries.append((name, self.MANY, None, None))
+            elif isinstance(field, serializers.BaseSerializer):
+                child = RowRepresentation(field, prefix=f"{key}__")
+                self.columns += [key, *child.columns]
+                self.entries.append((name, self.NESTED, key, child))
+            else:
+                self.columns.append(key)
+                self.entries.append((name, self.PLAIN, key, _converter(field)))
+
+    @classmethod
+    def for_serializer(cls, serializer):
+        """План или None, если сериализатор не поддерживается."""
+        try:
+            return cls(serializer)
+        except Unsupported:
+            return None
+
+    def values(self, queryset, extra=()):
+        """
+        values() по нужным колонкам; extra — ключи, нужные не ответу,
+        а пагинации (ключи сортировки, аннотации).
+        """
+        columns = dict.fromkeys([*self.columns, *extra])
+        return queryset.select_related(None).prefetch_related(None).values(*columns)
+
+    def represent(self, rows):
+        """Список словарей ответа для строк values()."""
+        rows = list(rows)
+        related = {
+            name: self._fetch_many(child, field, rows)
+            for name, (child, field) in self.many.items()
+        }
+        return [self._represent_row(row, related) for row in rows]
+
+    def _represent_row(self, row, related=None):
+        item = {}
+        for name, kind, key, arg in self.entries:
+            if kind == self.PLAIN:
+                value = row[key]
+                if value is not None and arg is not None:
+                    value = arg(value)
+            elif kind == self.NESTED:
+                value = None if row[key] is None else arg._represent_row(row)
+            else:
+                value = related[name].get(row["id"], [])
+            item[name] = value
+        return item
+
+    async def arepresent(self, rows):
+        """represent для async-представлений: вложенные списки через aiterator."""
+        related = {
+            name: await self._afetch_many(child, field, rows)
+            for name, (child, field) in self.many.items()
+        }
+        return [self._represent_row(row, related) for row in rows]
+
+    @staticmethod
+    def _many_rows(child, field, rows):
+        pks = [row["id"] for row in rows]
+        queryset = child.model._default_manager.filter(**{f"{field}__in": pks})
+        return queryset.values(*dict.fromkeys([*child.columns, field]))
+
+    @classmethod
+    def _fetch_many(cls, child, field, rows):
+        """Вложенный список для всех строк страницы одним запросом."""
+        grouped = {}
+        if not rows:
+            return grouped
+        for row in cls._many_rows(child, field, rows):
+            grouped.setdefault(row[field], []).append(child._represent_row(row))
+        return grouped
+
+    @classmethod
+    async def _afetch_many(cls, child, field, rows):
+        grouped = {}
+        if not rows:
+            return grouped
+        async for row in cls._many_rows(child, field, rows).aiterator():
+            grouped.setdefault(row[field], []).append(child._represent_row(row))
+        return grouped
+
+
+class FastListMixin:
+    """
+    list вьюсета через RowRepresentation. Фильтры, поиск, сортировка
+    и пагинация те же, что у обычного list; fast_list = False отключает
+    быстрый путь (например, для сравнения ответов в тестах).
+    """
+
+    fast_list = True
+
+    def list(self, request, *args, **kwargs):
+        return self.list_response(self.get_queryset())
+
+    def list_response(self, queryset):
+        """Ответ как у list для произвольной выборки вьюсета."""
+        queryset = self.filter_queryset(queryset)
+        representation = None
+        if self.fast_list:
+            representation = RowRepresentation.for_serializer(self.get_serializer())
+        if representation is None:
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
+
+        extra = ["id", *getattr(self, "ordering_fields", ())]
+        if self.paginator is not None:
+            extra += [field.lstrip("-") for field in self.paginator.ordering]
+        extra += list(queryset.query.annotation_select)
+        rows = representation.values(queryset, extra)
+
+        page = self.paginate_queryset(rows)
+        with serialization(self.request):
+            data = representation.represent(rows if page is None else page)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,73 @@
+import operator
+from functools import reduce
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity,
+)
+from django.db import models
+from django.db.models.functions import Cast, Greatest
+from rest_framework import filters
+
+from .models import SEARCH_CONFIG, search_vector
+
+SEARCH_RANK = "search_rank"
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    Замена SearchFilter для PostgreSQL.
+    - Подстрочный поиск (icontains) как у SearchFilter, но по GIN-индексам
+      pg_trgm на UPPER(поле), а не последовательным сканированием.
+    - Дополнительно совпадения полнотекстового поиска (SearchVector + GIN).
+    - Результаты аннотируются search_rank: ts_rank + лучшая trigram-близость
+      термов к полям; без ?ordering= выдача сортируется по убыванию ранга.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+
+        if not search_fields or not search_terms:
+            return queryset
+
+        orm_lookups = [
+            self.construct_search(str(search_field), queryset)
+            for search_field in search_fields
+        ]
+        fields = [
+            str(field).lstrip("".join(self.lookup_prefixes)) for field in search_fields
+        ]
+
+        substring_match = reduce(
+            operator.and_,
+            (
+                reduce(
+                    operator.or_,
+                    (models.Q(**{orm_lookup: term}) for orm_lookup in orm_lookups),
+                )
+                for term in search_terms
+            ),
+        )
+        query = SearchQuery(
+            " ".join(search_terms), config=SEARCH_CONFIG, search_type="plain"
+        )
+        vector = search_vector(*fields)
+
+        similarity = [
+            TrigramWordSimilarity(term, field)
+            for term in search_terms
+            for field in fields
+        ]
+        rank = SearchRank(vector, query)
+        if similarity:
+            rank += Greatest(*similarity) if len(similarity) > 1 else similarity[0]
+
+        return (
+            queryset.alias(_search_vector=vector).filter(
+                substring_match | models.Q(_search_vector=query)
+            )
+            # double precision, чтобы позиция курсора по рангу не теряла точность
+            .annotate(**{SEARCH_RANK: Cast(rank, models.FloatField())})
+        )
@@ -0,0 +1,41 @@
+"""
+Проверка готовности процесса для балансировщика и оркестратора: каждая
+настроенная БД отвечает на SELECT 1. С пулом (DB_POOL) соединение берётся
+из пула — так проверяется и то, что пул не исчерпан дольше DB_POOL_TIMEOUT.
+"""
+
+from django.db import DatabaseError, connections
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+def check_database(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except DatabaseError:
+        return False
+    return True
+
+
+class HealthView(APIView):
+    """200, если все БД доступны, иначе 503. Без аутентификации."""
+
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+    swagger_schema = None
+
+    def get(self, request):
+        databases = {
+            connection.alias: "ok" if check_database(connection) else "unavailable"
+            for connection in connections.all()
+        }
+        healthy = all(state == "ok" for state in databases.values())
+        return Response(
+            {"status": "ok" if healthy else "unavailable", "databases": databases},
+            status=(
+                status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE
+            ),
+        )
@@ -0,0 +1,519 @@
+"""
+Массовая загрузка звеньев сети и продуктов через PostgreSQL COPY.
+
+Файлы копируются во временные staging-таблицы как текст, после чего все
+проверки (инварианты NetworkNode.clean, типы, длины, ссылки на поставщиков)
+выполняются набором UPDATE ... SET error = ... над всей таблицей сразу.
+Строки без ошибок получают id из последовательности network_networknode,
+path/depth вычисляются послойно (в топологическом порядке ссылок supplier_ref),
+и результат вставляется одним INSERT ... SELECT в каждую таблицу.
+"""
+
+import csv
+import json
+import time
+from pathlib import Path
+
+from django.db import connection, transaction
+
+from . import cache
+from .export import Echo
+from .models import (
+    MAX_DEPTH,
+    MAX_DEPTH_MESSAGE,
+    CollectionVersion,
+    NetworkNode,
+    Product,
+)
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+NODE_COLUMNS = (
+    "ref",
+    "node_type",
+    "name",
+    "email",
+    "country",
+    "city",
+    "street",
+    "house_number",
+    "supplier_ref",
+    "supplier_id",
+    "debt",
+)
+PRODUCT_COLUMNS = ("name", "model", "release_date", "supplier_ref", "supplier_id")
+
+NODE_STAGE = "import_network_node"
+PRODUCT_STAGE = "import_network_product"
+
+# numeric(12, 2)
+DEBT_RE = r"^-?\d{1,10}(\.\d{1,2})?$"
+# регулярное выражение для даты; реальность дня проверяется отдельно
+DATE_RE = r"^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])$"
+
+
+class ImportSourceError(Exception):
+    """Файл нельзя загрузить: неизвестный формат или колонки."""
+
+
+class LineStream:
+    """Файлоподобный объект поверх генератора строк — для COPY FROM STDIN."""
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buffer = ""
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._lines)
+            except StopIteration:
+                break
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def open_source(path, allowed_columns):
+    """
+    Возвращает (колонки, поток CSV без заголовка) для .csv, .json или
+    .ndjson/.jsonl. CSV передаётся в COPY как есть, JSON перекодируется в CSV
+    построчно (для очень больших файлов используйте NDJSON).
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    fh = open(path, newline="", encoding="utf-8")
+
+    if suffix == ".csv":
+        columns = next(csv.reader([fh.readline()]), [])
+        stream = fh
+    elif suffix in (".json", ".ndjson", ".jsonl"):
+        if suffix == ".json":
+            records = json.load(fh)
+        else:
+            records = (json.loads(line) for line in fh if line.strip())
+        columns = list(allowed_columns)
+        writer = csv.writer(Echo())
+        stream = LineStream(
+            writer.writerow([_csv_value(record.get(column)) for column in columns])
+            for record in records
+        )
+    else:
+        fh.close()
+        raise ImportSourceError(f"Неизвестный формат файла: {path.name}")
+
+    columns = [column.strip() for column in columns]
+    unknown = set(columns) - set(allowed_columns)
+    if unknown:
+        raise ImportSourceError(
+            f"{path.name}: неизвестные колонки {', '.join(sorted(unknown))}"
+        )
+    return columns, stream
+
+
+def _csv_value(value):
+    # пустая строка в CSV — NULL для COPY
+    return "" if value is None else value
+
+
+def copy_in(cursor, sql, stream):
+    """COPY ... FROM STDIN для psycopg2 и psycopg 3."""
+    raw = cursor.cursor
+    if hasattr(raw, "copy_expert"):
+        raw.copy_expert(sql, stream, size=COPY_BUFFER_SIZE)
+        return
+    with raw.copy(sql) as copy:
+        while chunk := stream.read(COPY_BUFFER_SIZE):
+            copy.write(chunk)
+
+
+def copy_out(cursor, sql, stream):
+    """COPY ... TO STDOUT для psycopg2 и psycopg 3."""
+    raw = cursor.cursor
+    if hasattr(raw, "copy_expert"):
+        raw.copy_expert(sql, stream)
+        return
+    with raw.copy(sql) as copy:
+        for chunk in copy:
+            stream.write(bytes(chunk).decode())
+
+
+def _length_checks(model, columns):
+    """(колонка, max_length) для текстовых полей модели."""
+    return [
+        (column, model._meta.get_field(column).max_length)
+        for column in columns
+        if getattr(model._meta.get_field(column), "max_length", None)
+    ]
+
+
+class NetworkImporter:
+    """
+    Загрузка одного набора файлов. Все шаги выполняются в одной транзакции;
+    при dry_run она откатывается, но отчёт формируется полностью.
+    """
+
+    def __init__(self, nodes_path=None, products_path=None, dry_run=False):
+        self.nodes_path = nodes_path
+        self.products_path = products_path
+        self.dry_run = dry_run
+        self.report = {"nodes": {}, "products": {}, "timings": {}}
+        self.rejected = {"nodes": [], "products": []}
+
+    def run(self, rejected_limit=20, rejects_dir=None):
+        started = time.perf_counter()
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                self.cursor = cursor
+                self._create_stages()
+                if self.nodes_path:
+                    self._timed("copy_nodes", self._copy, NODE_STAGE, self.nodes_path)
+                    self._timed("validate_nodes", self._validate_nodes)
+                    self._timed("resolve_nodes", self._resolve_nodes)
+                    self._timed("merge_nodes", self._merge_nodes)
+                    self._collect("nodes", NODE_STAGE, "ref", rejected_limit)
+                if self.products_path:
+                    self._timed(
+                        "copy_products", self._copy, PRODUCT_STAGE, self.products_path
+                    )
+                    self._timed("validate_products", self._validate_products)
+                    self._timed("merge_products", self._merge_products)
+                    self._collect("products", PRODUCT_STAGE, "name", rejected_limit)
+                if rejects_dir:
+                    self._write_rejects(Path(rejects_dir))
+            if self.dry_run:
+                transaction.set_rollback(True)
+            else:
+                # COPY и INSERT ... SELECT идут мимо сигналов моделей
+                cache.invalidate(cache.NODES, cache.PRODUCTS)
+                CollectionVersion.bump(cache.NODES, cache.PRODUCTS)
+
+        total = time.perf_counter() - started
+        loaded = self.report["nodes"].get("loaded", 0) + self.report["products"].get(
+            "loaded", 0
+        )
+        self.report["timings"]["total"] = round(total, 3)
+        self.report["rows_per_second"] = round(loaded / total) if total else 0
+        return self.report
+
+    def _timed(self, name, func, *args):
+        started = time.perf_counter()
+        func(*args)
+        self.report["timings"][name] = round(time.perf_counter() - started, 3)
+
+    def _execute(self, sql, params=None):
+        self.cursor.execute(sql, params)
+        return self.cursor.rowcount
+
+    def _reject(self, table, message, condition, params=None):
+        """Помечает ошибкой ещё не отклонённые строки, подходящие под условие."""
+        return self._execute(
+            f"UPDATE {table} AS s SET error = %s "
+            f"WHERE s.error IS NULL AND ({condition})",
+            [message, *(params or [])],
+        )
+
+    def _create_stages(self):
+        node_columns = ", ".join(f"{column} text" for column in NODE_COLUMNS)
+        product_columns = ", ".join(f"{column} text" for column in PRODUCT_COLUMNS)
+        self._execute(f"DROP TABLE IF EXISTS {NODE_STAGE}, {PRODUCT_STAGE}")
+        self._execute(
+            f"""
+            CREATE TEMP TABLE {NODE_STAGE} (
+                row_no bigserial, {node_columns},
+                supplier_pk bigint,
+                new_id bigint, parent_id bigint, path text, depth integer,
+                level integer,
+                error text
+            ) ON COMMIT DROP
+            """
+        )
+        self._execute(
+            f"""
+            CREATE TEMP TABLE {PRODUCT_STAGE} (
+                row_no bigserial, {product_columns},
+                supplier_pk bigint, error text
+            ) ON COMMIT DROP
+            """
+        )
+
+    def _copy(self, table, path):
+        allowed = NODE_COLUMNS if table == NODE_STAGE else PRODUCT_COLUMNS
+        columns, stream = open_source(path, allowed)
+        try:
+            copy_in(
+                self.cursor,
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                stream,
+            )
+        finally:
+            if hasattr(stream, "close"):
+                stream.close()
+        # индексы для разрешения ссылок; строятся после COPY, а не во время
+        if table == NODE_STAGE:
+            self._execute(f"CREATE INDEX ON {table} (ref)")
+            self._execute(f"CREATE INDEX ON {table} (level)")
+        self._execute(f"CREATE INDEX ON {table} (supplier_ref)")
+        self._execute(f"ANALYZE {table}")
+        key = "nodes" if table == NODE_STAGE else "products"
+        self.cursor.execute(f"SELECT count(*) FROM {table}")
+        self.report[key]["loaded"] = self.cursor.fetchone()[0]
+
+    def _validate_common(self, table, model, required):
+        """Обязательные поля, длины и supplier_id — одинаково для обеих таблиц."""
+        empty = " OR ".join(f"coalesce(s.{column}, '') = ''" for column in required)
+        self._reject(table, "Не заполнены обязательные поля.", empty)
+        for column, max_length in _length_checks(model, required):
+            self._reject(
+                table,
+                f"Поле {column} длиннее {max_length} символов.",
+                f"char_length(s.{column}) > %s",
+                [max_length],
+            )
+
+        self._execute(
+            f"UPDATE {table} SET supplier_pk = supplier_id::bigint "
+            r"WHERE supplier_id ~ '^\d{1,18}$'"
+        )
+        self._reject(
+            table,
+            "Укажите либо supplier_id, либо supplier_ref.",
+            "coalesce(s.supplier_id, '') <> '' AND coalesce(s.supplier_ref, '') <> ''",
+        )
+        self._reject(
+            table,
+            "Некорректный supplier_id.",
+            "coalesce(s.supplier_id, '') <> '' AND s.supplier_pk IS NULL",
+        )
+        self._reject(
+            table,
+            "Поставщик с таким supplier_id не существует.",
+            f"s.supplier_pk IS NOT NULL AND NOT EXISTS ("
+            f"SELECT 1 FROM {NetworkNode._meta.db_table} AS n "
+            f"WHERE n.id = s.supplier_pk)",
+        )
+
+    def _validate_nodes(self):
+        t = NODE_STAGE
+        self._validate_common(
+            t,
+            NetworkNode,
+            ("name", "email", "country", "city", "street", "house_number"),
+        )
+
+        self._execute(
+            f"UPDATE {t} SET node_type = %s WHERE coalesce(node_type, '') = ''",
+            [NetworkNode.FACTORY],
+        )
+        self._reject(
+            t,
+            "Неизвестный тип звена.",
+            "s.node_type <> ALL(%s)",
+            [[value for value, _ in NetworkNode.NODE_TYPES]],
+        )
+        self._reject(
+            t,
+            "Некорректная задолженность.",
+            f"coalesce(s.debt, '') <> '' AND s.debt !~ '{DEBT_RE}'",
+        )
+
+        # инварианты NetworkNode.clean
+        has_supplier = (
+            "(coalesce(s.supplier_ref, '') <> '' OR coalesce(s.supplier_id, '') <> '')"
+        )
+        self._reject(
+            t,
+            "У завода не может быть поставщика.",
+            f"s.node_type = %s AND {has_supplier}",
+            [NetworkNode.FACTORY],
+        )
+        self._reject(
+            t,
+            "У завода не может быть задолженности перед поставщиком.",
+            f"s.node_type = %s AND CASE WHEN s.debt ~ '{DEBT_RE}' "
+            f"THEN s.debt::numeric <> 0 ELSE false END",
+            [NetworkNode.FACTORY],
+        )
+        self._reject(
+            t, "Поставщик не может быть самим собой.", "s.supplier_ref = s.ref"
+        )
+
+        self._reject(
+            t,
+            "Повторяющийся ref.",
+            f"s.ref IN (SELECT ref FROM {t} WHERE ref IS NOT NULL "
+            f"GROUP BY ref HAVING count(*) > 1)",
+        )
+        self._reject(
+            t,
+            "В файле нет звена с таким supplier_ref.",
+            f"coalesce(s.supplier_ref, '') <> '' AND NOT EXISTS ("
+            f"SELECT 1 FROM {t} AS p WHERE p.ref = s.supplier_ref)",
+        )
+
+    def _resolve_nodes(self):
+        """
+        Раздаём id из последовательности и вычисляем path/depth послойно:
+        сначала звенья без supplier_ref, затем их клиенты и т.д.
+        Клиенты отклонённых звеньев и циклы отклоняются после обхода.
+        """
+        t = NODE_STAGE
+        nodes = NetworkNode._meta.db_table
+        # id раздаются в том же UPDATE, что и path: каждая строка пишется один раз
+        new_id = f"nextval(pg_get_serial_sequence('{nodes}', 'id'))"
+        self._execute(
+            f"UPDATE {t} SET new_id = {new_id}, path = '', depth = 0, level = 0 "
+            f"WHERE error IS NULL "
+            f"AND coalesce(supplier_ref, '') = '' AND supplier_pk IS NULL"
+        )
+        self._execute(
+            f"UPDATE {t} AS s SET new_id = {new_id}, "
+            f"path = n.path || n.id || '/', depth = n.depth + 1, level = 0 "
+            f"FROM {nodes} AS n WHERE n.id = s.supplier_pk AND s.error IS NULL"
+        )
+        # level — номер слоя внутри файла: на каждом шаге обрабатываются
+        # только клиенты предыдущего слоя, а не вся таблица
+        level = 0
+        while self._execute(
+            f"""
+            UPDATE {t} AS c
+            SET new_id = {new_id},
+                path = p.path || p.new_id || '/',
+                depth = p.depth + 1,
+                level = p.level + 1,
+                parent_id = p.new_id
+            FROM {t} AS p
+            WHERE p.level = %s
+              AND c.supplier_ref = p.ref
+              AND c.error IS NULL AND c.path IS NULL
+              AND p.error IS NULL
+            """,
+            [level],
+        ):
+            level += 1
+
+        # вместе со слишком глубокими звеньями отклоняются и их клиенты — они ещё глубже
+        self._reject(t, MAX_DEPTH_MESSAGE, "s.depth > %s", [MAX_DEPTH])
+        while self._reject(
+            t,
+            "Поставщик из файла отклонён.",
+            f"s.path IS NULL AND EXISTS (SELECT 1 FROM {t} AS p "
+            f"WHERE p.ref = s.supplier_ref AND p.error IS NOT NULL)",
+        ):
+            pass
+        self._reject(t, "Циклическая ссылка на поставщика.", "s.path IS NULL")
+
+    def _merge_nodes(self):
+        self.report["nodes"]["inserted"] = self._execute(
+            f"""
+            INSERT INTO {NetworkNode._meta.db_table} (
+                id, node_type, name, email, country, city, street, house_number,
+                supplier_id, debt, debt_entry_id, created_at, updated_at,
+                depth, path
+            )
+            SELECT new_id, node_type, name, email, country, city, street,
+                   house_number, coalesce(parent_id, supplier_pk),
+                   coalesce(nullif(debt, ''), '0')::numeric(12, 2), 0,
+                   now(), now(), depth, path
+            FROM {NODE_STAGE}
+            WHERE error IS NULL
+            ORDER BY depth, row_no
+            """
+        )
+
+    def _validate_products(self):
+        t = PRODUCT_STAGE
+        self._validate_common(t, Product, ("name", "model", "release_date"))
+        self._reject(
+            t,
+            "Некорректная дата выхода.",
+            # CASE гарантирует, что число дня сравнивается только для строк,
+            # прошедших регулярное выражение, и приведение к date не упадёт
+            f"""CASE WHEN s.release_date ~ '{DATE_RE}' THEN
+                substr(s.release_date, 9, 2)::int > extract(day FROM (
+                    make_date(substr(s.release_date, 1, 4)::int,
+                              substr(s.release_date, 6, 2)::int, 1)
+                    + interval '1 month - 1 day'))
+            ELSE true END""",
+        )
+        self._reject(
+            t,
+            "Не указан поставщик.",
+            "coalesce(s.supplier_ref, '') = '' AND s.supplier_pk IS NULL",
+        )
+        if self.nodes_path:
+            self._reject(
+                t,
+                "Поставщик из файла отклонён.",
+                f"EXISTS (SELECT 1 FROM {NODE_STAGE} AS n "
+                f"WHERE n.ref = s.supplier_ref AND n.error IS NOT NULL)",
+            )
+            self._reject(
+                t,
+                "В файле звеньев нет звена с таким supplier_ref.",
+                f"coalesce(s.supplier_ref, '') <> '' AND NOT EXISTS ("
+                f"SELECT 1 FROM {NODE_STAGE} AS n WHERE n.ref = s.supplier_ref)",
+            )
+        else:
+            self._reject(
+                t,
+                "supplier_ref без файла звеньев.",
+                "coalesce(s.supplier_ref, '') <> ''",
+            )
+
+    def _merge_products(self):
+        self.report["products"]["inserted"] = self._execute(
+            f"""
+            INSERT INTO {Product._meta.db_table}
+                (name, model, release_date, supplier_id, updated_at)
+            SELECT s.name, s.model, s.release_date::date,
+                   coalesce(s.supplier_pk, n.new_id), now()
+            FROM {PRODUCT_STAGE} AS s
+            LEFT JOIN {NODE_STAGE} AS n ON n.ref = s.supplier_ref
+            WHERE s.error IS NULL
+            ORDER BY s.row_no
+            """
+        )
+        # продукты встроены в ответ звена: у существующих поставщиков
+        # меняется updated_at, а с ним и ETag
+        self._execute(
+            f"""
+            UPDATE {NetworkNode._meta.db_table} SET updated_at = now()
+            WHERE id IN (
+                SELECT supplier_pk FROM {PRODUCT_STAGE}
+                WHERE error IS NULL AND supplier_pk IS NOT NULL
+            )
+            """
+        )
+
+    def _collect(self, key, table, label, limit):
+        self.cursor.execute(f"SELECT count(*) FROM {table} WHERE error IS NOT NULL")
+        self.report[key]["rejected"] = self.cursor.fetchone()[0]
+        self.cursor.execute(
+            f"SELECT row_no, {label}, error FROM {table} "
+            f"WHERE error IS NOT NULL ORDER BY row_no LIMIT %s",
+            [limit],
+        )
+        self.rejected[key] = self.cursor.fetchall()
+
+    def _write_rejects(self, directory):
+        """Все отклонённые строки с причиной — в CSV рядом с исходными файлами."""
+        directory.mkdir(parents=True, exist_ok=True)
+        for key, table, path in (
+            ("nodes", NODE_STAGE, self.nodes_path),
+            ("products", PRODUCT_STAGE, self.products_path),
+        ):
+            if not path:
+                continue
+            columns = NODE_COLUMNS if table == NODE_STAGE else PRODUCT_COLUMNS
+            with open(
+                directory / f"{key}_rejected.csv", "w", newline="", encoding="utf-8"
+            ) as fh:
+                copy_out(
+                    self.cursor,
+                    f"COPY (SELECT row_no, {', '.join(columns)}, error FROM {table} "
+                    f"WHERE error IS NOT NULL ORDER BY row_no) "
+                    f"TO STDOUT WITH (FORMAT csv, HEADER true)",
+                    fh,
+                )
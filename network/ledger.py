@@ -0,0 +1,166 @@
+"""
+Журнал задолженности звеньев.
+
+Задолженность меняется только добавлением проводок DebtEntry, поэтому
+параллельные списания и начисления не конкурируют за строку звена.
+Текущий долг — снимок NetworkNode.debt плюс сумма проводок после
+NetworkNode.debt_entry_id (NetworkNodeQuerySet.with_current_debt).
+snapshot() периодически переносит хвост журнала в снимок, чтобы хвосты
+оставались короткими. apply_rule() проводит правило DebtRule по всем
+звеньям типа пакетами INSERT ... SELECT, не читая звенья в Python.
+"""
+
+from django.db import connection, transaction
+
+from . import cache
+from .models import CollectionVersion, DebtEntry, DebtRule, NetworkNode
+
+# сериализует параллельные запуски snapshot()
+SNAPSHOT_LOCK_ID = 0x6E657464  # "netd"
+# звеньев в одной транзакции apply_rule()
+RULE_CHUNK_SIZE = 10_000
+# верхняя граница id для последнего пакета
+MAX_NODE_ID = 2**63 - 1
+
+
+def post(entries):
+    """Проводки одним INSERT; ответы API по звеньям сбрасываются."""
+    entries = DebtEntry.objects.bulk_create(entries)
+    node_ids = {entry.node_id for entry in entries}
+    if node_ids:
+        cache.invalidate_nodes(node_ids)
+        CollectionVersion.bump(cache.NODES)
+    return entries
+
+
+def clear(queryset, comment="Обнуление задолженности"):
+    """
+    Обнуляет задолженность звеньев queryset: каждому звену с ненулевым
+    долгом — одна проводка на минус текущий долг.
+    """
+    balances = (
+        queryset.with_current_debt()
+        .exclude(current_debt=0)
+        .values_list("pk", "current_debt")
+    )
+    return post(
+        [
+            DebtEntry(node_id=pk, amount=-balance, comment=comment)
+            for pk, balance in balances
+        ]
+    )
+
+
+def snapshot():
+    """
+    Переносит проводки в снимки звеньев одним UPDATE ... FROM.
+
+    Граница снимка — максимальный id журнала, прочитанный в отдельной
+    транзакции под SHARE-блокировкой таблицы: блокировка дожидается
+    транзакций, уже вставляющих проводки, поэтому все строки до границы
+    зафиксированы и ни одна не окажется «за спиной» снимка. Новые проводки
+    ждут только это короткое чтение, а не сам UPDATE. Вызывать вне
+    транзакции: иначе блокировка держится до её конца.
+    Возвращает число обновлённых звеньев.
+    """
+    entries = DebtEntry._meta.db_table
+    nodes = NetworkNode._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {entries} IN SHARE MODE")
+        cursor.execute(f"SELECT coalesce(max(id), 0) FROM {entries}")
+        upto = cursor.fetchone()[0]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # параллельный запуск ждёт и затем видит уже сдвинутые debt_entry_id
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [SNAPSHOT_LOCK_ID])
+        cursor.execute(
+            f"""
+            UPDATE {nodes} AS n
+            SET debt = n.debt + t.amount, debt_entry_id = t.last_id
+            FROM (
+                SELECT e.node_id, sum(e.amount) AS amount, max(e.id) AS last_id
+                FROM {entries} AS e
+                JOIN {nodes} AS m ON m.id = e.node_id
+                WHERE e.id > m.debt_entry_id AND e.id <= %s
+                GROUP BY e.node_id
+            ) AS t
+            WHERE n.id = t.node_id
+            """,
+            [upto],
+        )
+        return cursor.rowcount
+
+
+def apply_rule(rule_id, chunk_size=RULE_CHUNK_SIZE):
+    """
+    Применяет правило DebtRule, если пора, пакетами по chunk_size звеньев.
+
+    Пакет — одна короткая транзакция: строка правила под FOR UPDATE
+    (её cursor — граница уже обработанных звеньев) и один INSERT ... SELECT
+    проводок, где текущий долг считается в SQL. Строки звеньев не
+    блокируются; параллельный запуск того же правила ждёт пакет и
+    продолжает с нового cursor, поэтому проводка на звено за период одна.
+    Прерванный запуск продолжается с cursor при следующем вызове.
+    Возвращает число проводок.
+    """
+    entries = DebtEntry._meta.db_table
+    nodes = NetworkNode._meta.db_table
+    posted = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            rule = (
+                DebtRule.objects.select_for_update()
+                .filter(pk=rule_id, is_active=True)
+                .first()
+            )
+            if rule is None or not rule.is_due():
+                return posted
+            cursor.execute(
+                f"""
+                SELECT id FROM {nodes}
+                WHERE node_type = %s AND id > %s
+                ORDER BY id OFFSET %s LIMIT 1
+                """,
+                [rule.node_type, rule.cursor, chunk_size - 1],
+            )
+            row = cursor.fetchone()
+            upto = row[0] if row else MAX_NODE_ID
+            cursor.execute(
+                f"""
+                INSERT INTO {entries} (node_id, amount, comment, created_at)
+                SELECT id, delta, %s, now() FROM (
+                    SELECT n.id, GREATEST(
+                        round(%s + b.balance * %s / 100, 2),
+                        -GREATEST(b.balance, 0)
+                    ) AS delta
+                    FROM {nodes} AS n
+                    CROSS JOIN LATERAL (
+                        SELECT n.debt + coalesce(sum(e.amount), 0) AS balance
+                        FROM {entries} AS e
+                        WHERE e.node_id = n.id AND e.id > n.debt_entry_id
+                    ) AS b
+                    WHERE n.node_type = %s AND n.id > %s AND n.id <= %s
+                ) AS d
+                WHERE delta <> 0
+                RETURNING node_id
+                """,
+                [
+                    rule.name,
+                    rule.amount,
+                    rule.percent,
+                    rule.node_type,
+                    rule.cursor,
+                    upto,
+                ],
+            )
+            node_ids = [node_id for (node_id,) in cursor.fetchall()]
+            if row is None:
+                rule.cursor = 0
+                rule.schedule_next()
+            else:
+                rule.cursor = upto
+            rule.save(update_fields=["cursor", "next_run_at"])
+            if node_ids:
+                cache.invalidate_nodes(node_ids)
+                CollectionVersion.bump(cache.NODES)
+            posted += len(node_ids)
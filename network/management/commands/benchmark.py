@@ -0,0 +1,321 @@
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import django
+import factory.random
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from network.factories import NetworkNodeFactory, ProductFactory
+from network.models import NetworkNode, Product
+
+User = get_user_model()
+
+
+def split_evenly(total, parts):
+    """Делим total на parts почти равных частей."""
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def percentile(values, fraction):
+    """Перцентиль по отсортированной выборке (ближайший ранг)."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк API сети на синтетических данных: для каждого размера сети "
+        "генерирует заводы с глубокими цепочками поставщиков и продукты, затем "
+        "замеряет время, число запросов к БД и пиковую память для list, "
+        "retrieve, search, filter и create на /api/nodes/ и /api/products/. "
+        "По умолчанию работает во временной тестовой БД."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[10_000, 100_000],
+            help="Число звеньев сети для каждого прогона.",
+        )
+        parser.add_argument("--factories", type=int, default=10)
+        parser.add_argument(
+            "--depth", type=int, default=5, help="Число уровней под заводами."
+        )
+        parser.add_argument("--products-per-node", type=int, default=2)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--output", help="Путь к JSON с результатами (по умолчанию stdout)."
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Не удалять тестовую БД после прогона.",
+        )
+
+    def handle(self, *args, **options):
+        if min(options["depth"], options["factories"], options["repeat"]) < 1:
+            raise CommandError(
+                "--depth, --factories и --repeat должны быть не меньше 1."
+            )
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+        )
+        try:
+            results = [
+                self.run_size(size, options) for size in sorted(options["sizes"])
+            ]
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options["keepdb"]
+            )
+            teardown_test_environment()
+
+        report = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": f"{connection.vendor} {connection.pg_version}",
+                "options": {
+                    key: options[key]
+                    for key in (
+                        "sizes",
+                        "factories",
+                        "depth",
+                        "products_per_node",
+                        "repeat",
+                        "seed",
+                    )
+                },
+            },
+            "results": results,
+        }
+        payload = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                fh.write(payload)
+            self.stdout.write(self.style.SUCCESS(f"Результаты: {options['output']}"))
+        else:
+            self.stdout.write(payload)
+
+    def run_size(self, size, options):
+        self.stdout.write(f"Размер сети {size}: генерация данных…")
+        self.reset_tables()
+        started = time.perf_counter()
+        self.generate_network(size, options)
+        generation_seconds = time.perf_counter() - started
+        counts = {
+            "nodes": NetworkNode.objects.count(),
+            "products": Product.objects.count(),
+        }
+
+        user = User.objects.create_user(
+            email="benchmark@example.com",
+            password="benchmark",
+            is_staff=True,
+            is_active=True,
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        rng = random.Random(options["seed"])
+        measurements = []
+        for endpoint, operation, method, make_request in self.scenarios(rng):
+            result = self.measure(client, method, make_request, options["repeat"])
+            measurements.append(
+                {"endpoint": endpoint, "operation": operation, **result}
+            )
+            self.stdout.write(
+                f"  {endpoint} {operation}: "
+                f"median {result['latency_ms']['median']:.1f} ms, "
+                f"{result['queries']} запросов, "
+                f"{result['peak_memory_kb']:.0f} KiB"
+            )
+        return {
+            "size": size,
+            **counts,
+            "generation_seconds": round(generation_seconds, 3),
+            "measurements": measurements,
+        }
+
+    def reset_tables(self):
+        """TRUNCATE вместо delete(): без сигналов и каскада в Python."""
+        tables = ", ".join(
+            model._meta.db_table for model in (Product, NetworkNode, User)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {tables} RESTART IDENTITY CASCADE")
+
+    def generate_network(self, size, options):
+        """
+        Заполняем сеть послойно через bulk_create: заводы, затем depth уровней
+        клиентов, у каждого случайный поставщик с предыдущего уровня.
+        path/depth выставляются сразу, т.к. bulk_create не вызывает save().
+        """
+        rng = random.Random(options["seed"])
+        factory.random.reseed_random(options["seed"])
+        batch_size = options["batch_size"]
+
+        factories = min(options["factories"], size)
+        levels = [factories] + split_evenly(size - factories, options["depth"])
+
+        previous = []
+        for depth, count in enumerate(levels):
+            current = []
+            for start in range(0, count, batch_size):
+                nodes = NetworkNodeFactory.build_batch(min(batch_size, count - start))
+                for node in nodes:
+                    if depth:
+                        supplier_id, supplier_path = rng.choice(previous)
+                        node.node_type = rng.choice(
+                            (NetworkNode.RETAIL, NetworkNode.ENTREPRENEUR)
+                        )
+                        node.supplier_id = supplier_id
+                        node.path = f"{supplier_path}{supplier_id}/"
+                        node.depth = depth
+                        node.debt = Decimal(rng.randint(0, 10**7)) / 100
+                NetworkNode.objects.bulk_create(nodes)
+                current += [(node.pk, node.path) for node in nodes]
+
+                products = [
+                    ProductFactory.build(supplier=node)
+                    for node in nodes
+                    for _ in range(options["products_per_node"])
+                ]
+                Product.objects.bulk_create(products, batch_size=batch_size)
+            previous = current
+
+    def scenarios(self, rng):
+        """(endpoint, операция, метод, фабрика (url, data)) для замеров."""
+        bounds = NetworkNode.objects.aggregate(low=Min("id"), high=Max("id"))
+        product_bounds = Product.objects.aggregate(low=Min("id"), high=Max("id"))
+        sample = NetworkNode.objects.filter(depth__gt=0).first()
+        if sample is None:
+            sample = NetworkNode.objects.first()
+
+        def node_id():
+            return rng.randint(bounds["low"], bounds["high"])
+
+        def product_id():
+            return rng.randint(product_bounds["low"], product_bounds["high"])
+
+        nodes = reverse("node-list")
+        products = reverse("product-list")
+
+        def new_node():
+            return nodes, {
+                "node_type": NetworkNode.RETAIL,
+                "name": "Бенчмарк",
+                "email": "bench@example.com",
+                "country": sample.country,
+                "city": sample.city,
+                "street": sample.street,
+                "house_number": "1",
+                "supplier": node_id(),
+            }
+
+        def new_product():
+            return products, {
+                "name": "Телевизор",
+                "model": "BENCH-1",
+                "release_date": "2024-01-01",
+                "supplier": node_id(),
+            }
+
+        return [
+            ("nodes", "list", "get", lambda: (nodes, None)),
+            (
+                "nodes",
+                "retrieve",
+                "get",
+                lambda: (reverse("node-detail", args=[node_id()]), None),
+            ),
+            ("nodes", "search", "get", lambda: (nodes, {"search": sample.city})),
+            ("nodes", "filter", "get", lambda: (nodes, {"country": sample.country})),
+            ("nodes", "create", "post", new_node),
+            ("products", "list", "get", lambda: (products, None)),
+            (
+                "products",
+                "retrieve",
+                "get",
+                lambda: (reverse("product-detail", args=[product_id()]), None),
+            ),
+            (
+                "products",
+                "search",
+                "get",
+                lambda: (products, {"search": "Телевизор"}),
+            ),
+            (
+                "products",
+                "filter",
+                "get",
+                lambda: (products, {"supplier": node_id()}),
+            ),
+            ("products", "create", "post", new_product),
+        ]
+
+    def measure(self, client, method, make_request, repeat):
+        """
+        Время меряется отдельно от памяти: tracemalloc сам замедляет код.
+        Число запросов и пиковая память — по одному дополнительному вызову.
+        """
+
+        def call():
+            url, data = make_request()
+            response = getattr(client, method)(url, data)
+            if response.status_code >= 400:
+                raise CommandError(f"{method.upper()} {url}: {response.status_code}")
+            return response
+
+        call()  # прогрев
+
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            call()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                call()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "latency_ms": {
+                "min": round(min(latencies), 3),
+                "median": round(statistics.median(latencies), 3),
+                "p95": round(percentile(latencies, 0.95), 3),
+                "max": round(max(latencies), 3),
+            },
+            "queries": len(queries),
+            "peak_memory_kb": round(peak / 1024, 1),
+        }
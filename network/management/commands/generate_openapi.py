@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from drf_yasg.views import SPEC_RENDERERS
+
+from config.schema import code_version, generate_schema, render_schema, schema_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит OpenAPI-схему API один раз и сохраняет её во всех форматах "
+        "(yaml, json, openapi) в OPENAPI_SCHEMA_DIR с версией кода в имени "
+        "файла. /swagger/ и /redoc/ отдают схему из этих файлов, пока код "
+        "не изменится. Запускается при сборке или деплое."
+    )
+
+    def handle(self, *args, **options):
+        schema = generate_schema()
+        for renderer_class in SPEC_RENDERERS:
+            path = schema_path(renderer_class.format)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(render_schema(schema, renderer_class))
+            self.stdout.write(str(path))
+        self.stdout.write(self.style.SUCCESS(f"Версия схемы: {code_version()}"))
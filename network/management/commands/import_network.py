@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from network.importer import ImportSourceError, NetworkImporter
+
+
+class Command(BaseCommand):
+    help = (
+        "Массовая загрузка звеньев и продуктов из CSV/JSON/NDJSON через "
+        "PostgreSQL COPY. Звенья ссылаются на поставщиков из того же файла "
+        "через ref/supplier_ref или на существующие звенья через supplier_id; "
+        "продукты — так же через supplier_ref/supplier_id. Некорректные строки "
+        "отклоняются с причиной, остальные загружаются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--nodes", help="Файл звеньев (.csv, .json, .ndjson).")
+        parser.add_argument("--products", help="Файл продуктов (.csv, .json, .ndjson).")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Выполнить все проверки и откатить транзакцию.",
+        )
+        parser.add_argument(
+            "--show-rejected",
+            type=int,
+            default=20,
+            help="Сколько отклонённых строк вывести в отчёт.",
+        )
+        parser.add_argument(
+            "--rejects-dir",
+            help="Каталог для CSV со всеми отклонёнными строками и причинами.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["nodes"] and not options["products"]:
+            raise CommandError("Укажите --nodes и/или --products.")
+
+        importer = NetworkImporter(
+            nodes_path=options["nodes"],
+            products_path=options["products"],
+            dry_run=options["dry_run"],
+        )
+        try:
+            report = importer.run(
+                rejected_limit=options["show_rejected"],
+                rejects_dir=options["rejects_dir"],
+            )
+        except (OSError, ImportSourceError) as exc:
+            raise CommandError(str(exc)) from exc
+
+        for key, title in (("nodes", "Звенья"), ("products", "Продукты")):
+            counts = report[key]
+            if not counts:
+                continue
+            self.stdout.write(
+                f"{title}: загружено {counts['loaded']}, "
+                f"добавлено {counts.get('inserted', 0)}, "
+                f"отклонено {counts['rejected']}"
+            )
+            for row_no, label, error in importer.rejected[key]:
+                self.stdout.write(f"  строка {row_no} ({label or '—'}): {error}")
+
+        timings = ", ".join(
+            f"{name} {seconds:.2f} с" for name, seconds in report["timings"].items()
+        )
+        self.stdout.write(f"Время: {timings}")
+        self.stdout.write(f"Скорость: {report['rows_per_second']} строк/с")
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING("Пробный запуск: изменения отменены."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Загрузка завершена."))
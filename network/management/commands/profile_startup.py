@@ -0,0 +1,126 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# выполняется в отдельном интерпретаторе: импорты текущего процесса
+# уже прогреты и на замер не годятся
+SCRIPT = r"""
+import json
+import time
+
+started = time.perf_counter()
+
+import django
+from django.apps import AppConfig
+
+ready_times = {}
+create = AppConfig.create.__func__
+
+
+def timed_create(cls, entry):
+    app_config = create(cls, entry)
+    ready = app_config.ready
+
+    def timed_ready():
+        begin = time.perf_counter()
+        ready()
+        ready_times[app_config.label] = time.perf_counter() - begin
+
+    app_config.ready = timed_ready
+    return app_config
+
+
+AppConfig.create = classmethod(timed_create)
+phases = {}
+
+begin = time.perf_counter()
+django.setup(set_prefix=False)
+phases["django.setup()"] = time.perf_counter() - begin
+
+begin = time.perf_counter()
+from django.urls import get_resolver
+
+get_resolver().url_patterns
+phases["URLConf"] = time.perf_counter() - begin
+
+begin = time.perf_counter()
+if HANDLER == "asgi":
+    from django.core.asgi import get_asgi_application as get_application
+else:
+    from django.core.wsgi import get_wsgi_application as get_application
+get_application()
+phases[HANDLER + " handler"] = time.perf_counter() - begin
+
+phases["total"] = time.perf_counter() - started
+print(json.dumps({"phases": phases, "ready": ready_times}))
+"""
+
+
+def parse_importtime(stderr):
+    """[(модуль, собственное время, с вложенными), мкс] из -X importtime."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.partition(":")[2].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Профиль холодного старта воркера: время фаз (django.setup(), "
+        "URLConf, WSGI/ASGI-обработчик), ready() каждого приложения и самые "
+        "дорогие импорты — по модулям и по пакетам. Замер выполняется "
+        "в отдельном процессе с python -X importtime."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--handler", choices=("wsgi", "asgi"), default="wsgi", help="Обработчик."
+        )
+        parser.add_argument(
+            "--limit", type=int, default=15, help="Строк в списках импортов."
+        )
+
+    def handle(self, *args, **options):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+        script = f"HANDLER = {options['handler']!r}\n{SCRIPT}"
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", script],
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=settings.BASE_DIR,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        modules = parse_importtime(result.stderr)
+        limit = options["limit"]
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Фазы старта, мс"))
+        for phase, seconds in report["phases"].items():
+            self.stdout.write(f"  {phase:<24} {seconds * 1000:9.1f}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING("ready() приложений, мс"))
+        for label, seconds in sorted(report["ready"].items(), key=lambda x: -x[1]):
+            self.stdout.write(f"  {label:<24} {seconds * 1000:9.1f}")
+
+        self.stdout.write(
+            self.style.MIGRATE_HEADING("Импорты модулей (с вложенными), мс")
+        )
+        for name, _, cumulative in sorted(modules, key=lambda m: -m[2])[:limit]:
+            self.stdout.write(f"  {name:<48} {cumulative / 1000:9.1f}")
+
+        packages = defaultdict(int)
+        for name, self_us, _ in modules:
+            packages[name.split(".")[0]] += self_us
+        self.stdout.write(self.style.MIGRATE_HEADING("Импорты по пакетам, мс"))
+        for package, self_us in sorted(packages.items(), key=lambda x: -x[1])[:limit]:
+            self.stdout.write(f"  {package:<48} {self_us / 1000:9.1f}")
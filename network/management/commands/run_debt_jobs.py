@@ -0,0 +1,97 @@
+import signal
+import time
+from concurrent.futures import wait
+from functools import partial
+
+from django.core.management.base import BaseCommand
+
+from network import ledger
+from network.models import DebtRule
+from network.scheduler import Job, Scheduler
+
+
+class Command(BaseCommand):
+    help = (
+        "Периодические задачи по задолженности в этом процессе, без брокера: "
+        "активные правила DebtRule (начисления и списания по типам звеньев) "
+        "и снимки журнала. Список правил перечитывается каждые --poll секунд, "
+        "так что новые и изменённые в админке правила подхватываются без "
+        "перезапуска. Задачи выполняются в пуле потоков; по завершении "
+        "выводится статистика длительности запусков."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Размер пула потоков."
+        )
+        parser.add_argument(
+            "--poll",
+            type=float,
+            default=60,
+            help="Как часто проверять, пора ли применять правила, секунды.",
+        )
+        parser.add_argument(
+            "--snapshot-interval",
+            type=float,
+            default=3600,
+            help="Период снимков журнала, секунды; 0 — не делать снимки.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=ledger.RULE_CHUNK_SIZE,
+            help="Звеньев в одной транзакции правила.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Выполнить все задачи один раз и завершиться.",
+        )
+
+    @staticmethod
+    def rule_jobs(options):
+        return [
+            Job(
+                f"rule:{rule.name}",
+                partial(ledger.apply_rule, rule.pk, chunk_size=options["chunk_size"]),
+                options["poll"],
+                key=f"rule:{rule.pk}",
+            )
+            for rule in DebtRule.objects.filter(is_active=True).order_by("pk")
+        ]
+
+    def handle(self, *args, **options):
+        jobs = []
+        if options["snapshot_interval"] > 0:
+            jobs.append(Job("snapshot", ledger.snapshot, options["snapshot_interval"]))
+        scheduler = Scheduler(jobs, workers=options["workers"])
+
+        def refresh_rules():
+            """Задачи rule:* — по активным правилам на данный момент."""
+            rule_jobs = self.rule_jobs(options)
+            scheduler.replace_jobs("rule:", rule_jobs)
+            return f"активных правил {len(rule_jobs)}"
+
+        refresh_rules()
+        if options["once"]:
+            wait(scheduler.run_pending())
+            scheduler.pool.shutdown()
+        else:
+            rules = Job("rules", refresh_rules, options["poll"])
+            # правила только что прочитаны
+            rules.next_run = time.monotonic() + options["poll"]
+            scheduler.jobs.append(rules)
+            signal.signal(signal.SIGTERM, lambda *args: scheduler.stop())
+            try:
+                scheduler.run_forever()
+            except KeyboardInterrupt:
+                scheduler.stop()
+
+        for name, stats in scheduler.stats().items():
+            avg = stats["avg_duration"]
+            line = (
+                f"{name}: запусков {stats['runs']}, ошибок {stats['failures']}, "
+                f"среднее {avg or 0:.3f} с, максимум {stats['max_duration']:.3f} с"
+            )
+            style = self.style.ERROR if stats["failures"] else self.style.SUCCESS
+            self.stdout.write(style(line))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from network import ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит проводки журнала задолженности в снимки звеньев "
+        "(NetworkNode.debt), чтобы текущий долг считался по короткому хвосту "
+        "журнала. Запускается периодически, например из cron."
+    )
+
+    def handle(self, *args, **options):
+        updated = ledger.snapshot()
+        self.stdout.write(self.style.SUCCESS(f"Обновлено снимков: {updated}"))
@@ -0,0 +1,431 @@
+"""
+Метрики запросов API: число SQL-запросов, время в БД, время сериализации
+ответа и общее время.
+
+MetricsMiddleware замеряет каждый запрос к отслеживаемым маршрутам
+(INSTRUMENTED_VIEWS — звенья сети, продукты, выдача и обновление
+токенов), отдаёт замеры клиенту в заголовке Server-Timing и копит их в
+гистограммах registry по маршруту, методу, набору параметров запроса
+и классу статуса. MetricsView отдаёт гистограммы в текстовом формате
+Prometheus, а с пулом соединений (DB_POOL) — и его статистику.
+
+Гистограммы живут в памяти процесса: при нескольких воркерах каждый
+отдаёт свои, и Prometheus должен опрашивать воркеры по отдельности.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.views import APIView
+
+from .permissions import IsActiveStaff
+
+# имена маршрутов (view_name) — точные или префиксы с «-» на конце
+INSTRUMENTED_VIEWS = (
+    "node-",
+    "product-",
+    "async-node-",
+    "async-product-",
+    "token_obtain_pair",
+    "token_refresh",
+)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# наборов параметров на маршрут, остальные попадают в params="other":
+# имена параметров приходят от клиента, и число рядов нужно ограничить
+MAX_PARAM_SETS = 50
+PARAM_NAME_RE = re.compile(r"^[A-Za-z0-9_]{1,32}$")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# ключ ConnectionPool.get_stats() -> (метрика, тип, описание)
+POOL_STATS = {
+    "pool_min": ("network_db_pool_min_size", "gauge", "Минимальный размер пула."),
+    "pool_max": ("network_db_pool_max_size", "gauge", "Максимальный размер пула."),
+    "pool_size": (
+        "network_db_pool_size",
+        "gauge",
+        "Соединений пула, включая выданные.",
+    ),
+    "pool_available": (
+        "network_db_pool_available",
+        "gauge",
+        "Свободных соединений в пуле.",
+    ),
+    "requests_waiting": (
+        "network_db_pool_requests_waiting",
+        "gauge",
+        "Ожидающих соединения сейчас.",
+    ),
+    "requests_num": (
+        "network_db_pool_requests_total",
+        "counter",
+        "Выдач соединения из пула.",
+    ),
+    "requests_queued": (
+        "network_db_pool_requests_queued_total",
+        "counter",
+        "Выдач, которым пришлось ждать соединения.",
+    ),
+    "requests_wait_ms": (
+        "network_db_pool_requests_wait_ms_total",
+        "counter",
+        "Суммарное ожидание соединения, мс.",
+    ),
+    "requests_errors": (
+        "network_db_pool_requests_errors_total",
+        "counter",
+        "Соединение не получено за DB_POOL_TIMEOUT.",
+    ),
+    "connections_num": (
+        "network_db_pool_connections_total",
+        "counter",
+        "Соединений, открытых пулом.",
+    ),
+    "connections_errors": (
+        "network_db_pool_connections_errors_total",
+        "counter",
+        "Неудачных попыток открыть соединение.",
+    ),
+    "connections_lost": (
+        "network_db_pool_connections_lost_total",
+        "counter",
+        "Соединений, не прошедших проверку.",
+    ),
+}
+
+
+def is_instrumented(view_name):
+    return any(
+        view_name.startswith(name) if name.endswith("-") else view_name == name
+        for name in INSTRUMENTED_VIEWS
+    )
+
+
+def escape_label(value):
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def format_labels(labels):
+    return ",".join(f'{name}="{escape_label(value)}"' for name, value in labels)
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Гистограмма Prometheus: ряды по наборам меток, накопительные корзины."""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        # метки -> [счётчики корзин (последний — +Inf), сумма, количество]
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def expose(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            prefix = format_labels(labels)
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                le = bound if isinstance(bound, str) else format_value(float(bound))
+                lines.append(f'{self.name}_bucket{{{prefix},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{prefix}}} {format_value(total)}")
+            lines.append(f"{self.name}_count{{{prefix}}} {count}")
+        return lines
+
+
+class RequestMetrics:
+    """Гистограммы замеров запросов; запись и выдача под общей блокировкой."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.histograms = {
+                "total": Histogram(
+                    "network_request_duration_seconds",
+                    "Время обработки запроса.",
+                    DURATION_BUCKETS,
+                ),
+                "db": Histogram(
+                    "network_request_db_seconds",
+                    "Время выполнения SQL-запросов за запрос.",
+                    DURATION_BUCKETS,
+                ),
+                "serialize": Histogram(
+                    "network_request_serialize_seconds",
+                    "Время сериализации ответа: сериализаторы и рендерер, без SQL.",
+                    DURATION_BUCKETS,
+                ),
+                "queries": Histogram(
+                    "network_request_queries",
+                    "Число SQL-запросов за запрос.",
+                    QUERY_BUCKETS,
+                ),
+            }
+            # маршрут -> наборы параметров, получившие свой ряд
+            self._param_sets = {}
+
+    def params_label(self, view_name, params):
+        names = sorted(set(params))
+        if not all(PARAM_NAME_RE.match(name) for name in names):
+            return "other"
+        label = ",".join(names)
+        known = self._param_sets.setdefault(view_name, set())
+        if label not in known:
+            if len(known) >= MAX_PARAM_SETS:
+                return "other"
+            known.add(label)
+        return label
+
+    def record(self, view_name, method, params, status, timings):
+        with self._lock:
+            labels = (
+                ("view", view_name),
+                ("method", method),
+                ("params", self.params_label(view_name, params)),
+                ("status", f"{status // 100}xx"),
+            )
+            for metric, value in timings.items():
+                self.histograms[metric].observe(labels, value)
+
+    def expose(self):
+        with self._lock:
+            lines = []
+            for histogram in self.histograms.values():
+                lines.extend(histogram.expose())
+        return "\n".join(lines) + "\n"
+
+
+registry = RequestMetrics()
+
+
+def pool_stats():
+    """alias -> статистика пула для БД с OPTIONS["pool"]."""
+    return {
+        connection.alias: connection.pool.get_stats()
+        for connection in connections.all()
+        if getattr(connection, "pool", None) is not None
+    }
+
+
+def expose_pools():
+    stats = pool_stats()
+    lines = []
+    if stats:
+        for key, (name, kind, documentation) in POOL_STATS.items():
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+            lines += [
+                f'{name}{{database="{escape_label(alias)}"}} {values.get(key, 0)}'
+                for alias, values in stats.items()
+            ]
+    return "".join(f"{line}\n" for line in lines)
+
+
+class QueryTimer:
+    """execute_wrapper: считает SQL-запросы и суммарное время их выполнения."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class SerializationTimer:
+    """
+    Время сериализации запроса: блоки serialization() и отрисовка ответа.
+    SQL-запросы внутри блоков (вложенные списки) вычитаются — они в db.
+    """
+
+    def __init__(self, queries=None):
+        self.queries = queries
+        self.duration = 0.0
+        self.depth = 0
+
+    def db_duration(self):
+        return self.queries.duration if self.queries is not None else 0.0
+
+
+@contextmanager
+def serialization(request):
+    """
+    Относит время блока к сериализации запроса request (DRF Request или
+    HttpRequest). Вложенные блоки — например, .data вложенного
+    сериализатора — повторно не считаются.
+    """
+    request = getattr(request, "_request", request)
+    timer = getattr(request, "_metrics_serialization", None)
+    if timer is None or timer.depth:
+        yield
+        return
+    timer.depth += 1
+    started = time.perf_counter()
+    db_started = timer.db_duration()
+    try:
+        yield
+    finally:
+        timer.depth -= 1
+        db = timer.db_duration() - db_started
+        timer.duration += time.perf_counter() - started - db
+
+
+def server_timing(timings):
+    metrics = []
+    if "db" in timings:
+        metrics.append(
+            f'db;dur={timings["db"] * 1000:.1f};desc="{timings["queries"]} queries"'
+        )
+    metrics.append(f'serialize;dur={timings["serialize"] * 1000:.1f}')
+    metrics.append(f'total;dur={timings["total"] * 1000:.1f}')
+    return ", ".join(metrics)
+
+
+class MetricsMiddleware:
+    """
+    Замеряет запросы к INSTRUMENTED_VIEWS. Сериализация — .data
+    сериализаторов и быстрый путь RowRepresentation (блоки serialization()
+    внутри представления) плюс отрисовка Response рендерером (от
+    process_template_response до возврата ответа); SQL — все запросы за
+    время обработки. Потоковые ответы замеряются до конца отдачи тела.
+
+    Middleware поддерживает и ASGI, чтобы не переводить async_views
+    в поток: там запросы к БД выполняются в потоках sync_to_async, и в
+    замер попадают только общее время и сериализация (вместе с SQL
+    вложенных списков), без db и queries.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        timer = QueryTimer()
+        request._metrics_serialization = SerializationTimer(timer)
+        with self.timed_queries(timer):
+            response = self.get_response(request)
+        return self.finish(request, response, started, timer)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        request._metrics_serialization = SerializationTimer()
+        response = await self.get_response(request)
+        return self.finish(request, response, started)
+
+    @staticmethod
+    def timed_queries(timer):
+        stack = ExitStack()
+        if timer is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+        return stack
+
+    def process_template_response(self, request, response):
+        request._metrics_render_started = time.perf_counter()
+        return response
+
+    def finish(self, request, response, started, timer=None):
+        match = request.resolver_match
+        if match is None or not is_instrumented(match.view_name):
+            return response
+        if response.streaming:
+            # тело ещё не сформировано — замер запишется, когда поток отдан
+            stream = self.astream if response.is_async else self.stream
+            response.streaming_content = stream(
+                request, response, response.streaming_content, started, timer
+            )
+            return response
+        timings = self.record(request, response, started, timer)
+        response["Server-Timing"] = server_timing(timings)
+        return response
+
+    def stream(self, request, response, content, started, timer):
+        """
+        Тело StreamingHttpResponse (например, node-export): SQL и строки
+        выгрузки выполняются при отдаче, поэтому каждая порция считается
+        сериализацией (за вычетом SQL), а замер записывается по окончании
+        или закрытии потока. Server-Timing у таких ответов нет — заголовки
+        уходят раньше тела.
+        """
+        chunks = iter(content)
+        try:
+            while True:
+                with self.timed_queries(timer), serialization(request):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            self.record(request, response, started, timer)
+
+    async def astream(self, request, response, content, started, timer):
+        try:
+            async for chunk in content:
+                yield chunk
+        finally:
+            self.record(request, response, started, timer)
+
+    def record(self, request, response, started, timer):
+        finished = time.perf_counter()
+        render_started = getattr(request, "_metrics_render_started", finished)
+        timings = {
+            "total": finished - started,
+            "serialize": request._metrics_serialization.duration
+            + finished
+            - render_started,
+        }
+        if timer is not None:
+            timings.update(db=timer.duration, queries=timer.count)
+        registry.record(
+            request.resolver_match.view_name,
+            request.method,
+            request.GET.keys(),
+            response.status_code,
+            timings,
+        )
+        return timings
+
+
+class MetricsView(APIView):
+    """Гистограммы registry и статистика пулов в текстовом формате Prometheus."""
+
+    permission_classes = (IsActiveStaff,)
+    swagger_schema = None
+
+    def get(self, request):
+        body = registry.expose() + expose_pools()
+        return HttpResponse(body, content_type=CONTENT_TYPE)
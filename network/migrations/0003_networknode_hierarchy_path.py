@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("network", "0002_networknode_node_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="networknode",
+            name="depth",
+            field=models.PositiveIntegerField(
+                db_index=True,
+                default=0,
+                editable=False,
+                verbose_name="Уровень в иерархии",
+            ),
+        ),
+        migrations.AddField(
+            model_name="networknode",
+            name="path",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                editable=False,
+                help_text="id предков от корня, каждый завершается '/', например '1/5/'",
+                max_length=1024,
+                verbose_name="Путь от завода",
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:20
+
+from django.db import migrations
+
+
+def backfill_hierarchy(apps, schema_editor):
+    """
+    Заполняем path/depth послойно от заводов: на каждом шаге один
+    UPDATE ... FROM для клиентов звеньев предыдущего уровня.
+    Ещё не обработанные звенья помечены path='?', поэтому каждое
+    обновляется ровно один раз (и цикл в данных не зациклит миграцию).
+    """
+    table = apps.get_model("network", "NetworkNode")._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET depth = 0, "
+            f"path = CASE WHEN supplier_id IS NULL THEN '' ELSE '?' END"
+        )
+        depth = 0
+        while True:
+            cursor.execute(
+                f"""
+                UPDATE {table} AS c
+                SET path = p.path || p.id || '/', depth = p.depth + 1
+                FROM {table} AS p
+                WHERE c.supplier_id = p.id
+                  AND c.path = '?'
+                  AND p.path <> '?'
+                  AND p.depth = %s
+                """,
+                [depth],
+            )
+            if cursor.rowcount == 0:
+                break
+            depth += 1
+        cursor.execute(f"UPDATE {table} SET path = '' WHERE path = '?'")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("network", "0003_networknode_hierarchy_path"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_hierarchy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("network", "0004_backfill_hierarchy_path"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="networknode",
+            index=models.Index(fields=["created_at", "id"], name="node_created_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["release_date", "id"], name="product_release_id_idx"
+            ),
+        ),
+    ]
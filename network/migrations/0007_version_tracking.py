@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("network", "0006_search_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CollectionVersion",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=50,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Коллекция",
+                    ),
+                ),
+                (
+                    "version",
+                    models.PositiveBigIntegerField(default=0, verbose_name="Версия"),
+                ),
+                ("updated_at", models.DateTimeField(verbose_name="Время изменения")),
+            ],
+            options={
+                "verbose_name": "Версия коллекции",
+                "verbose_name_plural": "Версии коллекций",
+            },
+        ),
+        migrations.AddField(
+            model_name="networknode",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="Время изменения"),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="Время изменения"),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("network", "0007_version_tracking"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="networknode",
+            name="path",
+            field=models.CharField(
+                blank=True,
+                default="",
+                editable=False,
+                help_text="id предков от корня, каждый завершается '/', например '1/5/'",
+                max_length=1024,
+                verbose_name="Путь от завода",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="networknode",
+            index=models.Index(
+                fields=["path"],
+                include=("debt",),
+                name="node_path_debt_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:53
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("network", "0008_subtree_debt_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DebtEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=12, verbose_name="Сумма проводки"
+                    ),
+                ),
+                (
+                    "comment",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="Комментарий"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Время проводки"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Проводка по задолженности",
+                "verbose_name_plural": "Журнал задолженности",
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name="networknode",
+            name="node_path_debt_idx",
+        ),
+        migrations.AddField(
+            model_name="networknode",
+            name="debt_entry_id",
+            field=models.PositiveBigIntegerField(
+                default=0, editable=False, verbose_name="Последняя проводка в снимке"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="networknode",
+            name="debt",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=Decimal("0.00"),
+                help_text="Баланс на момент последнего снимка журнала",
+                max_digits=12,
+                verbose_name="Задолженность перед поставщиком",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="networknode",
+            index=models.Index(
+                fields=["path"],
+                include=("debt", "debt_entry_id"),
+                name="node_path_debt_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+        migrations.AddField(
+            model_name="debtentry",
+            name="node",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="debt_entries",
+                to="network.networknode",
+                verbose_name="Звено сети",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="debtentry",
+            index=models.Index(fields=["node", "id"], name="debt_entry_node_id_idx"),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("network", "0009_debt_ledger"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="networknode",
+            index=models.Index(fields=["country"], name="node_country_idx"),
+        ),
+    ]
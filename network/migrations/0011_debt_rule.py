@@ -0,0 +1,94 @@
+# Generated by Django 5.2.5 on 2026-10-18 06:06
+
+import datetime
+from decimal import Decimal
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("network", "0010_node_country_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DebtRule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=100, unique=True, verbose_name="Название"
+                    ),
+                ),
+                (
+                    "node_type",
+                    models.CharField(
+                        choices=[
+                            ("retail", "Розничная сеть"),
+                            ("entrepreneur", "Индивидуальный предприниматель"),
+                        ],
+                        max_length=20,
+                        verbose_name="Тип звена",
+                    ),
+                ),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0.00"),
+                        help_text="Положительная — начисление, отрицательная — списание",
+                        max_digits=12,
+                        verbose_name="Сумма",
+                    ),
+                ),
+                (
+                    "percent",
+                    models.DecimalField(
+                        decimal_places=3,
+                        default=Decimal("0"),
+                        max_digits=6,
+                        verbose_name="Процент от текущего долга",
+                    ),
+                ),
+                (
+                    "interval",
+                    models.DurationField(
+                        default=datetime.timedelta(days=1), verbose_name="Периодичность"
+                    ),
+                ),
+                (
+                    "next_run_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="Следующий запуск",
+                    ),
+                ),
+                (
+                    "cursor",
+                    models.PositiveBigIntegerField(
+                        default=0, editable=False, verbose_name="Обработано до звена"
+                    ),
+                ),
+                (
+                    "is_active",
+                    models.BooleanField(default=True, verbose_name="Активно"),
+                ),
+            ],
+            options={
+                "verbose_name": "Правило задолженности",
+                "verbose_name_plural": "Правила задолженности",
+            },
+        ),
+    ]
@@ -1,7 +1,155 @@
+from datetime import timedelta
 from decimal import Decimal
 
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import (
+    Avg,
+    Count,
+    DecimalField,
+    F,
+    Max,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Concat, Now, Substr, Upper
+from django.utils import timezone
+
+SEARCH_CONFIG = "simple"
+
+
+def search_vector(*fields):
+    """
+    tsvector по полям поиска. Одно и то же выражение используется
+    в GIN-индексе модели и в запросе — иначе индекс не будет применён.
+    """
+    return SearchVector(*fields, config=SEARCH_CONFIG)
+
+
+def trigram_index(field, name):
+    """
+    GIN-индекс pg_trgm под icontains: Django сравнивает UPPER(поле) LIKE ...,
+    поэтому индексируется то же выражение.
+    """
+    return GinIndex(OpClass(Upper(field), name="gin_trgm_ops"), name=name)
+
+
+PATH_MAX_LENGTH = 1024
+# предельный уровень звена: path из MAX_DEPTH id BigAutoField по 19 цифр
+# и «/» гарантированно помещается в PATH_MAX_LENGTH
+MAX_DEPTH = PATH_MAX_LENGTH // len(f"{2**63 - 1}/")
+MAX_DEPTH_MESSAGE = f"Превышена глубина иерархии: не больше {MAX_DEPTH} уровней."
+
+# группировки сводки по задолженности: имя в ответе -> поле модели
+DEBT_GROUPS = {"country": "country", "node_type": "node_type", "level": "depth"}
+
+
+class NetworkNodeQuerySet(models.QuerySet):
+    """
+    Выборки по иерархии одним рекурсивным запросом по supplier.
+    UNION (а не UNION ALL) защищает от зацикливания на испорченных данных.
+    """
+
+    def subtree_of(self, node):
+        """
+        Все звенья ниже node по хранимому path: диапазонный поиск
+        по индексу вместо рекурсивного обхода.
+        """
+        return self.filter(path__startswith=node.subtree_path)
+
+    @staticmethod
+    def _debt_tail(aggregate):
+        """
+        Подзапрос по проводкам звена после его снимка (хвост журнала);
+        по индексу (node, id) читаются только строки хвоста.
+        """
+        return Subquery(
+            DebtEntry.objects.filter(
+                node=OuterRef("pk"), id__gt=OuterRef("debt_entry_id")
+            )
+            .order_by()
+            .values("node")
+            .annotate(result=aggregate)
+            .values("result")
+        )
+
+    def with_current_debt(self):
+        """current_debt: снимок debt плюс сумма хвоста журнала."""
+        return self.annotate(
+            current_debt=F("debt")
+            + Coalesce(
+                self._debt_tail(Sum("amount")),
+                Value(Decimal("0")),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+
+    def with_debt_version(self):
+        """
+        Число проводок и время последней из хвоста: вместе с updated_at
+        и debt_entry_id меняются при каждой проводке (для ETag).
+        """
+        return self.annotate(
+            debt_tail_count=Coalesce(self._debt_tail(Count("id")), 0),
+            debt_tail_at=self._debt_tail(Max("created_at")),
+        )
+
+    @staticmethod
+    def _debt_aggregates():
+        return {
+            "nodes": Count("id"),
+            "total": Sum("current_debt", default=Decimal("0")),
+            "mean": Avg("current_debt"),
+            "max": Max("current_debt"),
+        }
+
+    def debt_stats(self):
+        """Число звеньев, сумма, среднее и максимум задолженности."""
+        return self.with_current_debt().order_by().aggregate(**self._debt_aggregates())
+
+    def debt_stats_by(self, group):
+        """То же в разрезе DEBT_GROUPS[group], одним GROUP BY."""
+        field = DEBT_GROUPS[group]
+        rows = self.with_current_debt().order_by()
+        if field == group:
+            rows = rows.values(field)
+        else:
+            rows = rows.values(**{group: F(field)})
+        return rows.annotate(**self._debt_aggregates()).order_by(group)
+
+    def descendants_of(self, node, include_self=False):
+        """Все звенья ниже node (клиенты, клиенты клиентов и т.д.)."""
+        table = self.model._meta.db_table
+        start = "id" if include_self else "supplier_id"
+        sql = f"""
+            WITH RECURSIVE subtree(id) AS (
+                SELECT id FROM {table} WHERE {start} = %s
+                UNION
+                SELECT n.id FROM {table} AS n
+                JOIN subtree AS s ON n.supplier_id = s.id
+            )
+            SELECT id FROM subtree
+        """
+        return self.filter(pk__in=RawSQL(sql, [node.pk]))
+
+    def ancestors_of(self, node):
+        """Цепочка поставщиков node от завода к непосредственному поставщику."""
+        table = self.model._meta.db_table
+        sql = f"""
+            WITH RECURSIVE chain(id, supplier_id) AS (
+                SELECT id, supplier_id FROM {table} WHERE id = %s
+                UNION
+                SELECT n.id, n.supplier_id FROM {table} AS n
+                JOIN chain AS c ON n.id = c.supplier_id
+            )
+            SELECT id FROM chain WHERE id <> %s
+        """
+        return self.filter(pk__in=RawSQL(sql, [node.pk, node.pk])).order_by("depth")
 
 
 class NetworkNode(models.Model):
@@ -40,14 +188,39 @@ class NetworkNode(models.Model):
         help_text="Предыдущее звено в иерархии сети",
     )
 
+    # задолженность ведётся журналом DebtEntry; debt — баланс на момент
+    # снимка, включающего проводки до debt_entry_id (см. network.ledger)
     debt = models.DecimalField(
         max_digits=12,
         decimal_places=2,
         default=Decimal("0.00"),
         verbose_name="Задолженность перед поставщиком",
+        help_text="Баланс на момент последнего снимка журнала",
+    )
+    debt_entry_id = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Последняя проводка в снимке",
     )
 
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Время создания")
+    # меняется и при изменениях, встроенных в ответ API: продукты, поставщик
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Время изменения")
+
+    objects = NetworkNodeQuerySet.as_manager()
+
+    # денормализованная иерархия: поддерживается в save() и сигналах удаления
+    depth = models.PositiveIntegerField(
+        default=0, db_index=True, editable=False, verbose_name="Уровень в иерархии"
+    )
+    path = models.CharField(
+        max_length=PATH_MAX_LENGTH,
+        default="",
+        blank=True,
+        editable=False,
+        verbose_name="Путь от завода",
+        help_text="id предков от корня, каждый завершается '/', например '1/5/'",
+    )
 
     def clean(self):
 
@@ -62,6 +235,12 @@ class NetworkNode(models.Model):
         # сам себе быть поставщиком нельзя
         if self.supplier and self.supplier_id == self.id:
             raise ValidationError("Поставщик не может быть самим собой.")
+        # клиент не может стать поставщиком своего же поставщика
+        if self.pk and self.supplier and self.is_ancestor_of(self.supplier):
+            raise ValidationError("Поставщик не может быть собственным клиентом.")
+        # path всего поддерева должен поместиться в поле
+        if self.supplier and not self.fits_under(self.supplier):
+            raise ValidationError(MAX_DEPTH_MESSAGE)
 
     @property
     def level(self):
@@ -71,13 +250,128 @@ class NetworkNode(models.Model):
         его клиенты = 1
         клиенты клиентов = 2
         """
-        if not self.supplier:
+        return self.depth
+
+    @property
+    def current_debt(self):
+        """
+        Текущая задолженность: снимок плюс хвост журнала. В выборках
+        with_current_debt() значение приходит аннотацией, без запроса.
+        """
+        if "_current_debt" not in self.__dict__:
+            tail = self.debt_entries.filter(id__gt=self.debt_entry_id).aggregate(
+                total=Sum("amount", default=Decimal("0"))
+            )
+            self._current_debt = self.debt + tail["total"]
+        return self._current_debt
+
+    @current_debt.setter
+    def current_debt(self, value):
+        self._current_debt = value
+
+    @property
+    def subtree_path(self):
+        """Префикс path у всех потомков звена."""
+        return f"{self.path}{self.pk}/"
+
+    @property
+    def ancestor_ids(self):
+        """id предков от завода к непосредственному поставщику."""
+        return [int(pk) for pk in self.path.split("/") if pk]
+
+    def is_ancestor_of(self, node):
+        """Является ли звено предком (прямым или косвенным) для node."""
+        return str(self.pk) in node.path.split("/")
+
+    def subtree_height(self):
+        """На сколько уровней самый глубокий потомок ниже звена."""
+        if self._state.adding:
             return 0
-        return self.supplier.level + 1
+        deepest = NetworkNode.objects.subtree_of(self).aggregate(depth=Max("depth"))
+        return deepest["depth"] - self.depth if deepest["depth"] is not None else 0
+
+    def fits_under(self, supplier):
+        """Не окажется ли звено или его поддерево под supplier глубже MAX_DEPTH."""
+        return supplier.depth + 1 + self.subtree_height() <= MAX_DEPTH
+
+    def place_under(self, supplier):
+        """
+        Назначает поставщика и сразу выставляет path/depth по его пути —
+        для bulk_create, который не вызывает save().
+        """
+        self.supplier = supplier
+        self.path = supplier.subtree_path if supplier else ""
+        self.depth = self.path.count("/")
+
+    def _supplier_path(self):
+        """Путь для текущего supplier, читается из БД, а не из кеша объекта."""
+        if self.supplier_id is None:
+            return ""
+        supplier_path = (
+            NetworkNode.objects.filter(pk=self.supplier_id)
+            .values_list("path", flat=True)
+            .get()
+        )
+        return f"{supplier_path}{self.supplier_id}/"
+
+    def save(self, *args, **kwargs):
+        """
+        Пересчитываем path/depth. Если звено сменило поставщика,
+        одним UPDATE переносим всё поддерево под новый путь.
+        """
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            # auto_now не попадает в UPDATE, если поле не перечислено явно
+            update_fields = kwargs["update_fields"] = {*update_fields, "updated_at"}
+            if "supplier" not in update_fields:
+                return super().save(*args, **kwargs)
+
+        new_path = self._supplier_path()
+        old_subtree = None
+        if not self._state.adding and new_path != self.path:
+            old_subtree = self.subtree_path
+            delta = new_path.count("/") - self.depth
+
+        self.path = new_path
+        self.depth = new_path.count("/")
+        # для сброса кеша ответов по всему поддереву (network.signals)
+        self._subtree_moved = old_subtree is not None
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "path", "depth"}
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if old_subtree is not None:
+                NetworkNode.objects.filter(path__startswith=old_subtree).update(
+                    path=Concat(
+                        Value(self.subtree_path),
+                        Substr("path", len(old_subtree) + 1),
+                    ),
+                    depth=F("depth") + delta,
+                    updated_at=Now(),
+                )
 
     class Meta:
         verbose_name = "Звено сети"
         verbose_name_plural = "Звенья сети"
+        indexes = [
+            # ключ курсорной пагинации
+            models.Index(fields=["created_at", "id"], name="node_created_id_idx"),
+            # поддерево (LIKE 'путь%'); debt в индексе — сводки без чтения таблицы
+            models.Index(
+                fields=["path"],
+                include=["debt", "debt_entry_id"],
+                opclasses=["varchar_pattern_ops"],
+                name="node_path_debt_idx",
+            ),
+            # фильтр по стране в API и список стран в фильтре админки
+            models.Index(fields=["country"], name="node_country_idx"),
+            # поиск (FullTextSearchFilter)
+            GinIndex(search_vector("name", "email", "city"), name="node_search_idx"),
+            trigram_index("name", "node_name_trgm_idx"),
+            trigram_index("email", "node_email_trgm_idx"),
+            trigram_index("city", "node_city_trgm_idx"),
+        ]
 
     def __str__(self):
         return f"{self.get_node_type_display()} — {self.name}"
@@ -99,9 +393,190 @@ class Product(models.Model):
         verbose_name="Поставщик",
     )
 
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Время изменения")
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "updated_at"}
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Продукт"
         verbose_name_plural = "Продукты"
+        indexes = [
+            # ключ курсорной пагинации
+            models.Index(fields=["release_date", "id"], name="product_release_id_idx"),
+            # поиск (FullTextSearchFilter)
+            GinIndex(search_vector("name", "model"), name="product_search_idx"),
+            trigram_index("name", "product_name_trgm_idx"),
+            trigram_index("model", "product_model_trgm_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.model})"
+
+
+class DebtEntry(models.Model):
+    """
+    Проводка журнала задолженности: положительная сумма увеличивает долг
+    звена перед поставщиком, отрицательная — уменьшает. Строки только
+    добавляются, поэтому параллельные проводки не блокируют строку звена.
+    """
+
+    node = models.ForeignKey(
+        NetworkNode,
+        on_delete=models.CASCADE,
+        related_name="debt_entries",
+        # индекс по node покрывает составной debt_entry_node_id_idx
+        db_index=False,
+        verbose_name="Звено сети",
+    )
+    amount = models.DecimalField(
+        max_digits=12, decimal_places=2, verbose_name="Сумма проводки"
+    )
+    comment = models.CharField(max_length=255, blank=True, verbose_name="Комментарий")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Время проводки")
+
+    class Meta:
+        verbose_name = "Проводка по задолженности"
+        verbose_name_plural = "Журнал задолженности"
+        indexes = [
+            # хвост журнала звена после снимка
+            models.Index(fields=["node", "id"], name="debt_entry_node_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.node_id}: {self.amount}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Проводки журнала не изменяются.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValidationError("Проводки журнала не удаляются.")
+
+
+class DebtRule(models.Model):
+    """
+    Периодическое начисление или списание задолженности всем звеньям типа
+    node_type: проводка amount + percent% текущего долга (ниже нуля долг
+    не уходит). Применяется пакетами в network.ledger.apply_rule; cursor —
+    последний обработанный id звена незавершённого запуска.
+    """
+
+    name = models.CharField(max_length=100, unique=True, verbose_name="Название")
+    node_type = models.CharField(
+        max_length=20,
+        choices=[
+            choice
+            for choice in NetworkNode.NODE_TYPES
+            if choice[0] != NetworkNode.FACTORY
+        ],
+        verbose_name="Тип звена",
+    )
+    amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        verbose_name="Сумма",
+        help_text="Положительная — начисление, отрицательная — списание",
+    )
+    percent = models.DecimalField(
+        max_digits=6,
+        decimal_places=3,
+        default=Decimal("0"),
+        verbose_name="Процент от текущего долга",
+    )
+    interval = models.DurationField(
+        default=timedelta(days=1), verbose_name="Периодичность"
+    )
+    next_run_at = models.DateTimeField(
+        default=timezone.now, verbose_name="Следующий запуск"
+    )
+    cursor = models.PositiveBigIntegerField(
+        default=0, editable=False, verbose_name="Обработано до звена"
+    )
+    is_active = models.BooleanField(default=True, verbose_name="Активно")
+
+    class Meta:
+        verbose_name = "Правило задолженности"
+        verbose_name_plural = "Правила задолженности"
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        if self.interval is not None and self.interval <= timedelta(0):
+            raise ValidationError(
+                {"interval": "Периодичность должна быть больше нуля."}
+            )
+
+    def is_due(self, now=None):
+        """Пора запускать или запуск не завершён."""
+        return self.cursor > 0 or self.next_run_at <= (now or timezone.now())
+
+    def schedule_next(self, now=None):
+        """
+        Следующий запуск через interval от планового; пропущенные
+        периоды не навёрстываются.
+        """
+        now = now or timezone.now()
+        self.next_run_at += self.interval
+        if self.next_run_at <= now:
+            self.next_run_at = now + self.interval
+
+
+class CollectionVersion(models.Model):
+    """
+    Версия коллекции API (звенья, продукты) для ETag/Last-Modified списков.
+    Увеличивается после каждой зафиксированной записи в коллекцию.
+    """
+
+    name = models.CharField(max_length=50, primary_key=True, verbose_name="Коллекция")
+    version = models.PositiveBigIntegerField(default=0, verbose_name="Версия")
+    updated_at = models.DateTimeField(verbose_name="Время изменения")
+
+    class Meta:
+        verbose_name = "Версия коллекции"
+        verbose_name_plural = "Версии коллекций"
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+    @classmethod
+    def current(cls, name):
+        """(версия, время изменения); (0, None), если коллекция не менялась."""
+        row = cls.objects.filter(name=name).values_list("version", "updated_at")
+        return row.first() or (0, None)
+
+    @classmethod
+    async def acurrent(cls, name):
+        """current для асинхронных представлений."""
+        row = cls.objects.filter(name=name).values_list("version", "updated_at")
+        return await row.afirst() or (0, None)
+
+    @classmethod
+    def bump(cls, *names):
+        """
+        Увеличивает версии после commit: до него читатели видят старые данные
+        и не должны получить с ними новый ETag. UPSERT выполняется вне
+        транзакции записи, поэтому строка версии не блокируется надолго.
+        """
+        names = sorted(set(names))
+        if not names:
+            return
+        table = cls._meta.db_table
+        values = ", ".join(["(%s, 1, now())"] * len(names))
+        sql = f"""
+            INSERT INTO {table} (name, version, updated_at) VALUES {values}
+            ON CONFLICT (name) DO UPDATE
+            SET version = {table}.version + 1, updated_at = EXCLUDED.updated_at
+        """
+
+        def upsert():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, names)
+
+        transaction.on_commit(upsert, robust=True)
@@ -0,0 +1,164 @@
+import base64
+import binascii
+import decimal
+
+import orjson
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .filters import SEARCH_RANK
+
+
+def _cursor_default(value):
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Курсорная (keyset) пагинация: страница N стоит столько же, сколько первая,
+    т.к. вместо OFFSET используется условие по позиции последней записи.
+    Курсор хранит значения всех полей сортировки, включая id, поэтому
+    сколько угодно записей с равным первым ключом обходятся без повторов:
+    (key < v) OR (key = v AND id < pk).
+    Учитывает сортировку из OrderingFilter (?ordering=...), к которой
+    добавляется id — чтобы порядок был однозначным при равных значениях.
+    При поиске без явного ?ordering= сортирует по рангу FullTextSearchFilter.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if SEARCH_RANK in queryset.query.annotations and not request.query_params.get(
+            api_settings.ORDERING_PARAM
+        ):
+            ordering = (f"-{SEARCH_RANK}",)
+        if ordering[-1].lstrip("-") in ("id", "pk"):
+            return ordering
+        tiebreaker = "-id" if ordering[0].startswith("-") else "id"
+        return (*ordering, tiebreaker)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        reverse, position = self.decode_cursor(request) or (False, None)
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(
+                field[1:] if field.startswith("-") else f"-{field}"
+                for field in ordering
+            )
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = self.seek(queryset, ordering, position)
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        self.position = position
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.display_page_controls = self.has_next or self.has_previous
+        return self.page
+
+    def seek(self, queryset, ordering, position):
+        """Записи строго после position в порядке ordering."""
+        condition = Q(pk__in=[])
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            op = "lt" if field.startswith("-") else "gt"
+            condition |= Q(**equal, **{f"{name}__{op}": value})
+            equal[name] = value
+        try:
+            return queryset.filter(condition)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        row = self.page[-1] if self.page else None
+        return self.link(False, row)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        row = self.page[0] if self.page else None
+        return self.link(True, row)
+
+    def link(self, reverse, row):
+        if row is None:
+            # пустая страница: ссылка от позиции текущего курсора
+            position = self.position
+        else:
+            position = [self.row_value(row, field) for field in self.ordering]
+        if position is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(
+            self.base_url,
+            self.cursor_query_param,
+            self.encode_cursor(reverse, position),
+        )
+
+    @staticmethod
+    def row_value(row, field):
+        name = field.lstrip("-")
+        if isinstance(row, dict):
+            return row[name]
+        return getattr(row, name)
+
+    def decode_cursor(self, request):
+        """(reverse, значения полей сортировки) или None без ?cursor=."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            reverse, position = orjson.loads(base64.urlsafe_b64decode(encoded))
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        return bool(reverse), position
+
+    def encode_cursor(self, reverse, position):
+        data = orjson.dumps(
+            [reverse, position], default=_cursor_default, option=orjson.OPT_UTC_Z
+        )
+        return base64.urlsafe_b64encode(data).decode()
+
+
+class NetworkNodePagination(KeysetPagination):
+    """Звенья сети: новые сначала, индекс (created_at, id)."""
+
+    ordering = ("-created_at", "-id")
+
+
+class ProductPagination(KeysetPagination):
+    """Продукты: новые сначала, индекс (release_date, id)."""
+
+    ordering = ("-release_date", "-id")
+
+
+class DebtEntryPagination(KeysetPagination):
+    """Журнал задолженности: последние проводки сначала, по первичному ключу."""
+
+    ordering = ("-id",)
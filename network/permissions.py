@@ -9,3 +9,7 @@ class IsActiveStaff(BasePermission):
     def has_permission(self, request, view):
         user = request.user
         return bool(user and user.is_authenticated and user.is_active and user.is_staff)
+
+    async def ahas_permission(self, request, view):
+        """Для async_views: проверка не обращается к БД."""
+        return self.has_permission(request, view)
@@ -0,0 +1,82 @@
+"""
+Рендереры API: JSON через orjson и MessagePack для внутренних сервисов.
+
+Decimal (debt), date (release_date) и datetime (created_at) кодируются
+без промежуточных преобразований в Python: orjson сам пишет date/datetime
+в ISO 8601 (UTC — с суффиксом Z, как у DRF), Decimal — строкой, как при
+COERCE_DECIMAL_TO_STRING. Сериализаторы и так отдают эти поля строками,
+поэтому ответы по содержанию не меняются.
+"""
+
+import datetime
+import decimal
+
+import msgpack
+import orjson
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+def encode_default(obj):
+    """Типы, которых нет у orjson/msgpack, — так же, как в DRF JSONEncoder."""
+    if isinstance(obj, decimal.Decimal):
+        return format(obj, "f")
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if isinstance(obj, QuerySet):
+        return list(obj)
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "__iter__"):
+        return list(obj)
+    raise TypeError(f"Тип {type(obj).__name__} не сериализуется")
+
+
+def msgpack_default(obj):
+    """В MessagePack нет даты и времени: строки ISO 8601, как в JSON."""
+    if isinstance(obj, datetime.datetime):
+        value = obj.isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    return encode_default(obj)
+
+
+def dumps(data, indent=False):
+    """JSON в bytes через orjson."""
+    option = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(data, default=encode_default, option=option)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson. Отступ (?indent=, Browsable API) поддерживается
+    только в 2 пробела — это единственный вариант orjson.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        return dumps(data, indent=bool(indent))
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=msgpack_default, use_bin_type=True)
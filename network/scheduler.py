@@ -0,0 +1,146 @@
+"""
+Планировщик периодических задач внутри процесса — без брокера и
+отдельных воркеров (см. команду run_debt_jobs).
+
+Задачи выполняются в пуле потоков; задача не запускается повторно,
+пока не завершился её предыдущий запуск. По каждой задаче копится
+статистика длительности запусков (JobStats).
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class JobStats:
+    """Счётчики и длительности запусков задачи, секунды."""
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.last_duration = None
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        self.last_error = None
+
+    def record(self, duration, error=None):
+        self.runs += 1
+        self.last_duration = duration
+        self.max_duration = max(self.max_duration, duration)
+        self.total_duration += duration
+        if error is not None:
+            self.failures += 1
+            self.last_error = repr(error)
+
+    def as_dict(self):
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_duration": self.last_duration,
+            "max_duration": self.max_duration,
+            "avg_duration": self.total_duration / self.runs if self.runs else None,
+            "last_error": self.last_error,
+        }
+
+
+class Job:
+    """
+    Задача: func вызывается раз в interval секунд, первый раз — сразу.
+    key (по умолчанию name) опознаёт задачу в Scheduler.replace_jobs.
+    """
+
+    def __init__(self, name, func, interval, key=None):
+        self.name = name
+        self.key = key or name
+        self.func = func
+        self.interval = interval
+        self.next_run = 0.0
+        self.running = False
+        self.stats = JobStats()
+
+
+class Scheduler:
+    """Запускает задачи jobs по расписанию в пуле из workers потоков."""
+
+    def __init__(self, jobs, workers=4):
+        self.jobs = list(jobs)
+        self.pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="network-job"
+        )
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def replace_jobs(self, prefix, jobs):
+        """
+        Заменяет задачи, чей key начинается с prefix, на jobs. Задача с
+        прежним key остаётся тем же объектом — со статистикой, расписанием
+        и признаком выполнения; убранная задача, если запущена, доработает.
+        """
+        with self._lock:
+            current = {job.key: job for job in self.jobs if job.key.startswith(prefix)}
+            kept = [job for job in self.jobs if not job.key.startswith(prefix)]
+            for job in jobs:
+                existing = current.get(job.key)
+                if existing is not None:
+                    existing.name = job.name
+                    existing.func = job.func
+                    existing.interval = job.interval
+                    job = existing
+                kept.append(job)
+            self.jobs = kept
+
+    def run_pending(self):
+        """Отправляет в пул задачи, время которых пришло; возвращает futures."""
+        now = time.monotonic()
+        futures = []
+        with self._lock:
+            for job in self.jobs:
+                if job.running or job.next_run > now:
+                    continue
+                job.running = True
+                job.next_run = now + job.interval
+                futures.append(self.pool.submit(self._run, job))
+        return futures
+
+    def run_forever(self, tick=1.0):
+        """Цикл планировщика до stop(); затем дожидается запущенных задач."""
+        try:
+            self.run_pending()
+            while not self._stop.wait(tick):
+                self.run_pending()
+        finally:
+            self.pool.shutdown(wait=True)
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return {job.name: job.stats.as_dict() for job in self.jobs}
+
+    def _run(self, job):
+        started = time.perf_counter()
+        error = None
+        try:
+            result = job.func()
+        except Exception as exc:
+            error = exc
+            logger.exception("Задача %s завершилась ошибкой", job.name)
+        else:
+            logger.info(
+                "Задача %s: %s за %.3f с",
+                job.name,
+                result,
+                time.perf_counter() - started,
+            )
+        finally:
+            # соединения с БД у потоков пула свои: не держим их между запусками
+            connections.close_all()
+            with self._lock:
+                job.stats.record(time.perf_counter() - started, error)
+                job.running = False
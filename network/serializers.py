@@ -1,6 +1,88 @@
+from django.db import connection, transaction
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 
-from .models import NetworkNode, Product
+from . import cache, ledger
+from .metrics import serialization
+from .models import (
+    MAX_DEPTH,
+    MAX_DEPTH_MESSAGE,
+    CollectionVersion,
+    DebtEntry,
+    NetworkNode,
+    Product,
+)
+
+# максимальный размер пакета при POST списком на /api/nodes/
+BULK_CREATE_MAX_SIZE = 5000
+
+
+def validate_factory_rules(node_type, supplier, debt):
+    """Завод не может иметь поставщика и задолженности."""
+    if node_type == NetworkNode.FACTORY:
+        if supplier is not None:
+            raise serializers.ValidationError(
+                {"supplier": "У завода не может быть поставщика."}
+            )
+        if debt not in (None, 0, "0", "0.0"):
+            raise serializers.ValidationError(
+                {"debt": "У завода не может быть задолженности перед поставщиком."}
+            )
+
+
+def split_param(value):
+    """'a, b,,c' -> ['a', 'b', 'c']"""
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+class TimedDataMixin:
+    """.data сериализатора — сериализация в метриках запроса (network.metrics)."""
+
+    @property
+    def data(self):
+        with serialization(self.context.get("request")):
+            return super().data
+
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    pass
+
+
+class SparseFieldsMixin:
+    """
+    Выборочные поля ответа при чтении (GET):
+    - ?fields=id,name — только перечисленные поля;
+    - ?expand=products — встроенные объекты из expandable_fields.
+    Без обоих параметров ответ прежний, со всеми полями. Если задан хотя бы
+    один, встроенные объекты выдаются только по expand. Неизвестные имена
+    игнорируются. Действует только на корневой сериализатор запроса.
+    """
+
+    expandable_fields = ()
+
+    @classmethod
+    def requested_fields(cls, request):
+        """Множество полей ответа или None, если запрошены все."""
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        params = request.query_params
+        if "fields" not in params and "expand" not in params:
+            return None
+        available = set(cls.Meta.fields)
+        expandable = set(cls.expandable_fields)
+        fields = set(split_param(params.get("fields"))) or available
+        expand = set(split_param(params.get("expand")))
+        return ((fields - expandable) | (expand & expandable)) & available
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.root not in (self, self.parent):
+            return fields
+        requested = self.requested_fields(self.context.get("request"))
+        if requested is not None:
+            for name in set(fields) - requested:
+                del fields[name]
+        return fields
 
 
 class SupplierShortSerializer(serializers.ModelSerializer):
@@ -11,31 +93,39 @@ class SupplierShortSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "email")
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TimedDataMixin, serializers.ModelSerializer):
     """Сериализатор продукта."""
 
     class Meta:
         model = Product
         fields = ("id", "name", "model", "release_date", "supplier")
         read_only_fields = ("id",)
+        list_serializer_class = TimedListSerializer
 
 
-class NetworkNodeSerializer(serializers.ModelSerializer):
+class NetworkNodeSerializer(
+    TimedDataMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
     """
     Сериализатор звена сети.
     - products: вложенный список продуктов (только чтение).
-    - level: вычисляемое поле (глубина в иерархии).
-    - debt: запрет изменения через API — делаем read_only.
+    - level: глубина в иерархии (хранимое поле depth).
+    - debt: текущая задолженность по журналу, только чтение.
     - supplier: вложенный список поставщиков.
+    Поддерживает ?fields= и ?expand=products,supplier_info (SparseFieldsMixin).
     """
 
+    expandable_fields = ("products", "supplier_info")
+
     products = ProductSerializer(many=True, read_only=True)
     supplier = serializers.PrimaryKeyRelatedField(
         queryset=NetworkNode.objects.all(), required=False, allow_null=True
     )
     supplier_info = SupplierShortSerializer(source="supplier", read_only=True)
-    level = serializers.SerializerMethodField(read_only=True)
-    debt = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    level = serializers.IntegerField(source="depth", read_only=True)
+    debt = serializers.DecimalField(
+        source="current_debt", max_digits=12, decimal_places=2, read_only=True
+    )
 
     class Meta:
         model = NetworkNode
@@ -63,6 +153,7 @@ class NetworkNodeSerializer(serializers.ModelSerializer):
             "products",
             "debt",
         )
+        list_serializer_class = TimedListSerializer
 
     def validate(self, attrs):
         node_type = self.initial_data.get("node_type")
@@ -70,15 +161,7 @@ class NetworkNodeSerializer(serializers.ModelSerializer):
         debt = self.initial_data.get("debt", 0)
 
         # Проверка для завода
-        if node_type == NetworkNode.FACTORY:
-            if supplier is not None:
-                raise serializers.ValidationError(
-                    {"supplier": "У завода не может быть поставщика."}
-                )
-            if debt not in (None, 0, "0", "0.0"):
-                raise serializers.ValidationError(
-                    {"debt": "У завода не может быть задолженности перед поставщиком."}
-                )
+        validate_factory_rules(node_type, supplier, debt)
 
         # Проверка: сам себе быть поставщиком нельзя
         if supplier and self.instance and int(supplier) == self.instance.pk:
@@ -86,14 +169,310 @@ class NetworkNodeSerializer(serializers.ModelSerializer):
                 {"supplier": "Поставщик не может быть самим собой."}
             )
 
+        # Проверка: нельзя назначить поставщиком собственного клиента
+        new_supplier = attrs.get("supplier")
+        if (
+            self.instance
+            and new_supplier
+            and self.instance.is_ancestor_of(new_supplier)
+        ):
+            raise serializers.ValidationError(
+                {"supplier": "Поставщик не может быть собственным клиентом."}
+            )
+
+        # Проверка: path звена и его поддерева должен поместиться в поле
+        node = self.instance or NetworkNode()
+        if (
+            new_supplier
+            and new_supplier.pk != node.supplier_id
+            and not node.fits_under(new_supplier)
+        ):
+            raise serializers.ValidationError({"supplier": MAX_DEPTH_MESSAGE})
+
         return attrs
 
-    def get_level(self, obj):
+
+class NetworkNodeBulkListSerializer(TimedDataMixin, serializers.ListSerializer):
+    """
+    Пакетное создание звеньев. Проверки, которым нужна БД, выполняются
+    для всего пакета сразу: существующие поставщики читаются одним запросом,
+    ссылки supplier_ref разрешаются в памяти. id раздаются из последовательности
+    заранее, поэтому пакет любой глубины вставляется одним bulk_create.
+    """
+
+    def run_child_validation(self, data):
+        # validate() элемента читает initial_data, как NetworkNodeSerializer
+        self.child.initial_data = data
+        return super().run_child_validation(data)
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        errors = [{} for _ in items]
+
+        refs = {}
+        for index, item in enumerate(items):
+            ref = item.get("ref")
+            if ref is None:
+                continue
+            if ref in refs:
+                errors[index]["ref"] = ["Повторяющийся ref в пакете."]
+            else:
+                refs[ref] = index
+
+        supplier_ids = {
+            item["supplier"] for item in items if item.get("supplier") is not None
+        }
+        suppliers = NetworkNode.objects.in_bulk(supplier_ids)
+
+        for index, item in enumerate(items):
+            supplier_id = item.get("supplier")
+            supplier_ref = item.get("supplier_ref")
+            if supplier_id is not None and supplier_ref is not None:
+                errors[index]["supplier"] = [
+                    "Укажите либо supplier, либо supplier_ref."
+                ]
+            elif supplier_id is not None and supplier_id not in suppliers:
+                errors[index]["supplier"] = [
+                    f'Недопустимый первичный ключ "{supplier_id}" - '
+                    "объект не существует."
+                ]
+            elif supplier_ref is not None and supplier_ref not in refs:
+                errors[index]["supplier_ref"] = ["В пакете нет звена с таким ref."]
+
+        if not any(errors):
+            # порядок создания считается один раз и переиспользуется в create()
+            self._order = self._creation_order(items)
+            for index in self._unresolved(items):
+                errors[index]["supplier_ref"] = [
+                    "Циклическая ссылка на поставщика внутри пакета."
+                ]
+            depths = {}
+            for index in self._order:
+                item = items[index]
+                if item.get("supplier_ref") is not None:
+                    depth = depths[refs[item["supplier_ref"]]] + 1
+                elif item.get("supplier") is not None:
+                    depth = suppliers[item["supplier"]].depth + 1
+                else:
+                    depth = 0
+                depths[index] = depth
+                if depth > MAX_DEPTH:
+                    errors[index]["supplier_ref"] = [MAX_DEPTH_MESSAGE]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        for item in items:
+            if item.get("supplier") is not None:
+                item["supplier"] = suppliers[item["supplier"]]
+        return items
+
+    @staticmethod
+    def _creation_order(items):
         """
-        Вычисляем уровень в иерархии:
-        - завод (supplier=None) -> 0
-        - если supplier есть -> уровень родителя + 1
+        Индексы элементов в порядке обхода в ширину по supplier_ref:
+        сначала звенья без supplier_ref, затем их клиенты и т.д. — каждый
+        поставщик раньше своих клиентов. Элементы, до которых обход не
+        дошёл, ссылаются друг на друга по кругу. O(n): словарь ref → клиенты.
         """
-        if not obj.supplier:
-            return 0
-        return obj.supplier.level + 1
+        clients = {}
+        order = []
+        for index, item in enumerate(items):
+            supplier_ref = item.get("supplier_ref")
+            if supplier_ref is None:
+                order.append(index)
+            else:
+                clients.setdefault(supplier_ref, []).append(index)
+        for index in order:  # order растёт по ходу обхода
+            order.extend(clients.pop(items[index].get("ref"), ()))
+        return order
+
+    def _unresolved(self, items):
+        """Элементы, чьи supplier_ref образуют цикл."""
+        resolved = set(self._order)
+        return [index for index in range(len(items)) if index not in resolved]
+
+    @staticmethod
+    def _allocate_ids(count):
+        """
+        count id из последовательности звеньев одним запросом, как в импорте:
+        path клиента строится из id поставщика, и с заранее известными id
+        весь пакет, сколько бы в нём ни было уровней, вставляется одним
+        bulk_create.
+        """
+        table = NetworkNode._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+                "FROM generate_series(1, %s)",
+                [table, count],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def create(self, validated_data):
+        order = getattr(self, "_order", None) or self._creation_order(validated_data)
+        created = [None] * len(validated_data)
+        by_ref = {}
+        with transaction.atomic():
+            ids = self._allocate_ids(len(order))
+            for index, pk in zip(order, ids):
+                attrs = dict(validated_data[index])
+                ref = attrs.pop("ref", None)
+                supplier_ref = attrs.pop("supplier_ref", None)
+                supplier = attrs.pop("supplier", None)
+                if supplier_ref is not None:
+                    supplier = by_ref[supplier_ref]
+                node = NetworkNode(pk=pk, **attrs)
+                node.place_under(supplier)
+                created[index] = node
+                if ref is not None:
+                    by_ref[ref] = node
+            # поставщики в списке раньше клиентов
+            NetworkNode.objects.bulk_create([created[index] for index in order])
+        for node in created:
+            # у новых звеньев ещё нет проводок
+            node.current_debt = node.debt
+        # bulk_create не шлёт post_save; новые звенья меняют только список
+        cache.invalidate_nodes()
+        CollectionVersion.bump(cache.NODES)
+        return created
+
+
+class NetworkNodeBulkSerializer(serializers.ModelSerializer):
+    """
+    Элемент пакетного создания. Поставщик задаётся либо id существующего
+    звена (supplier), либо временным ref звена из того же пакета (supplier_ref).
+    """
+
+    ref = serializers.CharField(required=False, write_only=True, max_length=64)
+    supplier = serializers.IntegerField(required=False, allow_null=True)
+    supplier_ref = serializers.CharField(required=False, write_only=True, max_length=64)
+
+    class Meta:
+        model = NetworkNode
+        fields = (
+            "ref",
+            "node_type",
+            "name",
+            "email",
+            "country",
+            "city",
+            "street",
+            "house_number",
+            "supplier",
+            "supplier_ref",
+        )
+        list_serializer_class = NetworkNodeBulkListSerializer
+
+    def validate(self, attrs):
+        validate_factory_rules(
+            attrs.get("node_type", NetworkNode.FACTORY),
+            attrs.get("supplier") or attrs.get("supplier_ref"),
+            self.initial_data.get("debt", 0),
+        )
+        if attrs.get("ref") is not None and attrs.get("supplier_ref") == attrs["ref"]:
+            raise serializers.ValidationError(
+                {"supplier_ref": "Поставщик не может быть самим собой."}
+            )
+        return attrs
+
+
+class NetworkNodeTreeSerializer(TimedDataMixin, serializers.ModelSerializer):
+    """
+    Узел дерева поставок. Клиенты берутся из context["children"]
+    (id звена -> список клиентов), собранного из одной выборки поддерева,
+    поэтому вложенность не порождает дополнительных запросов.
+    """
+
+    level = serializers.IntegerField(source="depth", read_only=True)
+    debt = serializers.DecimalField(
+        source="current_debt", max_digits=12, decimal_places=2, read_only=True
+    )
+    clients = serializers.SerializerMethodField()
+
+    class Meta:
+        model = NetworkNode
+        fields = ("id", "node_type", "name", "debt", "level", "clients")
+
+    def get_clients(self, obj):
+        children = self.context["children"].get(obj.pk, [])
+        return NetworkNodeTreeSerializer(children, many=True, context=self.context).data
+
+
+class DebtStatsSerializer(serializers.Serializer):
+    """Сводка по задолженности: число звеньев, сумма, среднее, максимум."""
+
+    nodes = serializers.IntegerField()
+    total = serializers.DecimalField(max_digits=None, decimal_places=2)
+    mean = serializers.DecimalField(max_digits=None, decimal_places=2)
+    max = serializers.DecimalField(max_digits=None, decimal_places=2)
+
+
+class DebtEntryNodeField(serializers.PrimaryKeyRelatedField):
+    """
+    Звено проводки. В пакете звенья загружены списочным сериализатором
+    одним запросом (preloaded_nodes родителя), и поле берёт их из памяти.
+    """
+
+    def to_internal_value(self, data):
+        nodes = getattr(self.parent, "preloaded_nodes", None)
+        if nodes is None:
+            return super().to_internal_value(data)
+        pk = self.to_pk(data)
+        if pk is None:
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if pk not in nodes:
+            self.fail("does_not_exist", pk_value=data)
+        return nodes[pk]
+
+    @staticmethod
+    def to_pk(data):
+        if isinstance(data, bool):
+            return None
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            return None
+
+
+class DebtEntryListSerializer(serializers.ListSerializer):
+    """
+    Пакет проводок. Звенья всего пакета читаются одним запросом, проверки
+    элементов (существование звена, не завод) выполняются в памяти;
+    запись — одним INSERT (network.ledger.post).
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            node_ids = {
+                DebtEntryNodeField.to_pk(item.get("node"))
+                for item in data
+                if isinstance(item, dict)
+            }
+            node_ids.discard(None)
+            self.child.preloaded_nodes = NetworkNode.objects.in_bulk(node_ids)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            self.child.preloaded_nodes = None
+
+    def create(self, validated_data):
+        return ledger.post([DebtEntry(**attrs) for attrs in validated_data])
+
+
+class DebtEntrySerializer(serializers.ModelSerializer):
+    """Проводка журнала задолженности: только создание и чтение."""
+
+    node = DebtEntryNodeField(queryset=NetworkNode.objects.all())
+
+    class Meta:
+        model = DebtEntry
+        fields = ("id", "node", "amount", "comment", "created_at")
+        read_only_fields = ("id", "created_at")
+        list_serializer_class = DebtEntryListSerializer
+
+    def validate_node(self, node):
+        if node.node_type == NetworkNode.FACTORY:
+            raise serializers.ValidationError(
+                "У завода не может быть задолженности перед поставщиком."
+            )
+        return node
@@ -0,0 +1,125 @@
+from django.db.models import F
+from django.db.models.functions import Now, Substr
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import cache
+from .models import CollectionVersion, DebtEntry, NetworkNode, Product
+
+# поля поставщика в supplier_info его клиентов
+CLIENT_VISIBLE_FIELDS = ("name", "email")
+
+
+@receiver(pre_delete, sender=NetworkNode)
+def reroot_clients(sender, instance, **kwargs):
+    """
+    При удалении звена его клиенты получают supplier=NULL (SET_NULL),
+    поэтому поддерево становится самостоятельным: срезаем у потомков
+    префикс пути удаляемого звена и уменьшаем depth.
+    """
+    # path берём из БД: при массовом удалении объект в памяти может устареть
+    row = (
+        NetworkNode.objects.filter(pk=instance.pk).values_list("path", "depth").first()
+    )
+    if row is None:
+        return
+    path, depth = row
+    subtree = f"{path}{instance.pk}/"
+    descendants = NetworkNode.objects.filter(path__startswith=subtree)
+    pks = list(descendants.values_list("pk", flat=True)) if cache.is_enabled() else []
+    descendants.update(
+        path=Substr("path", len(subtree) + 1),
+        depth=F("depth") - (depth + 1),
+        updated_at=Now(),
+    )
+    cache.invalidate_nodes(pks)
+
+
+@receiver(post_save, sender=NetworkNode)
+def invalidate_node(sender, instance, **kwargs):
+    """
+    Карточки клиентов показывают поставщика (supplier_info), а при переносе
+    поддерева у всех потомков меняется level — их ответы тоже сбрасываются.
+    """
+    if not cache.is_enabled():
+        return
+    if getattr(instance, "_subtree_moved", False):
+        related = NetworkNode.objects.filter(path__startswith=instance.subtree_path)
+    else:
+        related = NetworkNode.objects.filter(supplier_id=instance.pk)
+    cache.invalidate_nodes([instance.pk, *related.values_list("pk", flat=True)])
+
+
+@receiver(post_delete, sender=NetworkNode)
+def invalidate_deleted_node(sender, instance, **kwargs):
+    cache.invalidate_nodes([instance.pk])
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_supplier(sender, instance, **kwargs):
+    """Прежний поставщик нужен, чтобы сбросить и его карточку."""
+    if instance.pk:
+        instance._old_supplier_id = (
+            Product.objects.filter(pk=instance.pk)
+            .values_list("supplier_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product(sender, instance, **kwargs):
+    cache.invalidate_products(
+        [instance.pk],
+        {instance.supplier_id, getattr(instance, "_old_supplier_id", None)},
+    )
+
+
+@receiver(pre_save, sender=NetworkNode)
+def remember_node_contacts(sender, instance, update_fields=None, **kwargs):
+    """Прежние название и email — клиентов трогаем, только если они изменились."""
+    instance._old_contacts = None
+    if instance._state.adding or not (
+        update_fields is None or set(CLIENT_VISIBLE_FIELDS) & update_fields
+    ):
+        return
+    instance._old_contacts = (
+        NetworkNode.objects.filter(pk=instance.pk)
+        .values_list(*CLIENT_VISIBLE_FIELDS)
+        .first()
+    )
+
+
+@receiver(post_save, sender=NetworkNode)
+def touch_clients(sender, instance, created, **kwargs):
+    """
+    Клиенты показывают поставщика в supplier_info, поэтому вместе с его
+    названием или email меняется и их updated_at (а значит, ETag).
+    """
+    old = getattr(instance, "_old_contacts", None)
+    if created or old is None:
+        return
+    if old != tuple(getattr(instance, field) for field in CLIENT_VISIBLE_FIELDS):
+        NetworkNode.objects.filter(supplier_id=instance.pk).update(updated_at=Now())
+
+
+@receiver(post_save, sender=NetworkNode)
+@receiver(post_delete, sender=NetworkNode)
+def bump_nodes_version(sender, **kwargs):
+    CollectionVersion.bump(cache.NODES)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def touch_product_suppliers(sender, instance, **kwargs):
+    """Продукты встроены в ответ звена: меняется и версия поставщиков."""
+    suppliers = {instance.supplier_id, getattr(instance, "_old_supplier_id", None)}
+    NetworkNode.objects.filter(pk__in=suppliers - {None}).update(updated_at=Now())
+    CollectionVersion.bump(cache.PRODUCTS, cache.NODES)
+
+
+@receiver(post_save, sender=DebtEntry)
+def invalidate_debt_entry(sender, instance, created, **kwargs):
+    """Проводка меняет текущий долг звена (bulk-путь — network.ledger.post)."""
+    cache.invalidate_nodes([instance.node_id])
+    CollectionVersion.bump(cache.NODES)
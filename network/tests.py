@@ -1,9 +1,50 @@
+import csv
+import io
+import json
+import tempfile
+import time
+from concurrent.futures import wait
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+from urllib.parse import urlencode
+
+import msgpack
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config import schema
 
-from .models import NetworkNode, Product
+from . import health, ledger, metrics
+from .cache import NODES
+from .factories import NetworkNodeFactory, ProductFactory
+from .fastpath import RowRepresentation
+from .models import (
+    MAX_DEPTH,
+    MAX_DEPTH_MESSAGE,
+    CollectionVersion,
+    DebtEntry,
+    DebtRule,
+    NetworkNode,
+    Product,
+)
+from .renderers import ORJSONRenderer
+from .scheduler import Job, Scheduler
+from .serializers import NetworkNodeSerializer
+from .views import NetworkNodeViewSet, ProductViewSet
 
 User = get_user_model()
 
@@ -73,6 +114,240 @@ class NetworkNodeAPITest(APITestCase):
         self.assertEqual(self.retail.level, 1)
         self.assertEqual(self.entrepreneur.level, 2)
 
+    def test_max_depth(self):
+        """Звено и его поддерево не опускаются ниже MAX_DEPTH: path помещается в поле"""
+        NetworkNode.objects.filter(pk=self.entrepreneur.pk).update(depth=MAX_DEPTH)
+        data = {
+            "node_type": NetworkNode.ENTREPRENEUR,
+            "name": "ИП Сидоров",
+            "email": "ip3@test.com",
+            "country": "Россия",
+            "city": "Москва",
+            "street": "Арбат",
+            "house_number": "3",
+            "supplier": self.entrepreneur.id,
+        }
+        response = self.client.post(reverse("node-list"), data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["supplier"], [MAX_DEPTH_MESSAGE])
+
+        # перенос розницы на уровень ниже опустил бы ИП за MAX_DEPTH
+        data["supplier"] = self.factory.id
+        other = self.client.post(reverse("node-list"), data).data["id"]
+        url = reverse("node-detail", args=[self.retail.id])
+        response = self.client.patch(url, {"supplier": other})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(url, {"supplier": self.factory.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.retail.supplier_id = other
+        with self.assertRaisesMessage(ValidationError, MAX_DEPTH_MESSAGE):
+            self.retail.clean()
+
+    def test_level_follows_supplier_change(self):
+        """При смене поставщика уровень пересчитывается у всего поддерева"""
+        child = NetworkNode.objects.create(
+            node_type=NetworkNode.ENTREPRENEUR,
+            name="ИП Сидоров",
+            email="ip3@test.com",
+            country="Россия",
+            city="Москва",
+            street="Арбат",
+            house_number="3",
+            supplier=self.entrepreneur,
+        )
+        self.assertEqual(child.level, 3)
+
+        url = reverse("node-detail", args=[self.entrepreneur.id])
+        response = self.client.patch(url, {"supplier": self.factory.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["level"], 1)
+
+        child.refresh_from_db()
+        self.assertEqual(child.level, 2)
+        self.assertEqual(child.path, f"{self.factory.id}/{self.entrepreneur.id}/")
+
+    def test_level_after_supplier_deleted(self):
+        """После удаления поставщика клиенты становятся верхним уровнем"""
+        self.retail.delete()
+        self.entrepreneur.refresh_from_db()
+        self.assertIsNone(self.entrepreneur.supplier)
+        self.assertEqual(self.entrepreneur.level, 0)
+        self.assertEqual(self.entrepreneur.path, "")
+
+    def test_supplier_cannot_be_own_client(self):
+        """Нельзя назначить поставщиком собственного клиента"""
+        url = reverse("node-detail", args=[self.retail.id])
+        data = {"supplier": self.entrepreneur.id}
+        response = self.client.patch(url, data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_descendants(self):
+        """Потомки завода: розница и ИП"""
+        url = reverse("node-descendants", args=[self.factory.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = {n["id"] for n in response.data["results"]}
+        self.assertEqual(ids, {self.retail.id, self.entrepreneur.id})
+
+    def test_ancestors(self):
+        """Предки ИП идут от завода к непосредственному поставщику"""
+        url = reverse("node-ancestors", args=[self.entrepreneur.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [n["id"] for n in response.data]
+        self.assertEqual(ids, [self.factory.id, self.retail.id])
+
+    def test_tree(self):
+        """Дерево поставок завода собирается одним рекурсивным запросом"""
+        url = reverse("node-tree", args=[self.factory.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], self.factory.id)
+        (retail,) = response.data["clients"]
+        self.assertEqual(retail["id"], self.retail.id)
+        (entrepreneur,) = retail["clients"]
+        self.assertEqual(entrepreneur["id"], self.entrepreneur.id)
+        self.assertEqual(entrepreneur["level"], 2)
+        self.assertEqual(entrepreneur["clients"], [])
+
+    def _bulk_payload(self, stores):
+        """Розничная сеть из пакета и stores её магазинов-ИП."""
+        address = {
+            "email": "chain@test.com",
+            "country": "Россия",
+            "city": "Казань",
+            "street": "Баумана",
+            "house_number": "1",
+        }
+        payload = [
+            {
+                "ref": "chain",
+                "node_type": NetworkNode.RETAIL,
+                "name": "Сеть",
+                "supplier": self.factory.id,
+                **address,
+            }
+        ]
+        payload += [
+            {
+                "node_type": NetworkNode.ENTREPRENEUR,
+                "name": f"Магазин {i}",
+                "supplier_ref": "chain",
+                **address,
+            }
+            for i in range(stores)
+        ]
+        return payload
+
+    def test_bulk_create_with_batch_refs(self):
+        """Пакет создаётся целиком, ссылки внутри пакета разрешаются"""
+        url = reverse("node-list")
+        response = self.client.post(url, self._bulk_payload(2), format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        chain, store, _ = response.data
+        self.assertEqual(chain["supplier"], self.factory.id)
+        self.assertEqual(chain["level"], 1)
+        self.assertEqual(store["supplier"], chain["id"])
+        self.assertEqual(store["level"], 2)
+        node = NetworkNode.objects.get(pk=store["id"])
+        self.assertEqual(node.path, f"{self.factory.id}/{chain['id']}/")
+
+    def test_bulk_create_queries_do_not_grow(self):
+        """Число запросов пакетного создания не зависит от размера пакета"""
+        url = reverse("node-list")
+        with self.assertNumQueries(6):
+            self.client.post(url, self._bulk_payload(2), format="json")
+        with self.assertNumQueries(6):
+            self.client.post(url, self._bulk_payload(50), format="json")
+
+    def test_bulk_create_deep_chain(self):
+        """Цепочка ссылок внутри пакета вставляется одним bulk_create"""
+        payload = self._bulk_payload(0)
+        for i in range(30):
+            store = {**payload[-1], "ref": f"store-{i}"}
+            store.pop("supplier", None)
+            store.update(
+                node_type=NetworkNode.ENTREPRENEUR, supplier_ref=payload[-1]["ref"]
+            )
+            payload.append(store)
+        payload[1:] = payload[:0:-1]  # клиенты в пакете раньше поставщиков
+        url = reverse("node-list")
+        with self.assertNumQueries(6):
+            response = self.client.post(url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        deepest = NetworkNode.objects.get(pk=response.data[1]["id"])
+        self.assertEqual(deepest.depth, 31)
+        self.assertEqual(deepest.ancestor_ids[0], self.factory.id)
+
+    def test_bulk_create_max_depth(self):
+        """Звенья пакета глубже MAX_DEPTH отклоняются"""
+        payload = self._bulk_payload(0)
+        for i in range(MAX_DEPTH):
+            store = {**payload[-1], "ref": f"store-{i}"}
+            store.pop("supplier", None)
+            store.update(
+                node_type=NetworkNode.ENTREPRENEUR, supplier_ref=payload[-1]["ref"]
+            )
+            payload.append(store)
+        response = self.client.post(reverse("node-list"), payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # сеть — уровень 1, магазин i — уровень i + 2
+        self.assertEqual(response.data[-1]["supplier_ref"], [MAX_DEPTH_MESSAGE])
+        self.assertEqual(response.data[-2], {})
+
+    def test_bulk_create_validates_whole_batch(self):
+        """Ошибки пакета возвращаются по элементам, ничего не создаётся"""
+        payload = self._bulk_payload(1)
+        payload[0]["node_type"] = NetworkNode.FACTORY  # завод с поставщиком
+        payload[1]["supplier_ref"] = "missing"
+        count = NetworkNode.objects.count()
+
+        response = self.client.post(reverse("node-list"), payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("supplier", response.data[0])
+        self.assertEqual(NetworkNode.objects.count(), count)
+
+    def test_bulk_create_rejects_cycles(self):
+        """Циклические ссылки внутри пакета отклоняются"""
+        payload = self._bulk_payload(1)
+        payload[0].pop("supplier")
+        payload[0]["supplier_ref"] = "store"
+        payload[1]["ref"] = "store"
+        response = self.client.post(reverse("node-list"), payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_csv(self):
+        """CSV-выгрузка: строка на каждый продукт, звенья без продуктов — тоже"""
+        Product.objects.create(
+            name="Телевизор",
+            model="LG1",
+            release_date="2024-01-01",
+            supplier=self.retail,
+        )
+        response = self.client.get(reverse("node-export") + "?ordering=created_at")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = list(
+            csv.reader(io.StringIO(b"".join(response.streaming_content).decode()))
+        )
+        self.assertEqual(rows[0][0], "id")
+        self.assertEqual(
+            [row[0] for row in rows[1:]],
+            [str(self.factory.id), str(self.retail.id), str(self.entrepreneur.id)],
+        )
+        self.assertEqual(rows[2][-3], "Телевизор")
+
+    def test_export_ndjson_honors_filters(self):
+        """NDJSON-выгрузка учитывает фильтры списка"""
+        self.entrepreneur.country = "Беларусь"
+        self.entrepreneur.save()
+        query = urlencode({"type": "ndjson", "country": "Беларусь"})
+        response = self.client.get(reverse("node-export") + "?" + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)["id"] for line in lines], [self.entrepreneur.id]
+        )
+
     def test_factory_cannot_have_debt(self):
         """Завод не может иметь задолженность"""
         url = reverse("node-list")
@@ -130,22 +405,221 @@ class NetworkNodeAPITest(APITestCase):
         """Фильтрация по стране работает"""
         url = reverse("node-list") + "?country=Россия"
         response = self.client.get(url)
-        self.assertTrue(all(n["country"] == "Россия" for n in response.data))
+        self.assertTrue(all(n["country"] == "Россия" for n in response.data["results"]))
 
     def test_ordering_by_name(self):
         """Сортировка по имени работает"""
         url = reverse("node-list") + "?ordering=name"
         response = self.client.get(url)
-        names = [n["name"] for n in response.data]
+        names = [n["name"] for n in response.data["results"]]
         self.assertEqual(names, sorted(names))
 
     def test_ordering_by_created_at(self):
         """Сортировка по дате создания работает"""
         url = reverse("node-list") + "?ordering=created_at"
         response = self.client.get(url)
-        dates = [n["created_at"] for n in response.data]
+        dates = [n["created_at"] for n in response.data["results"]]
         self.assertEqual(dates, sorted(dates))
 
+    def test_cursor_pagination(self):
+        """Курсорная пагинация отдаёт все звенья без повторов"""
+        url = reverse("node-list") + "?page_size=2"
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            seen += [n["id"] for n in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(seen, [self.entrepreneur.id, self.retail.id, self.factory.id])
+
+    def test_sparse_fields(self):
+        """?fields= оставляет только перечисленные поля и не грузит продукты"""
+        url = reverse("node-list") + "?fields=id,name,products"
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data["results"][0]), {"id", "name"})
+        # версия коллекции (ETag) и сама страница — без prefetch продуктов
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn("house_number", queries[-1]["sql"])
+
+    def test_expand(self):
+        """?expand= добавляет встроенные объекты к базовым полям"""
+        Product.objects.create(
+            name="Телевизор",
+            model="LG1",
+            release_date="2024-01-01",
+            supplier=self.retail,
+        )
+        url = reverse("node-detail", args=[self.retail.id])
+        response = self.client.get(url + "?expand=products")
+        self.assertEqual(len(response.data["products"]), 1)
+        self.assertIn("house_number", response.data)
+        self.assertNotIn("supplier_info", response.data)
+
+        response = self.client.get(url + "?fields=id,level&expand=supplier_info")
+        self.assertEqual(
+            response.data,
+            {
+                "id": self.retail.id,
+                "level": 1,
+                "supplier_info": {
+                    "id": self.factory.id,
+                    "name": "Завод",
+                    "email": "factory@test.com",
+                },
+            },
+        )
+
+    def test_sparse_fields_pagination(self):
+        """Пагинация курсором работает и с узкой выборкой колонок"""
+        url = reverse("node-list") + "?fields=id&page_size=2&ordering=name"
+        seen = []
+        while url:
+            response = self.client.get(url)
+            seen += [n["id"] for n in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(len(seen), 3)
+
+    def test_fast_list_matches_serializer(self):
+        """Быстрый list отдаёт побайтно тот же JSON, что и сериализатор"""
+        Product.objects.create(
+            name="Телевизор",
+            model="LG1",
+            release_date="2024-01-01",
+            supplier=self.retail,
+        )
+        self.retail.debt = "1234.5"
+        self.retail.save()
+        urls = [
+            reverse("node-list"),
+            reverse("node-list") + "?page_size=2&ordering=name",
+            reverse("node-list") + "?" + urlencode({"search": "Москва"}),
+            reverse("node-list") + "?fields=id,debt&expand=supplier_info",
+            reverse("node-descendants", args=[self.factory.id]),
+            reverse("product-list"),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                fast = self.client.get(url)
+                with (
+                    mock.patch.object(NetworkNodeViewSet, "fast_list", False),
+                    mock.patch.object(ProductViewSet, "fast_list", False),
+                ):
+                    slow = self.client.get(url)
+                self.assertEqual(fast.status_code, status.HTTP_200_OK)
+                self.assertEqual(fast.content, slow.content)
+
+    def test_msgpack_roundtrip(self):
+        """MessagePack: создание звена и ответ в том же формате"""
+        body = msgpack.packb(
+            {
+                "node_type": NetworkNode.RETAIL,
+                "name": "Сеть",
+                "email": "pack@test.com",
+                "country": "Россия",
+                "city": "Казань",
+                "street": "Баумана",
+                "house_number": "3",
+                "supplier": self.factory.id,
+            }
+        )
+        response = self.client.post(
+            reverse("node-list"),
+            body,
+            content_type="application/msgpack",
+            HTTP_ACCEPT="application/msgpack",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        data = msgpack.unpackb(response.content)
+        self.assertEqual(data["supplier"], self.factory.id)
+        self.assertEqual(data["debt"], "0.00")
+
+        response = self.client.get(
+            reverse("node-detail", args=[self.factory.id]),
+            HTTP_ACCEPT="application/msgpack",
+        )
+        self.assertEqual(msgpack.unpackb(response.content)["name"], "Завод")
+
+    def test_json_renderer_native_types(self):
+        """orjson-рендерер кодирует Decimal, date и datetime как DRF"""
+        data = {
+            "debt": Decimal("10.50"),
+            "release_date": date(2024, 1, 2),
+            "created_at": datetime(2024, 1, 2, 3, 4, 5, 600000, tzinfo=dt_timezone.utc),
+        }
+        self.assertEqual(
+            json.loads(ORJSONRenderer().render(data)),
+            {
+                "debt": "10.50",
+                "release_date": "2024-01-02",
+                "created_at": "2024-01-02T03:04:05.600000Z",
+            },
+        )
+
+    def test_subtree_debt_stats(self):
+        """Сводка по задолженности всего поддерева завода"""
+        NetworkNode.objects.filter(pk=self.retail.pk).update(debt="100.00")
+        NetworkNode.objects.filter(pk=self.entrepreneur.pk).update(debt="50.50")
+        url = reverse("node-subtree-debt-stats", args=[self.factory.id])
+        response = self.client.get(url, {"group_by": "level"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            {
+                "nodes": 2,
+                "total": "150.50",
+                "mean": "75.25",
+                "max": "100.00",
+                "groups": [
+                    {
+                        "level": 1,
+                        "nodes": 1,
+                        "total": "100.00",
+                        "mean": "100.00",
+                        "max": "100.00",
+                    },
+                    {
+                        "level": 2,
+                        "nodes": 1,
+                        "total": "50.50",
+                        "mean": "50.50",
+                        "max": "50.50",
+                    },
+                ],
+            },
+        )
+
+        url = reverse("node-subtree-debt-stats", args=[self.entrepreneur.id])
+        response = self.client.get(url)
+        self.assertEqual(
+            response.data, {"nodes": 0, "total": "0.00", "mean": None, "max": None}
+        )
+
+    def test_debt_stats_grouped(self):
+        """Сводка по сети в разрезе типа звена, с фильтрами списка"""
+        NetworkNode.objects.filter(pk=self.retail.pk).update(debt="100.00")
+        url = reverse("node-debt-stats")
+        response = self.client.get(
+            url, {"group_by": "node_type", "country": "Россия", "search": "Москва"}
+        )
+        self.assertEqual(response.data["nodes"], 3)
+        self.assertEqual(response.data["total"], "100.00")
+        groups = {row["node_type"]: row["nodes"] for row in response.data["groups"]}
+        self.assertEqual(
+            groups,
+            {
+                NetworkNode.FACTORY: 1,
+                NetworkNode.RETAIL: 1,
+                NetworkNode.ENTREPRENEUR: 1,
+            },
+        )
+
+        response = self.client.get(url, {"group_by": "debt"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class ProductAPITest(APITestCase):
     def setUp(self):
@@ -189,24 +663,1189 @@ class ProductAPITest(APITestCase):
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def walk(self, url, link="next"):
+        """id всех записей по ссылкам link, начиная с url"""
+        seen = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += [p["id"] for p in response.data["results"]]
+            url = response.data[link]
+            pages += 1
+            self.assertLess(pages, 20, "пагинация зациклилась")
+        return seen, response
+
+    def test_keyset_pagination_with_ties(self):
+        """Больше 1000 продуктов с одной датой обходятся без повторов"""
+        Product.objects.bulk_create(
+            Product(
+                name="Роутер",
+                model=f"R-{i}",
+                release_date="2023-05-01",
+                supplier=self.factory,
+            )
+            for i in range(1600)
+        )
+        expected = list(
+            Product.objects.order_by("-release_date", "-id").values_list(
+                "id", flat=True
+            )
+        )
+        for fast_list in (True, False):
+            with (
+                self.subTest(fast_list=fast_list),
+                mock.patch.object(ProductViewSet, "fast_list", fast_list),
+            ):
+                seen, last = self.walk(reverse("product-list") + "?page_size=500")
+                self.assertEqual(seen, expected)
+
+                # назад от последней страницы — все предыдущие записи по разу
+                previous, first = self.walk(last.data["previous"], link="previous")
+                tail = len(last.data["results"])
+                self.assertCountEqual(previous, expected[:-tail])
+                self.assertEqual(
+                    [p["id"] for p in first.data["results"]], expected[:500]
+                )
+
+        seen, _ = self.walk(reverse("product-list") + "?page_size=500&ordering=name")
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(set(seen), set(expected))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("product-list") + "?cursor=bad")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_filter_by_release_date(self):
         """Фильтрация по дате выпуска работает"""
         url = reverse("product-list") + "?release_date=2024-01-01"
         response = self.client.get(url)
-        self.assertTrue(all(p["release_date"] == "2024-01-01" for p in response.data))
+        self.assertTrue(
+            all(p["release_date"] == "2024-01-01" for p in response.data["results"])
+        )
 
     def test_filter_by_supplier(self):
         """Фильтрация по поставщику работает"""
         url = reverse("product-list") + f"?supplier={self.factory.id}"
         response = self.client.get(url)
-        self.assertTrue(all(p["supplier"] == self.factory.id for p in response.data))
+        self.assertTrue(
+            all(p["supplier"] == self.factory.id for p in response.data["results"])
+        )
 
     def test_search_by_name_and_model(self):
         """Поиск по имени и модели работает"""
         url = reverse("product-list") + "?search=Телевизор"
         response = self.client.get(url)
-        self.assertTrue(any("Телевизор" in p["name"] for p in response.data))
+        self.assertTrue(any("Телевизор" in p["name"] for p in response.data["results"]))
 
         url = reverse("product-list") + "?search=SamsungA"
         response = self.client.get(url)
-        self.assertTrue(any("SamsungA" in p["model"] for p in response.data))
+        self.assertTrue(any("SamsungA" in p["model"] for p in response.data["results"]))
+
+    def test_search_ranked(self):
+        """Результаты поиска отсортированы по релевантности"""
+        Product.objects.create(
+            name="Телевизор Телевизор",
+            model="TV-1",
+            release_date="2024-03-01",
+            supplier=self.factory,
+        )
+        query = urlencode({"search": "Телевизор", "page_size": 1})
+        url = reverse("product-list") + "?" + query
+        names = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names += [p["name"] for p in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(names, ["Телевизор Телевизор", "Телевизор"])
+
+
+class DebtLedgerTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="ledger@test.com", password="12345", is_staff=True, is_active=True
+        )
+        self.client.force_authenticate(self.user)
+        self.factory = NetworkNode.objects.create(
+            node_type=NetworkNode.FACTORY,
+            name="Завод",
+            email="factory@test.com",
+            country="Россия",
+            city="Москва",
+            street="Ленина",
+            house_number="1",
+        )
+        self.retail = NetworkNode.objects.create(
+            node_type=NetworkNode.RETAIL,
+            name="Розница",
+            email="retail@test.com",
+            country="Россия",
+            city="Москва",
+            street="Тверская",
+            house_number="10",
+            supplier=self.factory,
+            debt="10.00",
+        )
+        self.url = reverse("debt-entry-list")
+        self.node_url = reverse("node-detail", args=[self.retail.id])
+
+    def test_entries_change_current_debt(self):
+        """Проводки добавляются к снимку; пакет пишется одним запросом"""
+        etag = self.client.get(self.node_url)["ETag"]
+        response = self.client.post(
+            self.url, {"node": self.retail.id, "amount": "5.25"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(
+            self.url,
+            [
+                {"node": self.retail.id, "amount": "100.00"},
+                {"node": self.retail.id, "amount": "-15.25", "comment": "Оплата"},
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 2)
+
+        response = self.client.get(self.node_url)
+        self.assertEqual(response.data["debt"], "100.00")
+        self.assertNotEqual(response["ETag"], etag)
+        stats = self.client.get(reverse("node-debt-stats")).data
+        self.assertEqual(stats["total"], "100.00")
+
+    def test_snapshot_folds_tail(self):
+        """Снимок переносит хвост журнала в debt, текущий долг не меняется"""
+        ledger.post([DebtEntry(node=self.retail, amount="7.50") for _ in range(2)])
+        self.assertEqual(ledger.snapshot(), 1)
+        self.retail.refresh_from_db()
+        self.assertEqual(self.retail.debt, Decimal("25.00"))
+        self.assertEqual(self.retail.debt_entry_id, DebtEntry.objects.latest("id").id)
+
+        ledger.post([DebtEntry(node=self.retail, amount="1.00")])
+        self.assertEqual(self.client.get(self.node_url).data["debt"], "26.00")
+        self.assertEqual(ledger.snapshot(), 1)
+        self.assertEqual(ledger.snapshot(), 0)
+
+    def test_entries_are_immutable(self):
+        entry = DebtEntry.objects.create(node=self.retail, amount="1.00")
+        entry.amount = "2.00"
+        with self.assertRaises(ValidationError):
+            entry.save()
+        with self.assertRaises(ValidationError):
+            entry.delete()
+
+    def test_batch_queries_do_not_grow(self):
+        """Звенья пакета читаются одним запросом, сколько бы ни было проводок"""
+        counts = []
+        for size in (5, 50):
+            payload = [{"node": self.retail.id, "amount": "1.00"}] * size
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, payload, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_batch_validates_nodes(self):
+        response = self.client.post(
+            self.url,
+            [
+                {"node": self.retail.id, "amount": "1.00"},
+                {"node": self.factory.id, "amount": "1.00"},
+                {"node": 0, "amount": "1.00"},
+                {"node": "x", "amount": "1.00"},
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("node", response.data[1])
+        self.assertEqual(response.data[2]["node"][0].code, "does_not_exist")
+        self.assertEqual(response.data[3]["node"][0].code, "incorrect_type")
+        self.assertFalse(DebtEntry.objects.exists())
+
+    def test_factory_entry_rejected(self):
+        response = self.client.post(
+            self.url, {"node": self.factory.id, "amount": "1.00"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_clear_debt_writes_ledger(self):
+        """clear_debt обнуляет текущий долг проводкой, не трогая снимок"""
+        from django.contrib.admin.sites import site
+
+        from .admin import clear_debt
+
+        ledger.post([DebtEntry(node=self.retail, amount="5.00")])
+        modeladmin = site._registry[NetworkNode]
+        modeladmin.message_user = lambda *args, **kwargs: None
+        clear_debt(modeladmin, None, NetworkNode.objects.all())
+
+        entry = DebtEntry.objects.latest("id")
+        self.assertEqual(entry.amount, Decimal("-15.00"))
+        self.assertEqual(DebtEntry.objects.count(), 2)
+        self.assertEqual(self.client.get(self.node_url).data["debt"], "0.00")
+
+    def make_rule(self, **kwargs):
+        return DebtRule.objects.create(
+            name=kwargs.pop("name", "Правило"),
+            node_type=kwargs.pop("node_type", NetworkNode.RETAIL),
+            next_run_at=timezone.now() - timedelta(minutes=1),
+            **kwargs,
+        )
+
+    def test_rule_accrual_and_write_off(self):
+        """Правило проводит сумму и процент по звеньям типа, не ниже нуля"""
+        other = NetworkNode.objects.create(
+            node_type=NetworkNode.RETAIL,
+            name="Розница 2",
+            email="retail2@test.com",
+            country="Россия",
+            city="Тула",
+            street="Ленина",
+            house_number="2",
+            supplier=self.factory,
+        )
+        rule = self.make_rule(amount="5.00")
+        self.assertEqual(ledger.apply_rule(rule.pk), 2)
+        self.assertEqual(ledger.apply_rule(rule.pk), 0)
+
+        rule = self.make_rule(name="Списание", percent="-50")
+        self.assertEqual(ledger.apply_rule(rule.pk), 2)
+        rule = self.make_rule(name="Обнуление", amount="-100.00")
+        self.assertEqual(ledger.apply_rule(rule.pk), 2)
+        rule = self.make_rule(name="Ещё списание", amount="-1.00")
+        self.assertEqual(ledger.apply_rule(rule.pk), 0)
+
+        debts = dict(
+            NetworkNode.objects.with_current_debt().values_list("pk", "current_debt")
+        )
+        self.assertEqual(debts, {self.factory.pk: 0, self.retail.pk: 0, other.pk: 0})
+        amounts = DebtEntry.objects.filter(node=self.retail).values_list(
+            "amount", flat=True
+        )
+        self.assertEqual(
+            sorted(amounts), [Decimal("-7.50"), Decimal("-7.50"), Decimal("5.00")]
+        )
+
+    def test_rule_chunks_resume_and_schedule(self):
+        """Пакеты продолжаются с cursor; следующий запуск — через interval"""
+        nodes = [
+            NetworkNode.objects.create(
+                node_type=NetworkNode.RETAIL,
+                name=f"Розница {i}",
+                email=f"r{i}@test.com",
+                country="Россия",
+                city="Тула",
+                street="Ленина",
+                house_number=str(i),
+            )
+            for i in range(3)
+        ]
+        rule = self.make_rule(amount="1.00", interval=timedelta(hours=1))
+        # прерванный запуск: retail и первое звено уже обработаны
+        DebtRule.objects.filter(pk=rule.pk).update(cursor=nodes[0].pk)
+        self.assertEqual(ledger.apply_rule(rule.pk, chunk_size=1), 2)
+        self.assertEqual(
+            set(DebtEntry.objects.values_list("node_id", flat=True)),
+            {nodes[1].pk, nodes[2].pk},
+        )
+        planned = rule.next_run_at
+        rule.refresh_from_db()
+        self.assertEqual(rule.cursor, 0)
+        self.assertEqual(rule.next_run_at, planned + timedelta(hours=1))
+
+
+class NetworkAdminTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="admin@test.com", password="12345"
+        )
+        self.client.force_login(self.admin)
+        self.factory = NetworkNodeFactory(name="Завод")
+        self.clients = [
+            NetworkNodeFactory(node_type=NetworkNode.RETAIL, supplier=self.factory)
+            for _ in range(3)
+        ]
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow(self):
+        """Число запросов списка не зависит от числа звеньев на странице"""
+        url = reverse("admin:network_networknode_changelist")
+        before = self.changelist_queries(url)
+        for node in self.clients:
+            NetworkNodeFactory(node_type=NetworkNode.ENTREPRENEUR, supplier=node)
+        self.assertEqual(self.changelist_queries(url), before)
+
+        url = reverse("admin:network_product_changelist")
+        before = self.changelist_queries(url)
+        ProductFactory.create_batch(3, supplier=self.factory)
+        self.assertEqual(self.changelist_queries(url), before)
+
+    def test_change_form_posts_debt_adjustment(self):
+        """Снимок debt в форме не меняется, корректировка — проводка журнала"""
+        node = self.clients[0]
+        url = reverse("admin:network_networknode_change", args=[node.id])
+        response = self.client.get(url)
+        self.assertNotContains(response, 'name="debt"')
+        self.assertContains(response, 'name="debt_adjustment"')
+
+        data = {
+            field: getattr(node, field)
+            for field in ("node_type", "name", "email", "country", "city", "street")
+        }
+        data.update(
+            house_number=node.house_number,
+            supplier=self.factory.id,
+            debt="999.00",
+            debt_adjustment="12.50",
+        )
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        node.refresh_from_db()
+        self.assertEqual(node.debt, Decimal("0.00"))
+        self.assertEqual(node.current_debt, Decimal("12.50"))
+        entry = DebtEntry.objects.get(node=node)
+        self.assertEqual(entry.amount, Decimal("12.50"))
+
+        url = reverse("admin:network_networknode_change", args=[self.factory.id])
+        data.update(node_type=NetworkNode.FACTORY, supplier="")
+        response = self.client.post(url, data)
+        self.assertContains(response, "У завода не может быть задолженности")
+        self.assertEqual(DebtEntry.objects.count(), 1)
+
+    def test_supplier_filter_by_id(self):
+        url = reverse("admin:network_networknode_changelist")
+        response = self.client.get(url, {"supplier": self.factory.id})
+        self.assertEqual(response.context["cl"].result_count, 3)
+        self.assertContains(response, 'name="supplier"')
+
+    def test_supplier_autocomplete(self):
+        response = self.client.get(
+            reverse("admin:autocomplete"),
+            {
+                "term": "Завод",
+                "app_label": "network",
+                "model_name": "networknode",
+                "field_name": "supplier",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        ids = [int(item["id"]) for item in response.json()["results"]]
+        self.assertIn(self.factory.id, ids)
+
+
+@override_settings(API_CACHE_TIMEOUT=60)
+class ResponseCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="cache@test.com", password="12345", is_staff=True, is_active=True
+        )
+        self.client.force_authenticate(self.user)
+        self.factory = NetworkNode.objects.create(
+            node_type=NetworkNode.FACTORY,
+            name="Завод",
+            email="factory@test.com",
+            country="Россия",
+            city="Москва",
+            street="Ленина",
+            house_number="1",
+        )
+        self.retail = NetworkNode.objects.create(
+            node_type=NetworkNode.RETAIL,
+            name="Розница",
+            email="retail@test.com",
+            country="Россия",
+            city="Москва",
+            street="Тверская",
+            house_number="10",
+            supplier=self.factory,
+        )
+
+    def test_repeated_list_served_from_cache(self):
+        """Повторный запрос списка читает из БД только версию коллекции"""
+        url = reverse("node-list") + "?country=Россия"
+        first = self.client.get(url)
+        with self.assertNumQueries(1):
+            second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+
+    def test_product_change_invalidates_node_responses(self):
+        """Новый продукт виден в списке и карточке поставщика"""
+        list_url = reverse("node-list")
+        detail_url = reverse("node-detail", args=[self.factory.id])
+        self.client.get(list_url)
+        self.client.get(detail_url)
+
+        Product.objects.create(
+            name="Телевизор",
+            model="LG1",
+            release_date="2024-01-01",
+            supplier=self.factory,
+        )
+        response = self.client.get(detail_url)
+        self.assertEqual(len(response.data["products"]), 1)
+        factory = next(
+            n
+            for n in self.client.get(list_url).data["results"]
+            if n["id"] == self.factory.id
+        )
+        self.assertEqual(len(factory["products"]), 1)
+
+    def test_supplier_rename_invalidates_client_detail(self):
+        """Переименование поставщика сбрасывает карточки его клиентов"""
+        url = reverse("node-detail", args=[self.retail.id])
+        self.client.get(url)
+        self.factory.name = "Новый завод"
+        self.factory.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data["supplier_info"]["name"], "Новый завод")
+
+    def test_clear_debt_action_invalidates(self):
+        """Админ-действие clear_debt сбрасывает закешированные карточки"""
+        from django.contrib.admin.sites import site
+
+        from .admin import clear_debt
+
+        NetworkNode.objects.filter(pk=self.retail.pk).update(debt=100)
+        url = reverse("node-detail", args=[self.retail.id])
+        self.assertEqual(self.client.get(url).data["debt"], "100.00")
+
+        modeladmin = site._registry[NetworkNode]
+        modeladmin.message_user = lambda *args, **kwargs: None
+        clear_debt(modeladmin, None, NetworkNode.objects.filter(pk=self.retail.pk))
+        self.assertEqual(self.client.get(url).data["debt"], "0.00")
+
+
+class ConditionalGetTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="etag@test.com", password="12345", is_staff=True, is_active=True
+        )
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.factory = NetworkNode.objects.create(
+                node_type=NetworkNode.FACTORY,
+                name="Завод",
+                email="factory@test.com",
+                country="Россия",
+                city="Москва",
+                street="Ленина",
+                house_number="1",
+            )
+            self.retail = NetworkNode.objects.create(
+                node_type=NetworkNode.RETAIL,
+                name="Розница",
+                email="retail@test.com",
+                country="Россия",
+                city="Москва",
+                street="Тверская",
+                house_number="10",
+                supplier=self.factory,
+            )
+
+    def assertNotModified(self, url, response):
+        """Повторный запрос с ETag: 304 после одного запроса версии"""
+        with self.assertNumQueries(1):
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(again["ETag"], response["ETag"])
+
+    def assertModified(self, url, response):
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(again["ETag"], response["ETag"])
+
+    def test_detail_not_modified(self):
+        url = reverse("node-detail", args=[self.factory.id])
+        response = self.client.get(url)
+        self.assertIn("Last-Modified", response)
+        self.assertNotModified(url, response)
+
+    def test_list_not_modified(self):
+        url = reverse("node-list")
+        response = self.client.get(url)
+        self.assertIn("Last-Modified", response)
+        self.assertNotModified(url, response)
+
+    def test_etag_depends_on_query(self):
+        url = reverse("node-list")
+        response = self.client.get(url)
+        self.assertModified(url + "?country=Россия", response)
+
+    def test_product_change_modifies_supplier_and_list(self):
+        detail_url = reverse("node-detail", args=[self.factory.id])
+        list_url = reverse("node-list")
+        detail = self.client.get(detail_url)
+        listing = self.client.get(list_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(
+                name="Телевизор",
+                model="LG1",
+                release_date="2024-01-01",
+                supplier=self.factory,
+            )
+        self.assertModified(detail_url, detail)
+        self.assertModified(list_url, listing)
+
+    def test_supplier_rename_modifies_client(self):
+        url = reverse("node-detail", args=[self.retail.id])
+        response = self.client.get(url)
+        self.factory.name = "Новый завод"
+        self.factory.save(update_fields=["name"])
+        self.assertModified(url, response)
+
+    def test_unchanged_supplier_save_keeps_clients(self):
+        """Сохранение поставщика без смены названия и email не трогает клиентов"""
+        updated_at = self.retail.updated_at
+        self.factory.city = "Тула"
+        self.factory.save()
+        self.retail.refresh_from_db()
+        self.assertEqual(self.retail.updated_at, updated_at)
+        url = reverse("node-detail", args=[self.retail.id])
+        response = self.client.get(url)
+        self.factory.email = "new@test.com"
+        self.factory.save()
+        self.assertModified(url, response)
+
+    def test_product_detail_not_modified(self):
+        product = Product.objects.create(
+            name="Телевизор",
+            model="LG1",
+            release_date="2024-01-01",
+            supplier=self.factory,
+        )
+        url = reverse("product-detail", args=[product.id])
+        response = self.client.get(url)
+        self.assertNotModified(url, response)
+        self.client.patch(url, {"model": "LG2"})
+        self.assertModified(url, response)
+
+    def test_missing_object(self):
+        response = self.client.get(reverse("node-detail", args=[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SchedulerTest(SimpleTestCase):
+    def test_run_pending_and_stats(self):
+        calls = []
+
+        def failing():
+            raise RuntimeError("сбой")
+
+        scheduler = Scheduler(
+            [Job("ok", lambda: calls.append(1), 60), Job("failing", failing, 60)]
+        )
+        with self.assertLogs("network.scheduler", "ERROR"):
+            wait(scheduler.run_pending())
+        # интервал ещё не прошёл
+        self.assertEqual(scheduler.run_pending(), [])
+        scheduler.pool.shutdown()
+
+        self.assertEqual(calls, [1])
+        stats = scheduler.stats()
+        self.assertEqual(stats["ok"]["runs"], 1)
+        self.assertEqual(stats["ok"]["failures"], 0)
+        self.assertEqual(stats["failing"]["failures"], 1)
+        self.assertIn("сбой", stats["failing"]["last_error"])
+
+    def test_replace_jobs(self):
+        """Задачи с прежним key сохраняют статистику, остальные заменяются"""
+        calls = []
+        scheduler = Scheduler(
+            [
+                Job("snapshot", lambda: calls.append("snapshot"), 60),
+                Job("rule:a", lambda: calls.append("a"), 60, key="rule:1"),
+                Job("rule:b", lambda: calls.append("b"), 60, key="rule:2"),
+            ]
+        )
+        wait(scheduler.run_pending())
+        scheduler.replace_jobs(
+            "rule:",
+            [
+                Job("rule:renamed", lambda: calls.append("renamed"), 60, key="rule:1"),
+                Job("rule:c", lambda: calls.append("c"), 60, key="rule:3"),
+            ],
+        )
+        # новое правило запускается сразу, у оставшегося интервал не прошёл
+        wait(scheduler.run_pending())
+        scheduler.pool.shutdown()
+
+        self.assertCountEqual(calls, ["snapshot", "a", "b", "c"])
+        stats = scheduler.stats()
+        self.assertEqual(set(stats), {"snapshot", "rule:renamed", "rule:c"})
+        self.assertEqual(stats["rule:renamed"]["runs"], 1)
+
+
+class AsyncReadTest(APITestCase):
+    """Асинхронные list/retrieve (async_views)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="async@test.com", password="12345", is_staff=True, is_active=True
+        )
+        self.auth = f"Bearer {AccessToken.for_user(self.user)}"
+        self.factory = NetworkNode.objects.create(
+            node_type=NetworkNode.FACTORY,
+            name="Завод",
+            email="factory@test.com",
+            country="Россия",
+            city="Москва",
+            street="Ленина",
+            house_number="1",
+        )
+        self.retail = NetworkNode.objects.create(
+            node_type=NetworkNode.RETAIL,
+            name="Розница",
+            email="retail@test.com",
+            country="Беларусь",
+            city="Минск",
+            street="Независимости",
+            house_number="10",
+            supplier=self.factory,
+        )
+        Product.objects.create(
+            name="Телевизор",
+            model="LG1",
+            release_date="2024-01-01",
+            supplier=self.factory,
+        )
+        DebtEntry.objects.create(node=self.retail, amount=Decimal("12.50"))
+
+    def get(self, url, **extra):
+        return self.client.get(url, HTTP_AUTHORIZATION=self.auth, **extra)
+
+    def bump_nodes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            CollectionVersion.bump(NODES)
+
+    def test_list_matches_sync_api(self):
+        for name in ("node-list", "product-list"):
+            expected = self.get(reverse(name)).json()["results"]
+            response = self.get(reverse(f"async-{name}"))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()["results"], expected)
+
+    def test_retrieve_matches_sync_api(self):
+        expected = self.get(reverse("node-detail", args=[self.retail.id])).json()
+        response = self.get(reverse("async-node-detail", args=[self.retail.id]))
+        self.assertEqual(response.json(), expected)
+        self.assertEqual(response.json()["debt"], "12.50")
+        missing = self.get(reverse("async-product-detail", args=[0]))
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_pagination(self):
+        ids = []
+        url = reverse("async-node-list") + "?page_size=1&fields=id"
+        while url:
+            data = self.get(url).json()
+            ids += [item["id"] for item in data["results"]]
+            url = data["next"]
+        expected = self.get(reverse("node-list")).json()["results"]
+        self.assertEqual(ids, [item["id"] for item in expected])
+        response = self.get(reverse("async-node-list") + "?cursor=bad")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filters(self):
+        url = reverse("async-node-list")
+        data = self.get(url, data={"country": "Беларусь"}).json()
+        self.assertEqual([item["id"] for item in data["results"]], [self.retail.id])
+        response = self.get(reverse("async-product-list"), data={"supplier": "x"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("supplier", response.json())
+
+    def test_product_filters_match_sync_api(self):
+        Product.objects.create(
+            name="Телефон",
+            model="S1",
+            release_date="2024-02-01",
+            supplier=self.retail,
+        )
+        for params, count in (
+            ({"supplier": self.retail.id}, 1),
+            ({"release_date": "2024-01-01"}, 1),
+            ({"supplier": self.factory.id, "release_date": "2024-02-01"}, 0),
+        ):
+            with self.subTest(**params):
+                expected = self.get(reverse("product-list"), data=params).json()
+                response = self.get(reverse("async-product-list"), data=params)
+                self.assertEqual(response.json()["results"], expected["results"])
+                self.assertEqual(len(expected["results"]), count)
+        response = self.get(
+            reverse("async-product-list"), data={"release_date": "01.13.2024"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("release_date", response.json())
+
+    def test_authentication_and_permissions(self):
+        url = reverse("async-node-list")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", response)
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer invalid")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_msgpack(self):
+        url = reverse("async-node-detail", args=[self.factory.id])
+        response = self.get(url, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content), self.get(url).json())
+
+    async def test_long_poll(self):
+        url = reverse("async-node-list")
+        headers = {"authorization": self.auth}
+        response = await self.async_client.get(url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        headers["if-none-match"] = response["ETag"]
+        response = await self.async_client.get(url, {"wait": 1}, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        await sync_to_async(self.bump_nodes)()
+        response = await self.async_client.get(url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], headers["if-none-match"])
+
+
+class ImportNetworkCommandTest(TestCase):
+    NODES_CSV = (
+        "ref,node_type,name,email,country,city,street,house_number,supplier_ref,debt\n"
+        "ip,entrepreneur,ИП,ip@test.com,Россия,Тула,Ленина,1,shop,10.50\n"
+        "shop,retail,Магазин,shop@test.com,Россия,Тула,Ленина,2,plant,0\n"
+        "plant,factory,Завод,plant@test.com,Россия,Тула,Ленина,3,,\n"
+        "bad,factory,Завод 2,bad@test.com,Россия,Тула,Ленина,4,plant,\n"
+        "orphan,retail,Сирота,o@test.com,Россия,Тула,Ленина,5,bad,\n"
+        "a,retail,А,a@test.com,Россия,Тула,Ленина,6,b,\n"
+        "b,retail,Б,b@test.com,Россия,Тула,Ленина,7,a,\n"
+    )
+    PRODUCTS = [
+        {
+            "name": "Телевизор",
+            "model": "LG1",
+            "release_date": "2024-01-01",
+            "supplier_ref": "ip",
+        },
+        {
+            "name": "Телефон",
+            "model": "S1",
+            "release_date": "2024-02-30",
+            "supplier_ref": "ip",
+        },
+        {
+            "name": "Планшет",
+            "model": "T1",
+            "release_date": "2024-03-01",
+            "supplier_ref": "orphan",
+        },
+    ]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.nodes = Path(self.tmp.name) / "nodes.csv"
+        self.nodes.write_text(self.NODES_CSV, encoding="utf-8")
+        self.products = Path(self.tmp.name) / "products.json"
+        self.products.write_text(json.dumps(self.PRODUCTS), encoding="utf-8")
+
+    def run_import(self, *args):
+        out = io.StringIO()
+        call_command(
+            "import_network",
+            "--nodes",
+            str(self.nodes),
+            "--products",
+            str(self.products),
+            *args,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_import_resolves_suppliers_in_topological_order(self):
+        """Поставщики из файла разрешаются независимо от порядка строк"""
+        self.run_import()
+        ip = NetworkNode.objects.get(email="ip@test.com")
+        shop = NetworkNode.objects.get(email="shop@test.com")
+        plant = NetworkNode.objects.get(email="plant@test.com")
+        self.assertEqual(ip.supplier, shop)
+        self.assertEqual(shop.supplier, plant)
+        self.assertEqual(ip.level, 2)
+        self.assertEqual(ip.path, f"{plant.id}/{shop.id}/")
+        self.assertEqual(str(ip.debt), "10.50")
+        self.assertEqual(
+            list(ip.products.values_list("name", flat=True)), ["Телевизор"]
+        )
+
+    def test_import_rejects_invalid_rows(self):
+        """Нарушения инвариантов отклоняются построчно"""
+        output = self.run_import()
+        self.assertEqual(NetworkNode.objects.count(), 3)
+        self.assertEqual(Product.objects.count(), 1)
+        self.assertIn("У завода не может быть поставщика.", output)
+        self.assertIn("Поставщик из файла отклонён.", output)
+        self.assertIn("Циклическая ссылка на поставщика.", output)
+        self.assertIn("Некорректная дата выхода.", output)
+
+    def test_import_rejects_too_deep_rows(self):
+        """Звенья глубже MAX_DEPTH отклоняются построчно"""
+        plant = NetworkNodeFactory()
+        NetworkNode.objects.filter(pk=plant.pk).update(depth=MAX_DEPTH - 1)
+        self.nodes.write_text(
+            "ref,node_type,name,email,country,city,street,house_number,"
+            "supplier_ref,supplier_id\n"
+            f"shop,retail,Магазин,shop@test.com,Россия,Тула,Ленина,2,,{plant.id}\n"
+            "ip,entrepreneur,ИП,ip@test.com,Россия,Тула,Ленина,1,shop,\n",
+            encoding="utf-8",
+        )
+        output = self.run_import()
+        self.assertIn(MAX_DEPTH_MESSAGE, output)
+        self.assertEqual(
+            list(NetworkNode.objects.values_list("email", flat=True).order_by("id")),
+            [plant.email, "shop@test.com"],
+        )
+
+    def test_import_dry_run(self):
+        """Пробный запуск ничего не сохраняет"""
+        output = self.run_import("--dry-run")
+        self.assertIn("добавлено 3", output)
+        self.assertFalse(NetworkNode.objects.exists())
+
+
+class OpenAPISchemaTest(TestCase):
+    def setUp(self):
+        schema.clear_cache()
+        self.addCleanup(schema.clear_cache)
+        self.url = reverse("schema-swagger-ui")
+
+    def test_schema_built_once(self):
+        with mock.patch.object(
+            schema, "generate_schema", wraps=schema.generate_schema
+        ) as generate:
+            response = self.client.get(self.url, {"format": "openapi"})
+            self.client.get(self.url, {"format": "yaml"})
+            self.client.get(reverse("schema-redoc"), {"format": "openapi"})
+        self.assertEqual(generate.call_count, 1)
+        self.assertIn("/nodes/", json.loads(response.content)["paths"])
+
+        again = self.client.get(
+            self.url, {"format": "openapi"}, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_served_from_artifact(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(OPENAPI_SCHEMA_DIR=directory):
+                call_command("generate_openapi", stdout=io.StringIO())
+                path = schema.schema_path("json")
+                with mock.patch.object(schema, "generate_schema") as generate:
+                    response = self.client.get(self.url, {"format": "json"})
+                generate.assert_not_called()
+                self.assertEqual(response.content, path.read_bytes())
+
+
+class ProfileStartupCommandTest(SimpleTestCase):
+    def test_report(self):
+        out = io.StringIO()
+        call_command("profile_startup", "--limit", "3", stdout=out)
+        report = out.getvalue()
+        self.assertIn("django.setup()", report)
+        self.assertIn("network", report)
+        self.assertIn("Импорты по пакетам", report)
+
+    def test_documentation_not_imported_at_startup(self):
+        """drf_yasg загружается только при первом запросе к документации"""
+        out = io.StringIO()
+        call_command("profile_startup", "--limit", "1000", stdout=out)
+        self.assertNotIn("drf_yasg.views", out.getvalue())
+
+
+class MetricsTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.clear()
+        self.addCleanup(metrics.registry.clear)
+        self.user = User.objects.create_user(
+            email="metrics@test.com", password="12345", is_staff=True, is_active=True
+        )
+        self.client.force_authenticate(self.user)
+        NetworkNodeFactory()
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("node-list"), {"country": "Россия"})
+        timing = response["Server-Timing"]
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        self.assertIn("serialize;dur=", timing)
+        self.assertIn("total;dur=", timing)
+
+    def serialize_ms(self, response):
+        timing = dict(
+            item.strip().split(";", 1) for item in response["Server-Timing"].split(",")
+        )
+        return float(timing["serialize"].partition("dur=")[2])
+
+    def slow(self, method):
+        def wrapper(*args, **kwargs):
+            time.sleep(0.05)
+            return method(*args, **kwargs)
+
+        return wrapper
+
+    def test_serialization_timed(self):
+        """В serialize входят сериализатор и быстрый путь, а не только рендерер"""
+        node = NetworkNode.objects.get()
+        represent = RowRepresentation.represent
+        with mock.patch.object(RowRepresentation, "represent", self.slow(represent)):
+            response = self.client.get(reverse("node-list"))
+        self.assertGreaterEqual(self.serialize_ms(response), 50)
+
+        to_representation = NetworkNodeSerializer.to_representation
+        with mock.patch.object(
+            NetworkNodeSerializer, "to_representation", self.slow(to_representation)
+        ):
+            response = self.client.get(reverse("node-detail", args=[node.id]))
+        self.assertGreaterEqual(self.serialize_ms(response), 50)
+
+    def test_streaming_response_timed_when_consumed(self):
+        """Выгрузка замеряется по отдаче потока, вместе с SQL внутри него"""
+        response = self.client.get(reverse("node-export"))
+        self.assertNotIn("Server-Timing", response)
+        self.assertFalse(metrics.registry.histograms["total"].series)
+        with CaptureQueriesContext(connection) as queries:
+            b"".join(response.streaming_content)
+        self.assertTrue(queries)
+        (labels,) = metrics.registry.histograms["queries"].series
+        self.assertIn(("view", "node-export"), labels)
+        _, total, count = metrics.registry.histograms["queries"].series[labels]
+        self.assertEqual(count, 1)
+        self.assertGreaterEqual(total, len(queries))
+
+    def test_token_endpoint_instrumented(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"email": "metrics@test.com", "password": "12345"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Server-Timing", response)
+
+    def test_other_routes_not_instrumented(self):
+        response = self.client.get(reverse("debt-entry-list"))
+        self.assertNotIn("Server-Timing", response)
+
+    def test_histograms_exposed(self):
+        self.client.get(reverse("node-list"), {"country": "Россия", "page": 1})
+        self.client.get(reverse("node-list"), {"page": 1, "country": "Китай"})
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        labels = 'view="node-list",method="GET",params="country,page",status="2xx"'
+        body = response.content.decode()
+        self.assertIn(
+            f'network_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', body
+        )
+        self.assertIn(f"network_request_queries_count{{{labels}}} 2", body)
+
+    def test_param_sets_limited(self):
+        for i in range(metrics.MAX_PARAM_SETS + 1):
+            metrics.registry.record("node-list", "GET", [f"p{i}"], 200, {"total": 0})
+        self.assertIn('params="other"', metrics.registry.expose())
+
+    def test_pool_stats_exposed(self):
+        stats = {"default": {"pool_max": 10, "pool_size": 3, "requests_num": 42}}
+        with mock.patch.object(metrics, "pool_stats", return_value=stats):
+            body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('network_db_pool_size{database="default"} 3', body)
+        self.assertIn('network_db_pool_requests_total{database="default"} 42', body)
+        self.assertIn(
+            'network_db_pool_requests_errors_total{database="default"} 0', body
+        )
+
+    def test_metrics_requires_staff(self):
+        self.client.force_authenticate(None)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        user = User.objects.create_user(email="user@test.com", password="12345")
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class HealthTest(APITestCase):
+    def test_healthy(self):
+        response = self.client.get(reverse("health"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["databases"], {"default": "ok"})
+
+    def test_database_unavailable(self):
+        with mock.patch.object(health, "check_database", return_value=False):
+            response = self.client.get(reverse("health"))
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.data["status"], "unavailable")
+
+
+class QueryCountMixin:
+    """
+    Защита от N+1: после каждого шага grow(step) данные растут (глубже
+    цепочка поставок, больше продуктов у звена, больше страница), и число
+    SQL-запросов эндпоинта на всех шагах должно быть одинаковым.
+    """
+
+    # глубина цепочки, продуктов у звена и размер страницы по шагам
+    depths = (2, 5, 10)
+    products_per_node = (1, 3, 6)
+    page_sizes = (2, 10, 50)
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            email="queries@test.com", password="12345", is_staff=True, is_active=True
+        )
+        self.client.force_authenticate(self.user)
+        self.factory = NetworkNodeFactory()
+        self.chain = [self.factory]
+
+    def grow(self, step):
+        """Удлиняет цепочку до depths[step] и догружает продукты; вернёт хвост."""
+        while len(self.chain) <= self.depths[step]:
+            self.chain.append(
+                NetworkNodeFactory(
+                    node_type=NetworkNode.RETAIL, supplier=self.chain[-1]
+                )
+            )
+        for node in self.chain:
+            missing = self.products_per_node[step] - node.products.count()
+            ProductFactory.create_batch(missing, supplier=node)
+        return self.chain[-1]
+
+    def count_queries(self, method, url, data=None):
+        # кеш ответов сбрасывается: считаются запросы самого представления
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            if method == "get":
+                response = self.client.get(url, data)
+            else:
+                response = getattr(self.client, method)(url, data, format="json")
+        self.assertLess(response.status_code, 400, response.data)
+        return len(queries)
+
+    def assertQueriesConstant(self, method, url, data=None):
+        """url и data — значения или функции (шаг, хвост цепочки) -> значение."""
+        counts = []
+        for step in range(len(self.depths)):
+            tail = self.grow(step)
+            args = [
+                value(step, tail) if callable(value) else value for value in (url, data)
+            ]
+            counts.append(self.count_queries(method, *args))
+        self.assertEqual(
+            len(set(counts)), 1, f"Число запросов растёт вместе с данными: {counts}"
+        )
+
+
+class QueryCountTest(QueryCountMixin, APITestCase):
+    def node_url(self, name):
+        return lambda step, tail: reverse(name, args=[tail.id])
+
+    def page(self, **params):
+        return lambda step, tail: {"page_size": self.page_sizes[step], **params}
+
+    def test_node_list(self):
+        self.assertQueriesConstant("get", reverse("node-list"), self.page())
+
+    def test_node_list_expanded(self):
+        self.assertQueriesConstant(
+            "get",
+            reverse("node-list"),
+            self.page(expand="products,supplier_info"),
+        )
+
+    def test_node_list_sparse(self):
+        self.assertQueriesConstant(
+            "get", reverse("node-list"), self.page(fields="id,level,products")
+        )
+
+    def test_node_list_ordered(self):
+        self.assertQueriesConstant(
+            "get", reverse("node-list"), self.page(ordering="name")
+        )
+
+    def test_node_retrieve(self):
+        self.assertQueriesConstant(
+            "get", self.node_url("node-detail"), {"expand": "products,supplier_info"}
+        )
+
+    def test_node_ancestors(self):
+        self.assertQueriesConstant("get", self.node_url("node-ancestors"))
+
+    def test_node_descendants(self):
+        self.assertQueriesConstant(
+            "get", reverse("node-descendants", args=[self.factory.id]), self.page()
+        )
+
+    def test_node_tree(self):
+        self.assertQueriesConstant("get", reverse("node-tree", args=[self.factory.id]))
+
+    def test_node_create(self):
+        self.assertQueriesConstant(
+            "post",
+            reverse("node-list"),
+            lambda step, tail: {
+                "node_type": NetworkNode.RETAIL,
+                "name": f"Магазин {step}",
+                "email": f"shop{step}@test.com",
+                "country": "Россия",
+                "city": "Москва",
+                "street": "Тверская",
+                "house_number": str(step),
+                "supplier": tail.id,
+            },
+        )
+
+    def test_product_list(self):
+        self.assertQueriesConstant("get", reverse("product-list"), self.page())
+
+    def test_product_list_by_supplier(self):
+        self.assertQueriesConstant(
+            "get",
+            reverse("product-list"),
+            lambda step, tail: {"supplier": tail.id, "page_size": 50},
+        )
+
+    def test_product_retrieve(self):
+        self.assertQueriesConstant(
+            "get",
+            lambda step, tail: reverse(
+                "product-detail", args=[tail.products.latest("id").id]
+            ),
+        )
+
+    def test_product_create(self):
+        self.assertQueriesConstant(
+            "post",
+            reverse("product-list"),
+            lambda step, tail: {
+                "name": "Телевизор",
+                "model": f"LG{step}",
+                "release_date": "2024-01-01",
+                "supplier": tail.id,
+            },
+        )
+
+
+class SerializerQueryCountTest(QueryCountTest):
+    """Те же проверки для списков через сериализаторы, без быстрого пути."""
+
+    def setUp(self):
+        super().setUp()
+        for viewset in (NetworkNodeViewSet, ProductViewSet):
+            patcher = mock.patch.object(viewset, "fast_list", False)
+            patcher.start()
+            self.addCleanup(patcher.stop)
@@ -1,9 +1,26 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 
-from .views import NetworkNodeViewSet, ProductViewSet
+from .async_views import AsyncNetworkNodeView, AsyncProductView
+from .views import DebtEntryViewSet, NetworkNodeViewSet, ProductViewSet
 
 router = DefaultRouter()
 router.register(r"nodes", NetworkNodeViewSet, basename="node")
 router.register(r"products", ProductViewSet, basename="product")
+router.register(r"debt-entries", DebtEntryViewSet, basename="debt-entry")
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    # асинхронное чтение для ASGI (см. async_views)
+    path("async/nodes/", AsyncNetworkNodeView.as_view(), name="async-node-list"),
+    path(
+        "async/nodes/<int:pk>/",
+        AsyncNetworkNodeView.as_view(),
+        name="async-node-detail",
+    ),
+    path("async/products/", AsyncProductView.as_view(), name="async-product-list"),
+    path(
+        "async/products/<int:pk>/",
+        AsyncProductView.as_view(),
+        name="async-product-detail",
+    ),
+]
@@ -1,12 +1,42 @@
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, viewsets
+from rest_framework import filters, mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
-from .models import NetworkNode, Product
+from .cache import (
+    NODES,
+    PRODUCTS,
+    CachedResponseMixin,
+    node_scope,
+    product_scope,
+)
+from .conditional import ConditionalGetMixin
+from .export import csv_rows, ndjson_rows
+from .fastpath import FastListMixin
+from .filters import FullTextSearchFilter
+from .models import DEBT_GROUPS, DebtEntry, NetworkNode, Product
+from .pagination import (
+    DebtEntryPagination,
+    NetworkNodePagination,
+    ProductPagination,
+)
 from .permissions import IsActiveStaff
-from .serializers import NetworkNodeSerializer, ProductSerializer
+from .serializers import (
+    BULK_CREATE_MAX_SIZE,
+    DebtEntrySerializer,
+    DebtStatsSerializer,
+    NetworkNodeBulkSerializer,
+    NetworkNodeSerializer,
+    NetworkNodeTreeSerializer,
+    ProductSerializer,
+)
 
 
-class NetworkNodeViewSet(viewsets.ModelViewSet):
+class NetworkNodeViewSet(
+    ConditionalGetMixin, CachedResponseMixin, FastListMixin, viewsets.ModelViewSet
+):
     """
     CRUD для звеньев сети.
     Только для активных пользователей.
@@ -16,21 +46,207 @@ class NetworkNodeViewSet(viewsets.ModelViewSet):
     queryset = (
         NetworkNode.objects.select_related("supplier")
         .prefetch_related("products")
-        .all()
+        .with_current_debt()
     )
     serializer_class = NetworkNodeSerializer
     permission_classes = [IsActiveStaff]
+    pagination_class = NetworkNodePagination
+    cache_scope = NODES
+    collection_version = NODES
+    object_scope = staticmethod(node_scope)
     filter_backends = (
         DjangoFilterBackend,
-        filters.SearchFilter,
+        FullTextSearchFilter,
         filters.OrderingFilter,
     )
     filterset_fields = ("country",)  # фильтрация по стране
     search_fields = ("name", "email", "city")
     ordering_fields = ("created_at", "name")
+    # действия, где выборка сужается под ?fields= и ?expand=
+    sparse_actions = ("list", "retrieve", "descendants", "ancestors")
+    # поле ответа -> колонка модели, если имена различаются
+    field_columns = {"supplier": "supplier_id", "level": "depth"}
 
+    def get_queryset(self):
+        """
+        Для ?fields= / ?expand= читаются только нужные колонки, а
+        select_related поставщика и prefetch продуктов выполняются,
+        только если их поля попадают в ответ.
+        """
+        queryset = super().get_queryset()
+        fields = None
+        if self.action in self.sparse_actions:
+            fields = self.get_serializer_class().requested_fields(self.request)
+        if fields is None:
+            return queryset
 
-class ProductViewSet(viewsets.ModelViewSet):
+        queryset = queryset.select_related(None).prefetch_related(None)
+        # id и ключи сортировки нужны пагинации курсором
+        columns = {"id", *self.ordering_fields}
+        columns.update(
+            self.field_columns.get(name, name)
+            for name in fields - {"products", "supplier_info"}
+        )
+        if "supplier_info" in fields:
+            queryset = queryset.select_related("supplier")
+            columns.update(
+                ("supplier_id", "supplier__id", "supplier__name", "supplier__email")
+            )
+        if "products" in fields:
+            queryset = queryset.prefetch_related("products")
+        return queryset.only(*columns)
+
+    def get_object_version(self, pk):
+        """К updated_at добавляется хвост журнала задолженности звена."""
+        row = (
+            NetworkNode.objects.filter(pk=pk)
+            .with_debt_version()
+            .values_list(
+                "updated_at", "debt_entry_id", "debt_tail_count", "debt_tail_at"
+            )
+            .first()
+        )
+        if row is None:
+            return None
+        updated_at, *debt_version, debt_tail_at = row
+        last_modified = max(updated_at, debt_tail_at or updated_at)
+        return f"{updated_at.isoformat()}:{debt_version}", last_modified
+
+    def create(self, request, *args, **kwargs):
+        """Создание звена; если в теле список — пакетное создание."""
+        if isinstance(request.data, list):
+            return self.bulk_create(request)
+        return super().create(request, *args, **kwargs)
+
+    def bulk_create(self, request):
+        """
+        Пакетное создание в одной транзакции. Ответ — созданные звенья
+        в порядке запроса, в том же формате, что и у create.
+        """
+        serializer = NetworkNodeBulkSerializer(
+            data=request.data,
+            many=True,
+            max_length=BULK_CREATE_MAX_SIZE,
+            context=self.get_serializer_context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        nodes = serializer.save()
+        prefetch_related_objects(nodes, "products")
+        data = self.get_serializer(nodes, many=True).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False)
+    def export(self, request):
+        """
+        Потоковая выгрузка звеньев с продуктами (?type=csv|ndjson).
+        Учитывает те же фильтры, поиск и сортировку, что и список;
+        строки читаются серверным курсором, поэтому память не растёт
+        с размером выгрузки.
+        """
+        export_type = request.query_params.get("type", "csv")
+        if export_type not in ("csv", "ndjson"):
+            return Response(
+                {"type": "Допустимые значения: csv, ndjson."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if not queryset.query.order_by:
+            queryset = queryset.order_by("id")
+
+        if export_type == "csv":
+            rows = csv_rows(queryset)
+            content_type = "text/csv; charset=utf-8"
+        else:
+            rows = ndjson_rows(
+                queryset, self.get_serializer_class(), self.get_serializer_context()
+            )
+            content_type = "application/x-ndjson; charset=utf-8"
+
+        response = StreamingHttpResponse(rows, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="nodes.{export_type}"'
+        return response
+
+    @action(detail=True)
+    def descendants(self, request, pk=None):
+        """Все звенья ниже текущего (клиенты любого уровня)."""
+        node = self.get_object()
+        return self.list_response(self.get_queryset().descendants_of(node))
+
+    @action(detail=True)
+    def ancestors(self, request, pk=None):
+        """
+        Цепочка поставщиков от завода до текущего звена.
+        Цепочка короткая и упорядочена по уровню, поэтому без пагинации.
+        """
+        node = self.get_object()
+        queryset = self.get_queryset().ancestors_of(node)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @action(detail=True)
+    def tree(self, request, pk=None):
+        """Вложенное дерево поставок с корнем в текущем звене."""
+        node = self.get_object()
+        nodes = (
+            NetworkNode.objects.descendants_of(node, include_self=True)
+            .with_current_debt()
+            .only("id", "node_type", "name", "debt", "depth", "supplier_id")
+            .order_by("depth", "id")
+        )
+        children = {}
+        root = None
+        for item in nodes:
+            if item.pk == node.pk:
+                root = item
+            else:
+                children.setdefault(item.supplier_id, []).append(item)
+        serializer = NetworkNodeTreeSerializer(
+            root, context={**self.get_serializer_context(), "children": children}
+        )
+        return Response(serializer.data)
+
+    def _debt_stats_response(self, queryset):
+        """
+        Сводка по задолженности для выборки с фильтрами списка;
+        ?group_by=country|node_type|level добавляет разбивку по группам.
+        Считается в БД агрегатами, без выгрузки звеньев.
+        """
+        group = self.request.query_params.get("group_by")
+        if group is not None and group not in DEBT_GROUPS:
+            return Response(
+                {"group_by": f"Допустимые значения: {', '.join(DEBT_GROUPS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        queryset = self.filter_queryset(queryset)
+        if queryset.query.annotations:
+            # аннотации поиска не должны попасть в GROUP BY
+            queryset = NetworkNode.objects.filter(pk__in=queryset.values("pk"))
+
+        data = DebtStatsSerializer(queryset.debt_stats()).data
+        if group is not None:
+            data["groups"] = [
+                {group: row[group], **DebtStatsSerializer(row).data}
+                for row in queryset.debt_stats_by(group)
+            ]
+        return Response(data)
+
+    @action(detail=False, url_path="debt-stats", url_name="debt-stats")
+    def debt_stats(self, request):
+        """Задолженность по всей сети (с учётом фильтров списка)."""
+        return self._debt_stats_response(NetworkNode.objects.all())
+
+    @action(detail=True, url_path="debt-stats", url_name="subtree-debt-stats")
+    def subtree_debt_stats(self, request, pk=None):
+        """Задолженность всех звеньев ниже текущего (клиенты любого уровня)."""
+        node = self.get_object()
+        return self._debt_stats_response(NetworkNode.objects.subtree_of(node))
+
+
+class ProductViewSet(
+    ConditionalGetMixin, CachedResponseMixin, FastListMixin, viewsets.ModelViewSet
+):
     """
     CRUD для продуктов.
     Только для активных пользователей.
@@ -40,11 +256,38 @@ class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.select_related("supplier").all()
     serializer_class = ProductSerializer
     permission_classes = [IsActiveStaff]
+    pagination_class = ProductPagination
+    cache_scope = PRODUCTS
+    collection_version = PRODUCTS
+    object_scope = staticmethod(product_scope)
     filter_backends = (
         DjangoFilterBackend,
-        filters.SearchFilter,
+        FullTextSearchFilter,
         filters.OrderingFilter,
     )
     filterset_fields = ("release_date", "supplier")
     search_fields = ("name", "model")
     ordering_fields = ("release_date", "name")
+
+
+class DebtEntryViewSet(
+    mixins.CreateModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet
+):
+    """
+    Журнал задолженности: проводки только добавляются.
+    Список тела POST записывается одним INSERT.
+    Фильтрация по звену.
+    """
+
+    queryset = DebtEntry.objects.all()
+    serializer_class = DebtEntrySerializer
+    permission_classes = [IsActiveStaff]
+    pagination_class = DebtEntryPagination
+    filter_backends = (DjangoFilterBackend,)
+    filterset_fields = ("node",)
+
+    def get_serializer(self, *args, **kwargs):
+        if isinstance(kwargs.get("data"), list):
+            kwargs["many"] = True
+            kwargs["max_length"] = BULK_CREATE_MAX_SIZE
+        return super().get_serializer(*args, **kwargs)
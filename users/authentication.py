@@ -0,0 +1,164 @@
+"""
+JWT-аутентификация без запроса пользователя на каждый запрос API.
+
+После первой проверки по БД в кеш кладётся снимок пользователя — поля,
+которые нужны правам (is_active, is_staff, is_superuser), — и следующие
+запросы с токенами этого пользователя обходятся без таблицы
+пользователей; request.user тогда — неполный SnapshotUser только для
+чтения. Сохранение или удаление CustomUser сбрасывает снимок
+(users.signals); без Redis кеш у каждого процесса свой, и в других
+процессах снимок устаревает не позже USER_SNAPSHOT_TIMEOUT.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+PREFIX = "users:snapshot"
+SNAPSHOT_FIELDS = ("id", "email", "is_active", "is_staff", "is_superuser")
+
+
+def get_timeout():
+    return getattr(settings, "USER_SNAPSHOT_TIMEOUT", 0)
+
+
+def get_cache():
+    return caches[getattr(settings, "USER_SNAPSHOT_CACHE_ALIAS", "default")]
+
+
+def snapshot_key(user_id):
+    return f"{PREFIX}:{user_id}"
+
+
+def make_snapshot(user):
+    data = {field: getattr(user, field) for field in SNAPSHOT_FIELDS}
+    # хеш пароля в кеш не попадает — только его md5 для CHECK_REVOKE_TOKEN
+    data["password_md5"] = get_md5_hash_password(user.password)
+    return data
+
+
+class SnapshotUser:
+    """
+    Пользователь из снимка — неполный и только для чтения, как TokenUser
+    simplejwt. Есть только поля SNAPSHOT_FIELDS; save(), delete() и
+    работа с паролем запрещены, чтобы неполный объект не затёр строку
+    в БД. Права (has_perm) и остальные поля — у полной записи из load().
+    """
+
+    is_anonymous = False
+    is_authenticated = True
+
+    def __init__(self, model, data):
+        self.model = model
+        data = dict(data)
+        self.password_md5 = data.pop("password_md5")
+        for field, value in data.items():
+            setattr(self, field, value)
+        self.pk = self.id
+        self._user = None
+
+    def __str__(self):
+        return self.get_username()
+
+    def __eq__(self, other):
+        return isinstance(other, (SnapshotUser, self.model)) and other.pk == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def get_username(self):
+        return getattr(self, self.model.USERNAME_FIELD)
+
+    def load(self):
+        """Полная запись пользователя из БД (читается один раз)."""
+        if self._user is None:
+            self._user = self.model._default_manager.get(pk=self.pk)
+        return self._user
+
+    def has_perm(self, perm, obj=None):
+        return self.load().has_perm(perm, obj)
+
+    def has_perms(self, perm_list, obj=None):
+        return self.load().has_perms(perm_list, obj)
+
+    def has_module_perms(self, app_label):
+        return self.load().has_module_perms(app_label)
+
+    def _read_only(self, *args, **kwargs):
+        raise NotImplementedError(
+            "Пользователь из снимка только для чтения; используйте load()."
+        )
+
+    save = delete = set_password = check_password = _read_only
+    has_usable_password = set_unusable_password = _read_only
+
+
+def from_snapshot(model, data):
+    """Пользователь из снимка (SnapshotUser), без обращения к БД."""
+    return SnapshotUser(model, data)
+
+
+def invalidate(user_id):
+    """
+    Сбрасывает снимок сразу и, внутри транзакции, ещё раз после commit:
+    иначе параллельный запрос успел бы закешировать старые флаги.
+    """
+    if not get_timeout():
+        return
+
+    def delete():
+        get_cache().delete(snapshot_key(user_id))
+
+    delete()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(delete)
+
+
+class CachedUserJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication со снимком пользователя в кеше. Проверки те же:
+    активность (CHECK_USER_IS_ACTIVE) и смена пароля (CHECK_REVOKE_TOKEN).
+    USER_SNAPSHOT_TIMEOUT = 0 — каждый запрос читает пользователя из БД.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        if not get_timeout():
+            return super().get_user(validated_token)
+        data = get_cache().get(snapshot_key(user_id))
+        if data is None:
+            user = super().get_user(validated_token)
+            self.store_snapshot(user_id, user)
+            return user
+        return self.check_user(from_snapshot(self.user_model, data), validated_token)
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+    def store_snapshot(self, user_id, user):
+        get_cache().set(snapshot_key(user_id), make_snapshot(user), get_timeout())
+
+    def check_user(self, user, validated_token):
+        """Проверки JWTAuthentication.get_user после загрузки пользователя."""
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # у пользователя из снимка md5 пароля уже посчитан
+            password_md5 = getattr(user, "password_md5", None)
+            if password_md5 is None:
+                password_md5 = get_md5_hash_password(user.password)
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != password_md5:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+        return user
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет истёкшие refresh-токены из token_blacklist пакетами: каждый "
+        "пакет — отдельная короткая транзакция, строки, занятые другими "
+        "транзакциями, пропускаются до следующего запуска."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=5000, help="Токенов в одном пакете."
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Пауза между пакетами, секунды.",
+        )
+
+    def handle(self, *args, **options):
+        outstanding = OutstandingToken._meta.db_table
+        blacklisted = BlacklistedToken._meta.db_table
+        sql = f"""
+            WITH doomed AS (
+                SELECT id FROM {outstanding}
+                WHERE expires_at < now()
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            ), unlisted AS (
+                DELETE FROM {blacklisted}
+                WHERE token_id IN (SELECT id FROM doomed)
+            )
+            DELETE FROM {outstanding} WHERE id IN (SELECT id FROM doomed)
+        """
+        purged = 0
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, [options["chunk_size"]])
+                deleted = cursor.rowcount
+            purged += deleted
+            if deleted < options["chunk_size"]:
+                break
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS(f"Удалено токенов: {purged}"))
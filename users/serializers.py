@@ -0,0 +1,13 @@
+from rest_framework_simplejwt import serializers
+
+from .tokens import RefreshToken
+
+
+class TokenObtainPairSerializer(serializers.TokenObtainPairSerializer):
+    token_class = RefreshToken
+
+
+class TokenRefreshSerializer(serializers.TokenRefreshSerializer):
+    """Обновление токенов с проверкой отзыва через revocation_filter."""
+
+    token_class = RefreshToken
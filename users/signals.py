@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import invalidate
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_snapshot(sender, instance, **kwargs):
+    """Флаги, пароль или сам пользователь изменились — снимок устарел."""
+    invalidate(getattr(instance, api_settings.USER_ID_FIELD))
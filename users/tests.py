@@ -1,10 +1,27 @@
+import io
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import AccessToken
 
 from network.models import NetworkNode
 
+from .authentication import CachedUserJWTAuthentication, SnapshotUser
+from .tokens import RefreshToken, revocation_filter
+
 User = get_user_model()
 
 
@@ -69,3 +86,128 @@ class UserPermissionAPITest(APITestCase):
         self.client.logout()
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class UserSnapshotAuthenticationTest(APITestCase):
+    """JWT-аутентификация по снимку пользователя в кеше"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="snapshot@test.com", password="12345", is_staff=True, is_active=True
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+        self.url = reverse("node-list")
+
+    def user_queries(self):
+        """Запросы к таблице пользователей за один запрос API"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        table = User._meta.db_table
+        return response, [q for q in queries.captured_queries if table in q["sql"]]
+
+    def test_user_read_once(self):
+        response, queries = self.user_queries()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        response, queries = self.user_queries()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(queries, [])
+
+    def test_flag_change_invalidates_snapshot(self):
+        self.client.get(self.url)
+        self.user.is_staff = False
+        self.user.save()
+        response, queries = self.user_queries()
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(len(queries), 1)
+
+        self.user.is_staff = True
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_user_is_read_only(self):
+        """Пользователь из снимка неполный: запись и пароль недоступны"""
+        authentication = CachedUserJWTAuthentication()
+        token = AccessToken.for_user(self.user)
+        self.assertIsInstance(authentication.get_user(token), User)
+        with self.assertNumQueries(0):
+            user = authentication.get_user(token)
+        self.assertIsInstance(user, SnapshotUser)
+        self.assertEqual(user, self.user)
+        self.assertEqual(user.email, "snapshot@test.com")
+        self.assertTrue(user.is_staff)
+        for method in (user.save, user.delete, user.has_usable_password):
+            with self.assertRaises(NotImplementedError):
+                method()
+        with self.assertRaises(NotImplementedError):
+            user.check_password("12345")
+        self.assertFalse(user.has_perm("network.add_networknode"))
+        self.assertEqual(user.load(), self.user)
+
+    def test_deleted_user_rejected(self):
+        self.client.get(self.url)
+        self.user.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TokenRevocationTest(APITestCase):
+    """Отзыв refresh-токенов: фильтр перед token_blacklist и очистка"""
+
+    def setUp(self):
+        revocation_filter.reset()
+        self.user = User.objects.create_user(
+            email="refresh@test.com", password="12345", is_staff=True, is_active=True
+        )
+
+    def refresh(self, token):
+        return self.client.post(reverse("token_refresh"), {"refresh": str(token)})
+
+    def test_rotated_token_rejected(self):
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"email": "refresh@test.com", "password": "12345"},
+        )
+        old = response.data["refresh"]
+        response = self.refresh(old)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.refresh(response.data["refresh"]).status_code, status.HTTP_200_OK
+        )
+        self.assertEqual(self.refresh(old).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_REVOCATION_SYNC_INTERVAL=60)
+    def test_filter_skips_blacklist_query(self):
+        token = RefreshToken.for_user(self.user)
+        revocation_filter.sync(force=True)
+        with self.assertNumQueries(0):
+            RefreshToken(str(token))
+
+    def test_revocation_from_other_process(self):
+        """Строка чёрного списка из другого процесса видна после догрузки"""
+        token = RefreshToken.for_user(self.user)
+        revocation_filter.sync(force=True)
+        outstanding = OutstandingToken.objects.get(jti=token["jti"])
+        BlacklistedToken.objects.create(token=outstanding)
+        revocation_filter.sync(force=True)
+        self.assertTrue(revocation_filter.might_be_revoked(token["jti"]))
+        self.assertEqual(self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_purge_expired_tokens(self):
+        now = timezone.now()
+        for i in range(3):
+            expired = OutstandingToken.objects.create(
+                jti=f"expired-{i}", token="-", expires_at=now - timedelta(days=1)
+            )
+            BlacklistedToken.objects.create(token=expired)
+        alive = OutstandingToken.objects.create(
+            jti="alive", token="-", expires_at=now + timedelta(days=1)
+        )
+        call_command("purge_expired_tokens", "--chunk-size", "2", stdout=io.StringIO())
+        self.assertEqual(list(OutstandingToken.objects.all()), [alive])
+        self.assertFalse(BlacklistedToken.objects.exists())
@@ -0,0 +1,146 @@
+"""
+Фильтр отозванных refresh-токенов перед проверкой по token_blacklist.
+
+revocation_filter — фильтр Блума по jti токенов из чёрного списка в памяти
+процесса. «Нет в фильтре» означает «не отозван», и запрос к
+BlacklistedToken не выполняется; «возможно есть» проверяется по БД, так
+что ложные срабатывания стоят только лишнего запроса. Отзыв в этом
+процессе попадает в фильтр сразу, в других — при догрузке новых строк
+чёрного списка, не позже TOKEN_REVOCATION_SYNC_INTERVAL секунд.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+# на сколько jti рассчитан фильтр; при переполнении он строится заново
+REVOCATION_FILTER_CAPACITY = 1_000_000
+REVOCATION_FILTER_ERROR_RATE = 0.001
+# строки чёрного списка перечитываются с запасом: id выдаётся до commit,
+# и строка с меньшим id может стать видна позже строки с большим
+REVOCATION_SYNC_OVERLAP = 60
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+
+class RevocationFilter:
+    """Фильтр Блума по jti чёрного списка с догрузкой по возрастанию id."""
+
+    def __init__(
+        self,
+        capacity=REVOCATION_FILTER_CAPACITY,
+        error_rate=REVOCATION_FILTER_ERROR_RATE,
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Следующая проверка заново загрузит фильтр из БД."""
+        self.bloom = None
+        self.count = 0
+        self.watermark = 0
+        self.synced_at = None
+        # (время, watermark) догрузок за последние REVOCATION_SYNC_OVERLAP секунд
+        self._history = deque()
+
+    def might_be_revoked(self, jti):
+        self.sync()
+        with self._lock:
+            return jti in self.bloom
+
+    def add(self, jti):
+        with self._lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def sync(self, force=False):
+        interval = getattr(settings, "TOKEN_REVOCATION_SYNC_INTERVAL", 0)
+        with self._lock:
+            now = time.monotonic()
+            if (
+                not force
+                and self.synced_at is not None
+                and now - self.synced_at < interval
+            ):
+                return
+            if self.bloom is None or self.count > self.capacity:
+                self._load(now)
+            else:
+                self._load_new(now)
+            self.synced_at = now
+
+    def _load(self, now):
+        """Все действующие токены чёрного списка — в новый фильтр."""
+        self.bloom = BloomFilter(self.capacity, self.error_rate)
+        self.count = 0
+        self.watermark = 0
+        self._history.clear()
+        rows = BlacklistedToken.objects.filter(
+            token__expires_at__gt=timezone.now()
+        ).values_list("id", "token__jti")
+        self._add_rows(rows, now)
+
+    def _load_new(self, now):
+        history = self._history
+        while len(history) > 1 and history[1][0] <= now - REVOCATION_SYNC_OVERLAP:
+            history.popleft()
+        since = history[0][1] if history else self.watermark
+        rows = BlacklistedToken.objects.filter(id__gt=since).values_list(
+            "id", "token__jti"
+        )
+        self._add_rows(rows, now)
+
+    def _add_rows(self, rows, now):
+        for pk, jti in rows.order_by("id").iterator(chunk_size=10_000):
+            self.bloom.add(jti)
+            if pk > self.watermark:
+                self.watermark = pk
+                self.count += 1
+        self._history.append((now, self.watermark))
+
+
+revocation_filter = RevocationFilter()
+
+
+class RefreshToken(tokens.RefreshToken):
+    """RefreshToken, который проверяет чёрный список через revocation_filter."""
+
+    def check_blacklist(self):
+        if revocation_filter.might_be_revoked(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        result = super().blacklist()
+        revocation_filter.add(self.payload[api_settings.JTI_CLAIM])
+        return result